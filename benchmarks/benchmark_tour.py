@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Benchmark of the travel optimization.
+
+Solves the tour of hole sets of growing sizes, the way Machining.optimize does for
+ each tool, and records for each:
+ - The wall time, and the peak memory (as traced by Python, on a second run)
+ - The length of the tour
+ - The ratio to the length of a nearest neighbour tour (the classic baseline)
+ - The gap to the lower bound of the tour
+
+The hole sets are:
+ - uniform:   Holes spread evenly over the board
+ - clustered: Holes grouped around components
+ - grid:      Holes on a 0.1in grid, like connectors and through hole parts
+ - board:     The holes of tests/pulsegen.kicad_pcb, repeated to reach the size
+
+The results are saved as JSON. Given the results of a previous run, the changes are
+ reported, so regressions show up between versions.
+
+Usage:
+    python benchmarks/benchmark_tour.py -o results.json [-c previous.json] [-s 10 -s 1000]
+"""
+from datetime import datetime
+from math import ceil, cos, radians, sin, sqrt
+from pathlib import Path
+from time import perf_counter
+import importlib.metadata
+import json
+import os
+import platform
+import re
+import tracemalloc
+
+import click
+import numpy as np
+
+from k2g.constants import TOUR_SOLVER_VERSION
+from k2g.distance import point_distance
+from k2g.spatial import GridIndex
+from k2g.tour import solve_tour
+
+
+# Sizes of the hole sets
+SIZES = [10, 100, 1000, 10000, 100000]
+
+# Real board
+BOARD_PATH = Path(__file__).resolve().parent.parent / "tests" / "pulsegen.kicad_pcb"
+
+# Holes of a footprint or a via in a KiCad PCB file
+RE_FOOTPRINT = re.compile(r'^\s*\(footprint\s')
+RE_AT = re.compile(r'\(at\s+(-?[\d.]+)\s+(-?[\d.]+)(?:\s+(-?[\d.]+))?\)')
+RE_HOLE = re.compile(r'^\s*\(pad\s.*thru_hole')
+RE_VIA = re.compile(r'^\s*\(via\s')
+
+# Size of the boards in nm
+BOARD_SIZE = 1e8
+
+
+def uniform_set(size, rng):
+    """ Holes spread evenly over a square board """
+    return rng.uniform(0, BOARD_SIZE, (size, 2))
+
+
+def clustered_set(size, rng):
+    """ Holes around components of 1 to 16 holes """
+    centers = rng.uniform(0, BOARD_SIZE, (max(size // 8, 1), 2))
+    points = centers[rng.integers(0, len(centers), size)]
+
+    return points + rng.normal(0, BOARD_SIZE / 200, (size, 2))
+
+
+def grid_set(size, rng):
+    """ Holes on a 0.1in grid, a third of the grid being used """
+    pitch = 2.54e6
+    side = ceil(sqrt(3 * size))
+    cells = rng.choice(side * side, size, replace=False)
+
+    return np.column_stack(divmod(cells, side)) * pitch
+
+
+def read_board_holes(path=BOARD_PATH):
+    """
+    Read the holes of a KiCad PCB file. Only the location of the holes matters here,
+    so the file is scanned for the location of the footprints, pads and vias.
+    @returns A (n, 2) array of the holes in nm
+    """
+    holes = []
+    footprint = (0.0, 0.0, 0.0)
+    in_footprint = False
+
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        at = RE_AT.search(line)
+
+        if RE_FOOTPRINT.match(line):
+            in_footprint = True
+        elif in_footprint and at and line.lstrip().startswith("(at"):
+            # The first location of a footprint is its own
+            footprint = tuple(float(value or 0) for value in at.groups())
+            in_footprint = False
+        elif RE_HOLE.match(line) and at:
+            # Pads are relative to the footprint, rotated with it (KiCad Y goes down)
+            x, y = float(at.group(1)), float(at.group(2))
+            angle = radians(footprint[2])
+            holes.append((
+                footprint[0] + x * cos(angle) + y * sin(angle),
+                footprint[1] - x * sin(angle) + y * cos(angle)
+            ))
+        elif RE_VIA.match(line) and at:
+            holes.append((float(at.group(1)), float(at.group(2))))
+
+    return np.array(holes) * 1e6
+
+
+def board_set(size, rng):
+    """ The holes of the real board, repeated in a grid of boards to reach the size """
+    holes = read_board_holes()
+    holes -= holes.min(axis=0)
+    pitch = holes.max(axis=0) + 5e6
+    copies = ceil(size / len(holes))
+    columns = ceil(sqrt(copies))
+    offsets = np.array([divmod(copy, columns) for copy in range(copies)])[:, ::-1] * pitch
+    points = (offsets[:, None, :] + holes[None, :, :]).reshape(-1, 2)
+
+    # Keep whole boards first, then a part of the last one
+    return points[:size] if size >= len(holes) else points[rng.choice(len(holes), size, replace=False)]
+
+
+HOLE_SETS = {
+    "uniform": uniform_set,
+    "clustered": clustered_set,
+    "grid": grid_set,
+    "board": board_set,
+}
+
+
+def nearest_neighbour_length(points):
+    """ @returns The length of the tour always going to the nearest hole not visited """
+    index = GridIndex(points)
+    current = 0
+    index.remove(current)
+    order = [current]
+
+    for _ in range(1, len(points)):
+        current = index.nearest(points[current])
+        index.remove(current)
+        order.append(current)
+
+    return float(point_distance(points[order[:-1]], points[order[1:]]).sum())
+
+
+def run_case(name, size, time_budget, seed):
+    """ Benchmark the tour of a hole set @returns The results as a dictionary """
+    points = HOLE_SETS[name](size, np.random.default_rng(seed))
+
+    start = perf_counter()
+    tour = solve_tour(points, time_budget=time_budget)
+    wall_time = perf_counter() - start
+
+    # Tracing the memory slows Python down, so it is measured on a second run
+    tracemalloc.start()
+    solve_tour(points, time_budget=time_budget)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    baseline = nearest_neighbour_length(points)
+
+    return {
+        "set": name,
+        "size": size,
+        "wall_time": wall_time,
+        "peak_memory": peak_memory,
+        "length": tour.length,
+        "nearest_neighbour_length": baseline,
+        "ratio_to_nearest_neighbour": tour.length / baseline if baseline else 1.0,
+        "lower_bound": tour.lower_bound,
+        "gap_percent": 100 * (tour.length / tour.lower_bound - 1) if tour.lower_bound else None,
+    }
+
+
+def compare(results, previous):
+    """ Report the changes from a previous run """
+    before = {(case["set"], case["size"]): case for case in previous["cases"]}
+
+    click.echo(f"\nChanges since {previous['version']} ({previous['date']}):")
+
+    for case in results["cases"]:
+        old = before.get((case["set"], case["size"]))
+
+        if old is None:
+            continue
+
+        time_change = 100 * (case["wall_time"] / old["wall_time"] - 1) if old["wall_time"] else 0
+        length_change = 100 * (case["length"] / old["length"] - 1) if old["length"] else 0
+
+        click.echo(
+            f"{case['set']:>10} {case['size']:>7}: "
+            f"time {time_change:+6.1f}%, length {length_change:+6.2f}%"
+        )
+
+
+@click.command()
+@click.option(
+    '-o', '--output', type=click.Path(dir_okay=False), default="benchmark_tour.json",
+    help='JSON file to save the results into')
+@click.option(
+    '-c', '--compare', 'previous', type=click.Path(exists=True, dir_okay=False), default=None,
+    help='JSON file of a previous run to compare with')
+@click.option(
+    '-s', '--size', 'sizes', type=click.IntRange(min=1), multiple=True,
+    help='Size of the hole sets. Repeat for several sizes. Defaults to 10 to 100000')
+@click.option(
+    '--set', 'sets', type=click.Choice(list(HOLE_SETS)), multiple=True,
+    help='Hole set to run. Repeat for several sets. Defaults to all')
+@click.option(
+    '-t', '--time-budget', type=click.FloatRange(min=0), default=None,
+    help='Seconds allowed to optimize each tour. By default, until no better tour is found')
+@click.option('--seed', type=int, default=0, help='Seed of the random hole sets')
+def main(output, previous, sizes, sets, time_budget, seed):
+    """ Benchmark the travel optimization """
+    results = {
+        "version": importlib.metadata.version("k2g"),
+        "solver_version": TOUR_SOLVER_VERSION,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cpu_count": os.cpu_count(),
+        "time_budget": time_budget,
+        "cases": [],
+    }
+
+    click.echo(f"{'set':>10} {'size':>7} {'time (s)':>9} {'memory (MB)':>12} "
+               f"{'length (mm)':>12} {'vs NN':>6} {'gap':>7}")
+
+    for name in sets or HOLE_SETS:
+        for size in sizes or SIZES:
+            case = run_case(name, size, time_budget, seed)
+            results["cases"].append(case)
+            gap = "-" if case["gap_percent"] is None else f"{case['gap_percent']:.1f}%"
+
+            click.echo(
+                f"{name:>10} {size:>7} {case['wall_time']:>9.3f} "
+                f"{case['peak_memory'] / 2**20:>12.1f} {case['length'] / 1e6:>12.1f} "
+                f"{case['ratio_to_nearest_neighbour']:>6.3f} {gap:>7}"
+            )
+
+    with open(output, "w", encoding="utf-8") as json_file:
+        json.dump(results, json_file, indent=2)
+
+    if previous:
+        with open(previous, encoding="utf-8") as json_file:
+            compare(results, json.load(json_file))
+
+
+if __name__ == '__main__':
+    main()
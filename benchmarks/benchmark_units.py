@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Micro-benchmark of the quantities.
+
+The geometry goes through the Quantity and Unit objects (creation, conversion,
+ comparison, hashing...) for every hole, so their cost adds up on dense boards.
+Each operation is timed on its own, and reported in nanoseconds per call.
+
+The results are saved as JSON. Given the results of a previous run, the changes are
+ reported, so regressions show up between versions.
+
+Usage:
+    python benchmarks/benchmark_units.py -o results.json [-c previous.json]
+"""
+from datetime import datetime
+from timeit import Timer
+import importlib.metadata
+import json
+import platform
+
+import click
+
+from k2g.units import Length, nm, um, mm, inch
+
+
+# The operations to time, with the objects they use
+SETUP = {
+    "whole": nm(1234567),
+    "fraction": mm(0.8),
+    "other": inch(0.1),
+    "resolution": um(1),
+    "nm": nm,
+    "mm": mm,
+    "inch": inch,
+    "Length": Length,
+}
+
+OPERATIONS = {
+    "create": "nm(1234567)",
+    "create_float": "mm(0.8)",
+    "from_string": "Length.from_string('0.8mm')",
+    "multiply": "0.8 * mm",
+    "convert_whole": "whole(mm)",
+    "convert_fraction": "fraction(nm)",
+    "convert_inch": "other(mm)",
+    "add": "whole + fraction",
+    "compare": "whole < fraction",
+    "equal": "fraction == other",
+    "hash": "hash(fraction)",
+    "round": "fraction.round(resolution)",
+    "repr": "repr(whole)",
+}
+
+
+def time_operation(statement, repeat=5):
+    """ @returns The best time of a call in ns """
+    timer = Timer(statement, globals=SETUP)
+    number, _ = timer.autorange()
+
+    return min(timer.repeat(repeat, number)) / number * 1e9
+
+
+def compare(results, previous):
+    """ Report the changes from a previous run """
+    click.echo(f"\nChanges since {previous['version']} ({previous['date']}):")
+
+    for name, time in results["operations"].items():
+        old = previous["operations"].get(name)
+
+        if old:
+            click.echo(f"{name:>18}: {100 * (time / old - 1):+6.1f}%")
+
+
+@click.command()
+@click.option(
+    '-o', '--output', type=click.Path(dir_okay=False), default="benchmark_units.json",
+    help='JSON file to save the results into')
+@click.option(
+    '-c', '--compare', 'previous', type=click.Path(exists=True, dir_okay=False), default=None,
+    help='JSON file of a previous run to compare with')
+def main(output, previous):
+    """ Benchmark the quantities """
+    results = {
+        "version": importlib.metadata.version("k2g"),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "operations": {},
+    }
+
+    click.echo(f"{'operation':>18} {'time (ns)':>10}")
+
+    for name, statement in OPERATIONS.items():
+        results["operations"][name] = time_operation(statement)
+        click.echo(f"{name:>18} {results['operations'][name]:>10.0f}")
+
+    with open(output, "w", encoding="utf-8") as json_file:
+        json.dump(results, json_file, indent=2)
+
+    if previous:
+        with open(previous, encoding="utf-8") as json_file:
+            compare(results, json.load(json_file))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Fitting of lines and arcs to the polylines of the routed paths.
+
+KiCad curves come as many short segments. Each segment is a block for the
+ controller, and short blocks starve its look-ahead, so it slows down.
+The fitting merges the runs of points which lie on a line, or on an arc, within a
+ tolerance, into a single move.
+Starting from the first point, the longest run fitting a line, then the longest
+ run fitting an arc, is searched by galloping (checking runs of 2, 4, 8... points,
+ then bisecting), each check being a vectorized test of all the points of the run.
+ The longer of the 2 makes the move, and the search restarts from its end.
+A run fits an arc if the circle through its first, middle and last points passes
+ within the tolerance of all its points and of all its segments (the sagitta of
+ each step), and if the points turn around the center in the same direction, by
+ small steps. A larger step is a corner, which is kept.
+"""
+from math import pi, radians
+from typing import List, Tuple
+
+import numpy as np
+
+from .constants import ARC_FITTING_MAX_STEP_ANGLE
+
+
+# A fitted move: The index of its last point, and for an arc, its center and
+# whether it turns clockwise. The center is None for a line.
+FittedMove = Tuple[int, np.ndarray, bool]
+
+
+def fit_line(points: np.ndarray, start: int, stop: int, tolerance: float) -> bool:
+    """
+    @param points: (n, 2) array of the polyline
+    @param start, stop: The first and last points of the run
+    @returns True if the points of the run are on the segment from start to stop
+    """
+    origin = points[start]
+    inner = points[start + 1:stop] - origin
+    direction = points[stop] - origin
+    length = np.hypot(*direction)
+
+    if len(inner) == 0:
+        return True
+
+    if length == 0:
+        return bool(np.hypot(inner[:, 0], inner[:, 1]).max() <= tolerance)
+
+    along = (inner @ direction) / length
+    across = np.abs(inner[:, 0] * direction[1] - inner[:, 1] * direction[0]) / length
+
+    # The points must go forward, or a path going back and forth becomes a line
+    progress = np.diff(np.concatenate(([0.0], along, [length])))
+
+    return bool(across.max() <= tolerance and progress.min() >= -tolerance)
+
+
+def fit_arc(points: np.ndarray, start: int, stop: int, tolerance: float):
+    """
+    @param points: (n, 2) array of the polyline
+    @param start, stop: The first and last points of the run. Requires 3 points or more.
+    @returns The (center, clockwise) of the arc through the points, or None if they
+             are not on an arc
+    """
+    origin = points[start]
+    middle = points[(start + stop) // 2] - origin
+    end = points[stop] - origin
+
+    # Center of the circle through the 3 points, relative to the first point.
+    # A closed arc is left as 2 arcs, since its center could not be told from its ends.
+    determinant = 2 * (middle[0] * end[1] - middle[1] * end[0])
+
+    if determinant == 0 or np.hypot(*end) <= tolerance:
+        return None
+
+    middle_squared, end_squared = middle @ middle, end @ end
+    center = np.array([
+        end[1] * middle_squared - middle[1] * end_squared,
+        middle[0] * end_squared - end[0] * middle_squared,
+    ]) / determinant
+
+    radius = np.hypot(*center)
+    run = points[start:stop + 1] - origin - center
+
+    if np.abs(np.hypot(run[:, 0], run[:, 1]) - radius).max() > tolerance:
+        return None
+
+    # Each step must turn the same way, by a small angle, for less than a full turn
+    angles = np.arctan2(run[:, 1], run[:, 0])
+    steps = np.diff(angles)
+    steps = (steps + pi) % (2 * pi) - pi
+
+    if not (np.all(steps > 0) or np.all(steps < 0)) or abs(steps.sum()) >= 2 * pi or \
+            np.abs(steps).max() > radians(ARC_FITTING_MAX_STEP_ANGLE):
+        return None
+
+    # The segments between the points must not stray from the arc either
+    if radius * (1 - np.cos(np.abs(steps).max() / 2)) > tolerance:
+        return None
+
+    return origin + center, bool(steps[0] < 0)
+
+
+def _gallop(fits, first: int, last: int):
+    """
+    Find the longest run fitting
+    @param fits: Function of the last point of the run, returning None if it does not fit
+    @param first, last: The range of the last point of the run
+    @returns The last point of the longest run found and the result of fits for it,
+             or (None, None) if no run fits
+    """
+    if first > last:
+        return None, None
+
+    result = fits(first)
+
+    if result is None:
+        return None, None
+
+    good, bad, step = first, None, 1
+
+    # Double the run until it does not fit
+    while good < last:
+        candidate = min(good + step, last)
+        candidate_result = fits(candidate)
+
+        if candidate_result is None:
+            bad = candidate
+            break
+
+        good, result = candidate, candidate_result
+        step *= 2
+
+    # Then bisect
+    while bad is not None and bad - good > 1:
+        candidate = (good + bad) // 2
+        candidate_result = fits(candidate)
+
+        if candidate_result is None:
+            bad = candidate
+        else:
+            good, result = candidate, candidate_result
+
+    return good, result
+
+
+def fit_polyline(points: np.ndarray, tolerance: float) -> List[FittedMove]:
+    """
+    Fit lines and arcs to a polyline
+    @param points: (n, 2) array of the points of the polyline
+    @param tolerance: Largest distance from the moves to the points, in the unit of the points
+    @returns The moves, in order. Each starts where the previous one ends.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    last = len(points) - 1
+    moves = []
+    start = 0
+
+    while start < last:
+        line_stop, _ = _gallop(
+            lambda stop: fit_line(points, start, stop, tolerance) or None, start + 1, last)
+        arc_stop, arc = _gallop(
+            lambda stop: fit_arc(points, start, stop, tolerance), start + 2, last)
+
+        if arc_stop is not None and arc_stop > line_stop:
+            moves.append((arc_stop, *arc))
+            start = arc_stop
+        else:
+            moves.append((line_stop, None, False))
+            start = line_stop
+
+    return moves
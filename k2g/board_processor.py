@@ -30,8 +30,10 @@ import sys
 from pathlib import Path
 from logging import getLogger
 
+import numpy as np
+
 from .coordinate import Coordinate
-from .units import nm, degree
+from .units import nm
 from .pcb_inventory import Inventory
 
 
@@ -90,12 +92,21 @@ except:
     raise RuntimeError("Failed to import pcbnew")
 
 
+def tocoords(x, y):
+    """
+    Move KiCAD coordinates (Y going down) to the machine (Y going up, from the bottom
+    left of the board)
+    @param x, y: Numbers or arrays of the coordinates in nm
+    @return The x and y arrays in nm
+    """
+    return np.asarray(x) - tocoord.offset.x, tocoord.offset.y - np.asarray(y)
+
+
 def tocoord(x, y):
     """ @return A traditional coordinate given in Units """
-    return Coordinate(
-        nm(x - tocoord.offset.x),
-        nm(tocoord.offset.y - y)
-    )
+    x, y = tocoords(x, y)
+
+    return Coordinate(nm(x.item()), nm(y.item()))
 
 
 class BoardProcessor:
@@ -132,24 +143,31 @@ class BoardProcessor:
 
     def process_pads(self, pads):
         """ Grab all pads from all footprints and add to the inventory """
+        # Like the vias, the pads are added in one go
+        xs, ys, sizes_x, sizes_y, angles, pths = [], [], [], [], [], []
+
         for pad in pads:
             # Check for pads where drilling or routing is required
             pad_attr = pad.GetAttribute()
 
             if pad_attr in [PAD_ATTRIB_PTH, PAD_ATTRIB_NPTH]:
-                pos = pad.GetPosition()
-                coord = tocoord(pos[0], pos[1])
-                angle = degree(pad.GetOrientationDegrees())
-                size_x = nm(pad.GetDrillSizeX())
-                size_y = nm(pad.GetDrillSizeY())
-                pth = (pad_attr == PAD_ATTRIB_PTH)
+                x, y = pad.GetPosition()
+
+                xs.append(x)
+                ys.append(y)
+                sizes_x.append(pad.GetDrillSizeX())
+                sizes_y.append(pad.GetDrillSizeY())
+                angles.append(pad.GetOrientationDegrees())
+                pths.append(pad_attr == PAD_ATTRIB_PTH)
 
-                # Drill or route?
-                self.inventory.add_hole(
-                    coord, size_x, size_y=size_y, angle=angle, pth=pth)
+        # Drill or route?
+        self.inventory.add_holes(*tocoords(xs, ys), sizes_x, sizes_y, angles, pths)
 
     def process_vias(self, vias):
         """ Grab all vias and add to inventory """
+        # Boards can have thousands of vias, so they are added in one go
+        xs, ys, sizes = [], [], []
+
         for via in vias:
             hole_sz = via.GetDrillValue()
 
@@ -164,7 +182,11 @@ class BoardProcessor:
             # Check the via is through - discard other holes
             x, y = via.GetStart()
 
-            self.inventory.add_hole(tocoord(x, y), nm(hole_sz))
+            xs.append(x)
+            ys.append(y)
+            sizes.append(hole_sz)
+
+        self.inventory.add_holes(*tocoords(xs, ys), sizes)
 
     def process_edge_shapes(self, shapes):
         """ Grab all edge drawing elements """
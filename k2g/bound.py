@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Lower bound of the cost of a tour, to tell how far a tour is from the optimal.
+
+A tour is an open path through all the points (entries, exits and start point), the
+ travel along a segment being free. A path is a spanning tree, so no tour can cost
+ less than the minimum spanning tree (MST) of the points.
+
+Small sets get the exact MST (Prim's algorithm), which takes n² time.
+For larger sets, the MST is searched on the nearest neighbours graph (the same data
+ as the tour engines use) so the time grows linearly. That graph may miss some edges
+ of the true MST, which would make the bound too high. So every point is also linked to a
+ virtual hub, for half the cost of reaching its farthest neighbour. Any missing edge
+ is at least as long as the farthest neighbour of both its ends, so going through
+ the hub is never more expensive than the missing edge. The hub itself is not a
+ point to visit, so its cheapest link is taken back off the bound.
+"""
+import numpy as np
+
+from .constants import TOUR_BOUND_EXACT_MAX_SIZE, TOUR_NEIGHBOURS
+from .cost import CostModel, EuclideanCost
+from .spatial import GridIndex
+
+
+def exact_spanning_tree_bound(points: np.ndarray, partner: np.ndarray,
+                              cost: CostModel=None) -> float:
+    """
+    Lower bound of the cost of a tour from the exact MST of the points (Prim's algorithm)
+    @param points: Array of (n, 2) of the points
+    @param partner: The point joined for free to each point (the other end of a segment),
+                    or -1
+    @param cost: The cost model. Defaults to the euclidean distance.
+    @returns The lower bound
+    """
+    cost = cost or EuclideanCost()
+    x, y = points[:, 0], points[:, 1]
+    done = np.zeros(len(points), dtype=bool)
+    best = np.full(len(points), np.inf)
+    best[0] = 0.0
+    total = 0.0
+
+    for _ in range(len(points)):
+        point = int(np.argmin(best))
+        total += float(cost.lower_bound(best[point]))
+        done[point] = True
+
+        distance = np.hypot(x - x[point], y - y[point])
+        distance[done] = np.inf
+        np.minimum(best, distance, out=best)
+        best[point] = np.inf
+
+        # The other end of a segment comes for free
+        if partner[point] >= 0 and not done[partner[point]]:
+            best[partner[point]] = 0.0
+
+    return total
+
+
+def _merge(label, pairs):
+    """
+    Merge the components joined by the pairs
+    @param label: The component of each node, given as the smallest node of the component
+    @param pairs: (m, 2) array of the components to join
+    @returns The new component of each node
+    """
+    parent = np.arange(len(label))
+    first, second = pairs[:, 0], pairs[:, 1]
+
+    while True:
+        # Compress the paths to the roots
+        while True:
+            grand_parent = parent[parent]
+
+            if np.array_equal(grand_parent, parent):
+                break
+
+            parent = grand_parent
+
+        roots_first, roots_second = parent[first], parent[second]
+        apart = roots_first != roots_second
+
+        if not apart.any():
+            return parent[label]
+
+        # Hook the larger root under the smaller one, which never creates a loop
+        np.minimum.at(
+            parent,
+            np.maximum(roots_first[apart], roots_second[apart]),
+            np.minimum(roots_first[apart], roots_second[apart])
+        )
+
+
+def spanning_tree_weight(num_nodes: int, first: np.ndarray, second: np.ndarray,
+                         weights: np.ndarray) -> float:
+    """
+    Weight of the minimum spanning forest of a graph, using Borůvka's algorithm:
+    each component takes the lightest edge leaving it, until no edge joins 2 components.
+    @param num_nodes: Number of nodes of the graph
+    @param first, second: The nodes at both ends of each edge
+    @param weights: The weight of each edge
+    @returns The total weight of the forest
+    """
+    # Sorting the edges once breaks the ties consistently, which is required for Borůvka
+    order = np.argsort(weights, kind="stable")
+    first, second, weights = first[order], second[order], weights[order]
+    label = np.arange(num_nodes)
+    total = 0.0
+
+    while True:
+        ends = np.column_stack((label[first], label[second]))
+        crossing = ends[:, 0] != ends[:, 1]
+        first, second, weights, ends = first[crossing], second[crossing], weights[crossing], ends[crossing]
+
+        if len(weights) == 0:
+            return total
+
+        # The edges are sorted, so the first edge seen for a component is its lightest
+        _, seen = np.unique(ends.ravel(), return_index=True)
+        chosen = np.unique(seen // 2)
+
+        total += float(weights[chosen].sum())
+        label = _merge(label, ends[chosen])
+
+
+def spanning_tree_bound(nbrs: np.ndarray, nbrs_distance: np.ndarray,
+                        links: np.ndarray=None, cost: CostModel=None) -> float:
+    """
+    Lower bound of the cost of a tour from the nearest neighbours of the points
+    @param nbrs, nbrs_distance: (n, k) arrays of the indexes and euclidean distances of
+                                the nearest neighbours of each point, nearest first
+    @param links: Optional (m, 2) array of the points joined for free, such as the ends
+                  of a segment
+    @param cost: The cost model. Defaults to the euclidean distance.
+    @returns The lower bound
+    """
+    cost = cost or EuclideanCost()
+    num_points, k = nbrs.shape
+
+    if k == 0:
+        return 0.0
+
+    links = np.empty((0, 2), dtype=np.intp) if links is None else np.asarray(links, dtype=np.intp)
+    hub_costs = cost.lower_bound(nbrs_distance[:, -1]) / 2
+    points = np.arange(num_points)
+
+    # Edges to the neighbours, to the hub (numbered num_points), then the free links
+    first = np.concatenate((np.repeat(points, k), points, links[:, 0]))
+    second = np.concatenate((nbrs.ravel(), np.full(num_points, num_points), links[:, 1]))
+    weights = np.concatenate((
+        cost.lower_bound(nbrs_distance.ravel()), hub_costs, np.zeros(len(links))))
+
+    weight = spanning_tree_weight(num_points + 1, first, second, weights)
+
+    return max(weight - float(hub_costs.min()), 0.0)
+
+
+def tour_lower_bound(entries: np.ndarray, exits: np.ndarray, start: np.ndarray=None,
+                     cost: CostModel=None, knn=None, neighbours: int=TOUR_NEIGHBOURS) -> float:
+    """
+    Lower bound of the cost of a tour
+    @param entries, exits: Arrays of (n, 2) of the entry and exit point of each stop
+    @param start: Optional (x, y) point the tour starts from
+    @param cost: The cost model. Defaults to the euclidean distance.
+    @param knn: Optional nearest neighbours of the entries, as returned by GridIndex.knn,
+                to save searching them again. Only used when there are no segments and
+                no start point.
+    @param neighbours: Number of nearest neighbours searched for each point
+    @returns The lower bound
+    """
+    entries = np.asarray(entries, dtype=float).reshape(-1, 2)
+    exits = np.asarray(exits, dtype=float).reshape(-1, 2)
+    segments = np.flatnonzero(np.any(entries != exits, axis=1))
+
+    if len(entries) == 0:
+        return 0.0
+
+    # The points are the entries, then the exits of the segments, then the start
+    points = [entries, exits[segments]]
+
+    if start is not None:
+        points.append(np.asarray(start, dtype=float).reshape(1, 2))
+
+    points = np.vstack(points)
+    links = np.column_stack((segments, len(entries) + np.arange(len(segments))))
+
+    if len(points) <= TOUR_BOUND_EXACT_MAX_SIZE:
+        partner = np.full(len(points), -1, dtype=np.intp)
+        partner[links[:, 0]], partner[links[:, 1]] = links[:, 1], links[:, 0]
+
+        return exact_spanning_tree_bound(points, partner, cost)
+
+    if knn is None or len(points) != len(entries):
+        knn = GridIndex(points).knn(neighbours)
+
+    return spanning_tree_bound(*knn, links, cost)
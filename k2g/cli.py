@@ -21,12 +21,41 @@
 Entry module for the package.
 Provides the command line tool.
 """
+import asyncio
+import os
 import sys
 import click
 
-from .machining import Machining, Operations
+from .machining import Machining, Operations, load_plan, save_plan
 from .board_processor import BoardProcessor
 from .rack import RackManager
+from .panel import Panel
+from .coordinate import Coordinate
+from .units import Length
+from .streaming import StreamingError, stream_machine_code
+
+
+def get_panel(kwargs):
+   """ @returns The panel from the options, or None """
+   def length(value):
+      try:
+         return Length.from_string(value)
+      except AssertionError as exception:
+         raise click.BadParameter(f"'{value}' is not a length") from exception
+
+   if kwargs['panel']:
+      if not kwargs['pitch']:
+         raise click.UsageError("--panel requires --pitch")
+
+      columns, rows = kwargs['panel']
+      pitch_x, pitch_y = (length(value) for value in kwargs['pitch'])
+
+      return Panel.grid(columns, rows, pitch_x, pitch_y)
+
+   if kwargs['offset']:
+      return Panel([Coordinate(length(x), length(y)) for x, y in kwargs['offset']])
+
+   return None
 
 
 @click.command()
@@ -42,9 +71,37 @@ from .rack import RackManager
 @click.option(
    '-a', '--all', is_flag=True,
    default=False, help='Do all operations')
+@click.option(
+   '-t', '--time-budget', type=click.FloatRange(min=0), default=None,
+   help='Seconds allowed to optimize the travels. '
+        'By default, optimize until no better solution is found')
+@click.option(
+   '-j', '--jobs', type=click.IntRange(min=0), default=None,
+   help='Number of processes optimizing the tools in parallel. 0 uses all CPU cores')
+@click.option(
+   '--no-cache', is_flag=True, default=False,
+   help='Optimize the travels again, without reading nor saving the cached tours')
+@click.option(
+   '--plan', type=click.Path(dir_okay=False), default=None,
+   help='File holding the order of the holes. If it exists, the order of the previous '
+        'revision of the board is reused. The new order is saved to it')
+@click.option(
+   '--panel', type=click.IntRange(min=1), nargs=2, default=None,
+   metavar='COLUMNS ROWS',
+   help='Machine a panel of COLUMNS x ROWS copies of the board. Requires --pitch')
+@click.option(
+   '--pitch', type=str, nargs=2, default=None, metavar='X Y',
+   help='Distance between the copies of the panel, like 55mm 40mm')
+@click.option(
+   '--offset', type=str, nargs=2, multiple=True, metavar='X Y',
+   help='Offset of a copy of the board. Repeat for each copy to create a panel')
 @click.option(
    '-o', '--output', type=click.File("wt"), default=sys.stdout,
    help='Specify an output file name. Defaults to stdout')
+@click.option(
+   '--send', type=str, default=None, metavar='PORT',
+   help='Stream the GCode to the controller as it is generated, rather than writing it. '
+        'PORT is a serial port (like /dev/ttyUSB0 or COM3) or a TCP socket (tcp://host:port)')
 @click.argument('filename', type=click.Path(exists=True, readable=True))
 @click.pass_context
 def main(*_, **kwargs):
@@ -82,7 +139,7 @@ def main(*_, **kwargs):
    processor = BoardProcessor(kwargs['filename'])
 
    # Create a machining object for our operations
-   machining = Machining(processor.inventory)
+   machining = Machining(processor.inventory, get_panel(kwargs))
 
    # Process the inventory for the given operations
    required_rack = machining.process(ops)
@@ -100,11 +157,29 @@ def main(*_, **kwargs):
    # Prepare the code generating by forcing the new rack
    machining.use_rack(rack)
 
+   # Reuse the order of a previous revision of the board
+   previous_plan = None
+
+   if kwargs['plan'] and os.path.exists(kwargs['plan']):
+      previous_plan = load_plan(kwargs['plan'])
+
    # Optimize all displacements
-   machining.optimize()
+   machining.optimize(
+      kwargs['time_budget'], kwargs['jobs'], not kwargs['no_cache'], previous_plan)
+
+   if kwargs['plan']:
+      save_plan(machining.plan, kwargs['plan'])
 
    # Generate the GCode
-   machining.generate_machine_code(kwargs["output"])
+   if kwargs['send']:
+      try:
+         lines = asyncio.run(stream_machine_code(machining, kwargs['send']))
+      except (StreamingError, OSError) as exception:
+         raise click.ClickException(str(exception)) from exception
+
+      click.echo(f"{lines} lines sent")
+   else:
+      machining.generate_machine_code(kwargs["output"])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Modal compaction of the G-code.
+
+Most G-code words are modal: they stay in effect until changed. The profiles
+ emit them again and again (G90, the feedrate, an unchanged Z...), so the compactor
+ tracks the modal state of the machine line after line, and drops the words which
+ would not change it. The motion is left unchanged.
+To remain safe, only the common words are understood:
+ - The modal groups: motion (G0 G1 G2 G3 G80 and the canned cycles G81 to G89),
+   plane, distance, units, retract mode, cutter compensation, tool length offset,
+   coordinate system and feedrate mode
+ - The feedrate (F), and the position (X, Y, Z) in absolute mode
+ - The spindle, coolant and tool words (S, T, M3, M4, M5, M8, M9)
+Anything else (a subprogram call, a tool change, a pause, a program number, a line
+ which is not made of words only...) is kept as is, and the state is forgotten.
+Within a canned cycle, a line of coordinates drills a hole, so it is never dropped,
+ and the Z and R words are the parameters of the cycle.
+Optionally, the trailing zeros of the numbers are trimmed (1.500 becomes 1.5).
+"""
+import re
+
+
+# A line made of words only, like G0 X1.5 Y-2
+_RE_BLOCK = re.compile(r"(?:\s*[A-Z]\s*[-+]?(?:\d+\.?\d*|\.\d+))+\s*")
+_RE_WORD = re.compile(r"([A-Z])\s*([-+]?(?:\d+\.?\d*|\.\d+))")
+
+# The G codes of each modal group, by group name
+MODAL_GROUPS = {
+    "motion": {0, 1, 2, 3, 80, 81, 82, 83, 84, 85, 86, 87, 88, 89},
+    "plane": {17, 18, 19},
+    "distance": {90, 91},
+    "units": {20, 21},
+    "retract": {98, 99},
+    "cutter": {40},
+    "length": {49},
+    "coordinate": {54, 55, 56, 57, 58, 59},
+    "feed": {93, 94},
+}
+
+_GROUP_OF = {code: group for group, codes in MODAL_GROUPS.items() for code in codes}
+
+# The motions which can be given again without any effect, and the canned cycles
+_MOVES = {0, 1, 2, 3}
+_CYCLES = {81, 82, 83, 84, 85, 86, 87, 88, 89}
+
+# M codes which do not move the machine, nor change the modal state tracked.
+# The pauses and tool changes are not, since the machine may be moved meanwhile.
+_STILL_M_CODES = {3, 4, 5, 7, 8, 9}
+
+_AXES = ("X", "Y", "Z")
+
+
+def trim_number(text: str) -> str:
+    """ @returns The number without its trailing zeros, like 1.5 for 1.500 """
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+
+    # Zero has no sign
+    return "0" if text.lstrip("+-") in ("", "0") else text
+
+
+class ModalCompactor:
+    """
+    Compact the lines of G-code, given in order. Call with each line.
+    """
+    def __init__(self, compact: bool=True, trim_zeros: bool=False):
+        """
+        @param compact: Drop the words which do not change the modal state
+        @param trim_zeros: Trim the trailing zeros of the numbers
+        """
+        self.compact = compact
+        self.trim_zeros = trim_zeros
+        self.reset()
+
+    def reset(self):
+        """ Forget the state of the machine """
+        # Mode of each modal group
+        self.modes = {}
+        self.feed = None
+        self.position = dict.fromkeys(_AXES)
+
+    def __call__(self, line: str) -> str:
+        """ @returns The compacted line, or None if nothing is left of it """
+        if line.startswith("("):
+            # Comments change nothing
+            return line
+
+        if line.startswith("O") or not _RE_BLOCK.fullmatch(line):
+            # A program starts from any state
+            self.reset()
+            return line
+
+        words = [(letter, float(text), text) for letter, text in _RE_WORD.findall(line)]
+
+        if self.trim_zeros:
+            words = [(letter, value, trim_number(text)) for letter, value, text in words]
+
+        codes = [(letter, value) for letter, value, _ in words if letter in "GM"]
+        known = all(
+            (letter == "G" and value in _GROUP_OF) or (letter == "M" and value in _STILL_M_CODES)
+            for letter, value in codes
+        )
+
+        if not self.compact or not known:
+            if not known:
+                self.reset()
+
+            return " ".join(letter + text for letter, _, text in words)
+
+        kept = self._compact(words)
+
+        return " ".join(letter + text for letter, _, text in kept) or None
+
+    def _compact(self, words):
+        """ @returns The words of a line of known codes which change the state """
+        kept = []
+        motion = self.modes.get("motion")
+
+        for word in words:
+            letter, value, _ = word
+
+            if letter == "G":
+                group = _GROUP_OF[value]
+
+                if group == "motion":
+                    motion = value
+
+                # Moves and modes given again change nothing. Canned cycles start a cycle.
+                if self.modes.get(group) == value and (group != "motion" or value in _MOVES):
+                    continue
+
+                self.modes[group] = value
+            elif letter == "F":
+                # In inverse time (G93), the feedrate is given for each move
+                if self.feed == value and self.modes.get("feed") != 93:
+                    continue
+
+                self.feed = value
+
+            if letter not in _AXES:
+                kept.append(word)
+
+        axes = [word for word in words if word[0] in _AXES]
+        absolute = self.modes.get("distance") == 90
+
+        if motion in _MOVES and absolute:
+            # Drop the axes already there
+            moved = [word for word in axes if self.position[word[0]] != word[1]]
+        elif motion in _CYCLES and absolute:
+            # Each line of coordinates drills a hole. Z and R are the cycle parameters.
+            moved = [word for word in axes if word[0] == "Z" or self.position[word[0]] != word[1]]
+
+            if axes and not [word for word in moved if word[0] != "Z"]:
+                moved = axes
+        else:
+            moved = axes
+
+        for letter, value, _ in axes:
+            self.position[letter] = value if absolute else None
+
+        if motion in _CYCLES:
+            # The cycles retract the Z, and do not move it to the depth given
+            self.position["Z"] = None
+
+        # Keep the order of the words
+        return [word for word in words if word in kept or word in moved]
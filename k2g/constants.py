@@ -42,3 +42,53 @@ YAML_FILE_RENAME_SUFFIX=".yaml.old"
 # Section names for the configuration.
 # A matching schema file must exists as SCHEMA_PATH/<section_name>SCHEMA_FILE__FILENAME_SUFFIX
 CONFIG_SECTIONS = ["global_settings", "machining_data", "stock", "rack"]
+
+# Largest number of stops in a tour which is solved exactly (dynamic programming).
+# The cost grows as n².2ⁿ, so this must remain small
+TOUR_EXACT_MAX_SIZE = 10
+
+# Number of nearest neighbours considered by the tour heuristics for each stop
+TOUR_NEIGHBOURS = 10
+
+# Largest number of points whose minimum spanning tree is computed exactly for the
+# lower bound of a tour. The cost grows as n²
+TOUR_BOUND_EXACT_MAX_SIZE = 2000
+
+# Average number of points in each cell of the spatial index grid
+GRID_POINTS_PER_CELL = 2
+
+# Version of the tour engines. Increment when a change to the solvers gives different
+# tours, so the tours saved in the cache are no longer used
+TOUR_SOLVER_VERSION = 3
+
+# Smallest number of stops (of all the tools solved) worth starting the processes of
+# a parallel optimization
+TOUR_PARALLEL_MIN_STOPS = 1000
+
+# Location of the cache of the optimized tours (within the configuration folder)
+TOUR_CACHE_PATH = CONFIG_USER_PATH + "/cache"
+
+# Share of new stops in a tour above which repairing the previous tour is not worth it,
+# and the tour is solved from scratch
+TOUR_REPAIR_MAX_CHANGES = 0.2
+
+# Number of the first subprogram in the generated GCode. Each tool uses 2 numbers
+# (the board visited forwards, then backwards)
+SUBPROGRAM_FIRST_NUMBER = 1000
+
+# Default number of characters of G-code gathered before writing to the output
+GCODE_BUFFER_SIZE = 256 * 1024
+
+# Number of characters of G-code generated at once when streaming to a controller.
+# Kept small, so the first lines are sent while the rest is generated
+STREAM_CHUNK_SIZE = 4 * 1024
+
+# Number of chunks of G-code generated ahead of the sending when streaming
+STREAM_QUEUE_SIZE = 16
+
+# Largest angle in degrees between 2 points of a polyline fitted with an arc. Curves are
+# flattened in smaller steps, so a larger step is a corner of the path
+ARC_FITTING_MAX_STEP_ANGLE = 30
+
+# Smallest number of operations worth rendering the G-code in several processes
+GCODE_PARALLEL_MIN_OPS = 50000
@@ -42,9 +42,22 @@ class RoundToCNCResolution:
     # Store the CNC resolution
     __resolution__ = gs.resolution
 
+    # The lengths given in other units than the nm are mostly the same few settings
+    # (heights, depths...), so their rounding is kept
+    __rounded__ = {}
+
     @classmethod
     def round(cls, value: Length):
-        return value.round(cls.__resolution__)
+        if value.base_unit.conversion_factor == 1:
+            return value.round(cls.__resolution__)
+
+        key = (value.value, value.base_unit.name)
+        rounded = cls.__rounded__.get(key)
+
+        if rounded is None:
+            rounded = cls.__rounded__[key] = value.round(cls.__resolution__)
+
+        return rounded
 
     def __mul__(self, other: Length):
         return self.round(other)
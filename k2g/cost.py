@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Cost models of the travel between 2 points.
+
+The travel optimization minimizes a cost, which can be the distance (in nm), or
+ the time (in seconds) taken by the machine to get there.
+For the time, each axis moves on its own during a rapid (G0) move, accelerating up
+ to its max rate, then decelerating (trapezoidal velocity profile). The move is over
+ when the slowest axis arrives.
+
+All models work on the deltas of the coordinates (in nm), either as numpy arrays
+ (used by the distance kernel) or as Python floats (used by the local search).
+"""
+from math import hypot, sqrt
+
+import numpy as np
+
+
+class CostModel:
+    """ Abstract base class of all cost models """
+    # Changes of the cost smaller than this are rounding errors
+    epsilon = 1e-3
+
+    def travel(self, delta_x: np.ndarray, delta_y: np.ndarray) -> np.ndarray:
+        """ @returns The cost of moving by the deltas (arrays) """
+        raise NotImplementedError
+
+    def between(self, from_x: float, from_y: float, to_x: float, to_y: float) -> float:
+        """ @returns The cost of moving from a point to another (scalars) """
+        raise NotImplementedError
+
+    def lower_bound(self, distances: np.ndarray) -> np.ndarray:
+        """ @returns The smallest possible costs of moves of the given lengths (in nm) """
+        raise NotImplementedError
+
+    def format(self, cost: float) -> str:
+        """ @returns The cost as a human readable string """
+        raise NotImplementedError
+
+
+class EuclideanCost(CostModel):
+    """ The cost is the length of the straight line between the points """
+    def travel(self, delta_x, delta_y):
+        return np.hypot(delta_x, delta_y)
+
+    def between(self, from_x, from_y, to_x, to_y):
+        return hypot(to_x - from_x, to_y - from_y)
+
+    def lower_bound(self, distances):
+        return np.asarray(distances, dtype=float)
+
+    def format(self, cost):
+        return f"{cost / 1e6:.1f}mm"
+
+    def __repr__(self):
+        return "EuclideanCost()"
+
+
+class KinematicCost(CostModel):
+    """
+    The cost is the time taken by a rapid move, the axes moving independently.
+    For each axis, short moves never reach the max rate: t = 2.sqrt(d/a).
+    Longer moves accelerate, cruise, then decelerate: t = d/v + v/a
+    """
+    epsilon = 1e-6
+
+    def __init__(self, rate_x: float, rate_y: float, acceleration_x: float, acceleration_y: float):
+        """
+        @param rate_x, rate_y: Max rate of each axis in nm/s
+        @param acceleration_x, acceleration_y: Acceleration of each axis in nm/s²
+        """
+        self.rates = (float(rate_x), float(rate_y))
+        self.accelerations = (float(acceleration_x), float(acceleration_y))
+
+        # Distance from which the axis reaches its max rate
+        self.cruise = tuple(v * v / a for v, a in zip(self.rates, self.accelerations))
+
+    def _axis_time(self, axis, distance):
+        """ Time taken by an axis to move by the distances (array) """
+        rate, acceleration = self.rates[axis], self.accelerations[axis]
+        distance = np.abs(distance)
+
+        return np.where(
+            distance >= self.cruise[axis],
+            distance / rate + rate / acceleration,
+            2 * np.sqrt(distance / acceleration)
+        )
+
+    def travel(self, delta_x, delta_y):
+        return np.maximum(self._axis_time(0, delta_x), self._axis_time(1, delta_y))
+
+    def between(self, from_x, from_y, to_x, to_y):
+        longest = 0.0
+
+        for distance, rate, acceleration, cruise in (
+            (abs(to_x - from_x), self.rates[0], self.accelerations[0], self.cruise[0]),
+            (abs(to_y - from_y), self.rates[1], self.accelerations[1], self.cruise[1]),
+        ):
+            if distance >= cruise:
+                time = distance / rate + rate / acceleration
+            else:
+                time = 2 * sqrt(distance / acceleration)
+
+            longest = max(longest, time)
+
+        return longest
+
+    def lower_bound(self, distances):
+        # One of the axes moves by at least d/sqrt(2)
+        shortest = np.asarray(distances, dtype=float) / sqrt(2)
+
+        return np.minimum(self._axis_time(0, shortest), self._axis_time(1, shortest))
+
+    def format(self, cost):
+        return f"{cost:.2f}s"
+
+    def __repr__(self):
+        return f"KinematicCost(rates={self.rates!r}, accelerations={self.accelerations!r})"
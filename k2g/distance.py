@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Distance kernel shared by the travel optimizations.
+
+All functions work on numpy arrays of (n, 2) coordinates (in nm) and rely on
+ broadcasting rather than Python loops.
+A full distance matrix grows as n², so it is computed by blocks of rows, which
+ bounds the size of the temporary arrays.
+The 'distance' can be any cost model, such as the travel time of the machine.
+ See the cost module. It defaults to the euclidean distance.
+"""
+import numpy as np
+
+from .cost import CostModel
+
+
+# Number of rows of a distance matrix computed at once
+BLOCK_SIZE = 1024
+
+
+def point_distance(sources: np.ndarray, targets: np.ndarray, cost: CostModel=None) -> np.ndarray:
+    """
+    @param cost: The cost model. Defaults to the euclidean distance.
+    @returns The distance from each source to the target of the same index
+    """
+    delta = np.asarray(targets) - np.asarray(sources)
+
+    if cost is None:
+        return np.hypot(delta[..., 0], delta[..., 1])
+
+    return cost.travel(delta[..., 0], delta[..., 1])
+
+
+def distance_matrix(sources: np.ndarray, targets: np.ndarray=None, block_size=BLOCK_SIZE,
+                    cost: CostModel=None) -> np.ndarray:
+    """
+    Create the matrix of all distances from the sources to the targets.
+    @param sources: (n, 2) array of coordinates giving the rows
+    @param targets: (m, 2) array of coordinates giving the columns. Defaults to the sources.
+    @param block_size: Number of rows computed at once
+    @param cost: The cost model. Defaults to the euclidean distance.
+    @returns The (n, m) matrix
+    """
+    sources = np.asarray(sources, dtype=float)
+    targets = sources if targets is None else np.asarray(targets, dtype=float)
+    matrix = np.empty((len(sources), len(targets)))
+
+    for start in range(0, len(sources), block_size):
+        end = min(start + block_size, len(sources))
+        matrix[start:end] = point_distance(sources[start:end, None], targets[None], cost)
+
+    return matrix
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Streaming writer of the G-code.
+
+The profiles yield the G-code in chunks of one or more lines, with the indentation of
+ the Python source. The writer gathers the chunks into a buffer. Once the buffer
+ reaches its size, its chunks are split into lines, stripped and numbered all in one
+ go, and written to the stream in a single write. So large files take a few large
+ writes rather than 2 per line, and little work for each line.
+Binary streams are supported too, the buffer being encoded in one go.
+The lines can go through a modal compaction (see the compactor module) before
+ being numbered.
+Lines split beforehand (like the parts rendered by other processes) can be given as
+ well, and only get compacted and numbered.
+"""
+from io import BufferedIOBase, RawIOBase
+from typing import List
+
+from .constants import GCODE_BUFFER_SIZE
+
+
+# Encoding of the G-code written to binary streams
+ENCODING = "utf-8"
+
+
+def split_lines(chunks) -> List[str]:
+    """ @returns The lines of the chunks, stripped of their spaces, without the empty lines """
+    return [line for line in map(str.strip, "\n".join(chunks).split("\n")) if line]
+
+
+class GCodeWriter:
+    """
+    Write the chunks of G-code to a stream.
+    The writer is called with an iterable of chunks, which is how the profile
+    functions (generators) are given to it.
+    """
+    def __init__(self, stream, line_numbers_increment: int=0,
+                 buffer_size: int=GCODE_BUFFER_SIZE, compactor=None):
+        """
+        @param stream: The text or binary stream to write to
+        @param line_numbers_increment: Increment of the line numbers. 0 for no numbers.
+        @param buffer_size: Number of characters of chunks gathered before writing to the stream
+        @param compactor: Optional ModalCompactor the lines go through before numbering
+        """
+        self.stream = stream
+        self.compactor = compactor
+        self.increment = line_numbers_increment
+        self.buffer_size = buffer_size
+        self.binary = isinstance(stream, (BufferedIOBase, RawIOBase)) or \
+            "b" in getattr(stream, "mode", "")
+
+        # Start the numbering using the initial increment
+        self.numbering = line_numbers_increment
+
+        # Chunks not yet written, and their number of characters
+        self.chunks = []
+        self.size = 0
+
+    def __call__(self, chunks):
+        """ Add the chunks. They are only split into lines once the buffer is full. """
+        for chunk in chunks:
+            self.chunks.append(chunk)
+            self.size += len(chunk)
+
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """ Write the lines gathered so far to the stream """
+        if not self.chunks:
+            return
+
+        # Remove all forward spaces and the empty lines
+        lines = split_lines(self.chunks)
+        self.chunks = []
+        self.size = 0
+
+        self._write(lines)
+
+    def write_lines(self, lines: List[str]):
+        """
+        Write lines already split and stripped (see split_lines), after the chunks
+        gathered so far
+        """
+        self.flush()
+        self._write(list(lines))
+
+    def _write(self, lines: List[str]):
+        """ Compact, number and write the lines to the stream """
+        if not lines:
+            return
+
+        if self.compactor:
+            lines = [line for line in map(self.compactor, lines) if line]
+
+        if self.increment > 0:
+            numbered, numbering, increment = [], self.numbering, self.increment
+
+            for line in lines:
+                # Comments and program numbers are not numbered
+                if line[0] in "(O":
+                    numbered.append(line)
+                else:
+                    numbered.append(f"N{numbering:04} {line}")
+                    numbering += increment
+
+            lines, self.numbering = numbered, numbering
+
+        lines.append("")
+        text = "\n".join(lines)
+        self.stream.write(text.encode(ENCODING) if self.binary else text)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.flush()
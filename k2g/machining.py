@@ -25,22 +25,34 @@ Dimensions are kept as um until the GCode rendering
 """
 
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from enum import IntEnum
 from typing import List, Dict, Set
 from io import BufferedIOBase
 import logging
+import multiprocessing
+import os
 import numpy as np
 
-from python_tsp.exact import solve_tsp_dynamic_programming
-
 # pylint: disable=E0611 # The module is fully dynamic
 from .config import global_settings as gs
 
-from .pcb_inventory import Inventory, Oblong, Hole, Route
+from .pcb_inventory import Inventory, FeatureKind, Oblong, Route
 from .coordinate import Coordinate
-from .rack import Rack
+from .rack import Rack, ToolTable
 from .cutting_tools import DrillBit, RouterBit, CuttingTool
 from .operations import Operations
+from .tour import Tour, solve_tour, repair_tour, closest_end_first
+from .cost import CostModel, EuclideanCost, KinematicCost
+from .tour_cache import TourCache
+from .gcode_writer import GCodeWriter, split_lines
+from .compactor import ModalCompactor
+from .arc_fitting import fit_polyline
+from .renderer import Template, is_compilable, round_lengths, whole_nm
+from .panel import Panel
+from .units import Length, nm, mm, mm_min, mm_s2
 from .context import ctx
+from .constants import SUBPROGRAM_FIRST_NUMBER, GCODE_PARALLEL_MIN_OPS, TOUR_PARALLEL_MIN_STOPS
 
 from .profiles import masso_g3 as profile
 
@@ -48,42 +60,110 @@ from .profiles import masso_g3 as profile
 logger = logging.getLogger(__name__)
 
 
-def optimize_travel(coordinates: List[Coordinate], segments: Set[int]=None) -> List[int]:
+def get_stops(coordinates: List[Coordinate], segments: Set[int]=None):
     """
-    Apply the Travelling Salesman Problem to the positions the CNC will visit.
+    Group the coordinates into the stops of a tour. A stop is a single coordinate, or
+    a segment which starts and ends on consecutive coordinates.
     @param coordinates: A list of coordinates to visit
-    @param segments: Segments in the list. Holds a pair of indexes in the coordinates which
-                     represents the segment. A segment has a traveling cost of 0
-    @returns The permutation list
+    @param segments: Holds the index of the start of each segment in the coordinates
+    @returns A tuple of the stops as (entry index, exit index) and the arrays of the entry
+             and exit points of the stops
     """
     if segments is None:
         segments = set()
 
-    def get_distance_matrix(coordinates):
-        """ Create a matrix of all distance using numpy """
-        num_coords = len(coordinates)
-        distance_matrix = np.zeros((num_coords, num_coords))
+    stops = []
+    index = 0
 
-        for i in range(num_coords):
-            for j in range(i + 1, num_coords):
-                if i in segments and j == i + 1:
-                    distance = 0
-                else:
-                    distance = np.linalg.norm(np.array(coordinates[i]) - np.array(coordinates[j]))
+    while index < len(coordinates):
+        if index in segments:
+            stops.append((index, index + 1))
+            index += 2
+        else:
+            stops.append((index, index))
+            index += 1
+
+    points = np.array([coordinate() for coordinate in coordinates], dtype=float).reshape(-1, 2)
+    entries = points[[entry for entry, _ in stops]]
+    exits = points[[end for _, end in stops]]
 
-                # Assign distance to both (i, j) and (j, i) positions in the matrix
-                distance_matrix[i, j] = distance
-                distance_matrix[j, i] = distance
+    return stops, entries, exits
 
-        return distance_matrix
 
-    if coordinates:
-        distance_matrix = get_distance_matrix(coordinates)
-        permutation, _ = solve_tsp_dynamic_programming(distance_matrix)
+def expand_tour(stops, order) -> List[int]:
+    """
+    Expand the order of the stops back to the coordinates, keeping the segments together
+    @returns The permutation list of the coordinates
+    """
+    permutation = []
+
+    for stop in order:
+        entry, end = stops[stop]
+        permutation.append(entry)
+
+        if end != entry:
+            permutation.append(end)
 
     return permutation
 
 
+def get_cost_model() -> CostModel:
+    """
+    Create the cost model of the travels from the global settings
+    @returns The time of the rapid moves, or the distance
+    """
+    if gs.optimizer.cost_model == "distance":
+        return EuclideanCost()
+
+    # The kernel works in nm and seconds
+    nm_per_mm = mm.conversion_factor
+
+    return KinematicCost(
+        gs.rapids.x.rate(mm_min) * nm_per_mm / 60,
+        gs.rapids.y.rate(mm_min) * nm_per_mm / 60,
+        gs.rapids.x.acceleration(mm_s2) * nm_per_mm,
+        gs.rapids.y.acceleration(mm_s2) * nm_per_mm,
+    )
+
+
+def plan_key(tool: CuttingTool) -> str:
+    """ @returns The name of the tool in a plan """
+    return f"{tool.type.__name__}_{round(tool.diameter.base)}"
+
+
+def save_plan(plan: Dict[str, np.ndarray], path):
+    """ Save a plan (as returned by Machining.plan) to a file """
+    with open(path, "wb") as plan_file:
+        np.savez(plan_file, **plan)
+
+
+def load_plan(path) -> Dict[str, np.ndarray]:
+    """ @returns The plan saved in the file """
+    with np.load(path) as content:
+        return {key: content[key] for key in content.files}
+
+
+def optimize_travel(coordinates: List[Coordinate], segments: Set[int]=None,
+                    time_budget: float=None, cost: CostModel=None) -> List[int]:
+    """
+    Apply the Travelling Salesman Problem to the positions the CNC will visit.
+    @param coordinates: A list of coordinates to visit
+    @param segments: Segments in the list. Holds the index of the start of the segment in
+                     the coordinates. The end of the segment is the next item.
+                     A segment has a traveling cost of 0
+    @param time_budget: Time in seconds allowed to improve the travel. If None, the
+                        improvement stops once no better solution can be found.
+    @param cost: The cost model to minimize. Defaults to the euclidean distance.
+    @returns The permutation list
+    """
+    stops, entries, exits = get_stops(coordinates, segments)
+
+    if not stops:
+        return []
+
+    return expand_tour(stops, solve_tour(entries, exits, time_budget, cost=cost).order)
+
+
 class Move:
     """ Abstract base class for machining actions """
     def __init__(self, start, end) -> None:
@@ -96,9 +176,28 @@ class Move:
         """ Append a move after this one """
         move = self
         while move.next:
-            move = self.next
+            move = move.next
         move.next = next
 
+    def reverse(self):
+        """
+        Travel the moves the other way round
+        @returns The first move, which was the last one
+        """
+        move, previous = self, None
+
+        while move:
+            following = move.next
+            move.swap_ends()
+            move.next = previous
+            previous, move = move, following
+
+        return previous
+
+    def swap_ends(self):
+        """ Travel this move the other way round """
+        self.start, self.end = self.end, self.start
+
     def last(self):
         """ Returns the last combined action """
         current = self
@@ -106,23 +205,96 @@ class Move:
             current = current.next
         return current
 
+    def __iter__(self):
+        """ Iterate over this move and the moves after it """
+        move = self
+        while move:
+            yield move
+            move = move.next
+
 
 class LinearMove(Move):
     """ Machining a straight line (router) """
     pass
 
 class ArcMove(Move):
-    pass
+    """ Machining an arc around a center (router) """
+    def __init__(self, start, end, center, clockwise: bool) -> None:
+        super().__init__(start, end)
+        self.center = center
+        self.clockwise = clockwise
+
+    def swap_ends(self):
+        super().swap_ends()
+        self.clockwise = not self.clockwise
+
+
+def fit_moves(move: Move, tolerance: Length) -> Move:
+    """
+    Merge the runs of lines of a path into fewer lines and arcs (see arc_fitting)
+    @param move: The first move of the path
+    @param tolerance: Largest distance from the new moves to the points of the path.
+                      If 0, the path is kept as is.
+    @returns The first move of the path
+    """
+    if not tolerance or tolerance.base <= 0:
+        return move
+
+    # Runs of lines, each following the previous one
+    runs = []
+
+    for current in move:
+        if isinstance(current, LinearMove) and runs and isinstance(runs[-1][-1], LinearMove) \
+                and runs[-1][-1].end() == current.start():
+            runs[-1].append(current)
+        else:
+            runs.append([current])
+
+    moves = []
+
+    for run in runs:
+        if len(run) < 2 or not isinstance(run[0], LinearMove):
+            moves.extend(run)
+            continue
+
+        coordinates = [run[0].start] + [line.end for line in run]
+        start = 0
+
+        for stop, center, clockwise in fit_polyline(
+                np.array([coordinate() for coordinate in coordinates]), tolerance.base):
+            if center is None:
+                moves.append(LinearMove(coordinates[start], coordinates[stop]))
+            else:
+                center = Coordinate(nm(int(round(center[0]))), nm(int(round(center[1]))))
+                moves.append(ArcMove(coordinates[start], coordinates[stop], center, clockwise))
+
+            start = stop
+
+    for current, following in zip(moves, moves[1:] + [None]):
+        current.next = following
+
+    return moves[0]
+
+
+class RouteDirection(IntEnum):
+    """ Constraint on the direction of a routed path """
+    ANY = 0           # Both sides are cut (like a slot), so it can be routed both ways
+    CLIMB = 1         # Keep the direction given, for a climb cut
+    CONVENTIONAL = 2  # Keep the direction given, for a conventional cut
 
 
 class MachiningOperation:
     """
     A single machining operation which can result in many GCode being issued
     """
-    def __init__(self, origin: Coordinate, tool: CuttingTool) -> None:
+    def __init__(self, origin: Coordinate, tool: CuttingTool,
+                 direction: RouteDirection=RouteDirection.ANY) -> None:
         self.origin = origin
         self.tool = tool
 
+        # Whether the operation (with its group) can be machined from its end
+        self.direction = direction
+
         # Allow grouping operations so they are guaranteed to run consequently
         self.next_op = None
 
@@ -133,9 +305,29 @@ class MachiningOperation:
         """
         to_next = self
         while to_next.next_op:
-            to_next = self.next_op
+            to_next = to_next.next_op
         to_next.next_op = next
 
+    @property
+    def reversible(self) -> bool:
+        """ @returns True if the group of operations can be machined the other way round """
+        return self.direction == RouteDirection.ANY
+
+    def reverse(self):
+        """
+        Machine the group of operations the other way round. The first operation
+        stays the head of the group, so the origins are swapped along the group.
+        """
+        assert self.reversible, "The direction of the cut must be kept"
+
+        group = [self]
+
+        while group[-1].next_op:
+            group.append(group[-1].next_op)
+
+        for op, origin in zip(group, [op.origin for op in reversed(group)]):
+            op.origin = origin
+
     def get_end_coordinate(self, first=True):
         """
         Consider the end coordinate of the machining operation
@@ -146,7 +338,14 @@ class MachiningOperation:
 
         return None if first else self.origin
 
-    def to_gcode(self, writer, index: int, last_index: int=0):
+    def location(self, offset: Coordinate=None):
+        """ @returns The x and y of the origin, moved by the offset of a panel copy """
+        if offset is None:
+            return self.origin.x, self.origin.y
+
+        return self.origin.x + offset.x, self.origin.y + offset.y
+
+    def to_gcode(self, writer, index: int, last_index: int=0, offset: Coordinate=None):
         """ First operation for modal commands """
         raise RuntimeError
 
@@ -166,17 +365,86 @@ class DrillHole(MachiningOperation):
     Simplest of all operations - drill a hole
     This operation is modal
     """
-    def to_gcode(self, writer, index, last_index=0):
+    def to_gcode(self, writer, index, last_index=0, offset=None):
         """ Virtual gcode method for the drill bit. Delegates to the profile. """
+        x, y = self.location(offset)
+
         writer(profile.drill_hole(
-            ctx.rounder * self.origin.x,
-            ctx.rounder * self.origin.y,
+            ctx.rounder * x,
+            ctx.rounder * y,
             self.tool.z_feedrate,
             ctx.rounder * gs.z_drill_retract_height,
             ctx.rounder * self.tool.z_bottom,
             index, last_index
         ))
 
+    @staticmethod
+    def render_series(writer, series) -> bool:
+        """
+        Render a series of holes of a tool at once, from templates of the profile.
+        The profile function is compiled once, and the holes are rounded and
+        formatted as arrays. See the renderer module.
+        @param series: The (operation, offset) of each hole, in order
+        @returns False if the series cannot be rendered this way. Nothing is written.
+        """
+        if not series or not is_compilable(profile.drill_hole) or \
+                any(type(op) is not DrillHole for op, _ in series):
+            return False
+
+        # The locations as whole nm. The offsets are the few copies of a panel.
+        offsets = {id(None): (0, 0)}
+        points = []
+
+        for op, offset in series:
+            if id(offset) not in offsets:
+                offsets[id(offset)] = (whole_nm(nm(offset.x)), whole_nm(nm(offset.y)))
+
+            points.append((whole_nm(op.origin.x), whole_nm(op.origin.y)) + offsets[id(offset)])
+
+        if any(value is None for point in points for value in point):
+            return False
+
+        points = np.array(points, dtype=np.int64).reshape(-1, 4)
+        lengths = {
+            "x": round_lengths(points[:, 0] + points[:, 2], ctx.rounder.__resolution__),
+            "y": round_lengths(points[:, 1] + points[:, 3], ctx.rounder.__resolution__),
+        }
+
+        if lengths["x"] is None or lengths["y"] is None:
+            return False
+
+        tool = series[0][0].tool
+        last_index = len(series) - 1
+        constants = {
+            "z_feedrate": tool.z_feedrate,
+            "z_retract": ctx.rounder * gs.z_drill_retract_height,
+            "z_bottom": ctx.rounder * tool.z_bottom,
+            "last_index": last_index,
+        }
+
+        try:
+            # The first, the middle and the last holes differ
+            parts = [
+                (0, 1, Template(profile.drill_hole, ["x", "y"], index=0, **constants)),
+                (1, last_index, Template(profile.drill_hole, ["x", "y"], index=1, **constants)),
+                (max(last_index, 1), last_index + 1,
+                 Template(profile.drill_hole, ["x", "y"], index=last_index, **constants)),
+            ]
+        except (TypeError, AttributeError, ValueError):
+            logger.debug("The drill holes of the profile cannot be compiled")
+            return False
+
+        chunks = []
+
+        for start, stop, template in parts:
+            if stop > start:
+                chunks += template.render({name: column[start:stop] for name, column in lengths.items()})
+
+        writer(chunks)
+
+        return True
+
+
 class RouteHole(MachiningOperation):
     """
     Use a router bit to route a hole.
@@ -189,11 +457,13 @@ class RouteHole(MachiningOperation):
         # This should not be possible - belt and brace
         assert hole_diameter >= tool.diameter, "Cannot route if the router bit is larger than the hole"
 
-    def to_gcode(self, writer, index, last_index=0):
+    def to_gcode(self, writer, index, last_index=0, offset=None):
+        x, y = self.location(offset)
+
         writer(profile.route_hole(
             self.diameter,
-            ctx.rounder * self.origin.x,
-            ctx.rounder * self.origin.y,
+            ctx.rounder * x,
+            ctx.rounder * y,
             self.tool.diameter,
             self.tool.cut_direction,
             self.tool.table_feed,
@@ -204,9 +474,47 @@ class RouteHole(MachiningOperation):
 
 
 class RouteVector(MachiningOperation):
-    def __init__(self, move: Move, tool) -> None:
-        super().__init__(move.orgin, tool)
-        self.vector_start = move
+    """
+    Route along a path of moves.
+    A slot (routed with a bit of its width) cuts both sides, so it can be routed both
+    ways. A contour cuts one side, and must keep its direction for a climb or a
+    conventional cut.
+    """
+    def __init__(self, move: Move, tool, direction: RouteDirection=RouteDirection.ANY) -> None:
+        super().__init__(move.start, tool, direction)
+        self.vector_start = fit_moves(move, gs.arc_fitting_tolerance)
+
+    def to_gcode(self, writer, index, last_index=0, offset=None):
+        def rounded(coordinate):
+            if offset is None:
+                return ctx.rounder * coordinate.x, ctx.rounder * coordinate.y
+
+            return ctx.rounder * (coordinate.x + offset.x), ctx.rounder * (coordinate.y + offset.y)
+
+        path = [(0, *rounded(self.vector_start.start), None, None)]
+
+        for move in self.vector_start:
+            if isinstance(move, ArcMove):
+                path.append((
+                    2 if move.clockwise else 3, *rounded(move.end),
+                    ctx.rounder * (move.center.x - move.start.x),
+                    ctx.rounder * (move.center.y - move.start.y)
+                ))
+            else:
+                path.append((1, *rounded(move.end), None, None))
+
+        writer(profile.route_path(
+            path,
+            self.tool.table_feed,
+            self.tool.z_feedrate,
+            ctx.rounder * gs.z_safe_height,
+            ctx.rounder * self.tool.z_bottom,
+        ))
+
+    def reverse(self):
+        super().reverse()
+        self.vector_start = self.vector_start.reverse()
+        self.origin = self.vector_start.start
 
     def get_end_coordinate(self, first=True):
         """ Override """
@@ -218,6 +526,57 @@ class RouteVector(MachiningOperation):
         return retval
 
 
+def render_series(writer, series):
+    """
+    Render the operations of a tool, in order. The index of each operation in the
+    series is given to the profile, so it can use modal commands.
+    @param series: The (operation, offset) of each operation. The offset moves the
+                   operation to a copy of a panel, or is None.
+    """
+    if DrillHole.render_series(writer, series):
+        return
+
+    last_index = len(series) - 1
+
+    for index, (op, offset) in enumerate(series):
+        op.to_gcode(writer, index, last_index, offset)
+
+
+# The series of operations rendered by the worker processes. Set before forking them.
+_series_to_render = []
+
+
+def _render_lines(index: int) -> List[str]:
+    """ Render a series of operations in a worker process @returns The lines """
+    chunks = []
+    render_series(chunks.extend, _series_to_render[index])
+
+    return split_lines(chunks)
+
+
+class TravelReport:
+    """ Result of the travel optimization of a tool """
+    def __init__(self, slot: int, tool: CuttingTool, stops: int, tour: Tour, cost: CostModel):
+        self.slot = slot
+        self.tool = tool
+        # Number of stops visited (holes and segments)
+        self.stops = stops
+        # Cost of the travels of a single board, in the unit of the cost model
+        self.length = tour.length
+        # No tour can cost less than this. 0 if not known.
+        self.lower_bound = tour.lower_bound
+        # How much longer than the lower bound the tour is in %, or None if not known
+        self.gap = tour.gap
+        self.cost = cost
+
+    def __str__(self) -> str:
+        gap = "unknown" if self.gap is None else f"{self.gap:.1f}%"
+        lower_bound = "unknown" if self.gap is None else self.cost.format(self.lower_bound)
+
+        return (f"T{self.slot:02d}: Travel of {self.stops} stops: {self.cost.format(self.length)}, "
+                f"lower bound {lower_bound}, gap {gap}")
+
+
 class Machining:
     """
     The Machining object processes the required operations (pth, npth, contour)
@@ -227,8 +586,13 @@ class Machining:
     It optimizes the order of the features to be machined
     It generates the GCode
     """
-    def __init__(self, inventory: Inventory):
+    def __init__(self, inventory: Inventory, panel: Panel=None):
+        """
+        @param inventory: The features of the board
+        @param panel: Optional panel to machine several copies of the board
+        """
         self.inventory = inventory
+        self.panel = panel
 
         # Add self to the context right away
         ctx.machining = self
@@ -242,6 +606,15 @@ class Machining:
         # Keep a copy of the rack
         self.rack: Rack = None
 
+        # Locations of the stops of each tool, in the order visited. See optimize.
+        self.plan: Dict[str, np.ndarray] = {}
+
+        # Copies of the board machined by each tool, as (offset, backwards)
+        self.copies: Dict[int, List] = {}
+
+        # Result of the optimization of each tool. See optimize.
+        self.report: List[TravelReport] = []
+
     def process(self, ops: Operations):
         """
         Compile a list of all machining operations required.
@@ -262,12 +635,30 @@ class Machining:
         # Start with inspecting every holes to be made
         features = self.inventory.get_features(ops)
 
-        # Keep track of the warning for tools
-        raw_tools = set()
+        # Each size is only resolved (and warned about) once
+        tools = ToolTable(rack)
 
         for by_diameter in features.values():
-            # Avoid repeating the same warning for all tools
-            for feature in by_diameter:
+            # Round holes share the tool of the view, so they are created straight from the columns
+            holes = by_diameter.kind == FeatureKind.HOLE
+
+            if holes.any():
+                try:
+                    actual_tool, _ = tools.request(DrillBit, by_diameter.diameter)
+
+                    for x, y in zip(by_diameter.x[holes].tolist(), by_diameter.y[holes].tolist()):
+                        coord = Coordinate(nm(x), nm(y))
+
+                        if actual_tool.type == RouterBit:
+                            self.ops.append(RouteHole(coord, actual_tool, by_diameter.diameter))
+                        else:
+                            self.ops.append(DrillHole(coord, actual_tool))
+                except ValueError:
+                    logger.error("No solution exist for a tool request")
+
+            for index in np.flatnonzero(~holes):
+                feature = by_diameter[index]
+
                 try:
                     # Oblong holes may require routing
                     if isinstance(feature, Oblong):
@@ -275,17 +666,13 @@ class Machining:
 
                         if feature.distance > limit:
                             # Route using a single stroke
-                            tool = RouterBit(feature.diameter)
-                            actual_tool, _ = rack.request(tool, tool not in raw_tools)
-                            raw_tools.add(tool)
+                            actual_tool, _ = tools.request(RouterBit, feature.diameter)
                             self.ops.append(
                                 RouteVector(LinearMove(feature.coord, feature.end), actual_tool)
                             )
 
                         else:
-                            tool = DrillBit(feature.diameter)
-                            actual_tool, _ = rack.request(tool, tool not in raw_tools)
-                            raw_tools.add(tool)
+                            actual_tool, _ = tools.request(DrillBit, feature.diameter)
 
                             # Start by drilling start and end
                             op = DrillHole(feature.coord, actual_tool)
@@ -295,7 +682,7 @@ class Machining:
                             # Drill intermediate
                             x1, y1 = feature.coord()
                             x2, y2 = feature.end()
-                            l = tool.diameter / gs.slot_peck_drilling.pecks_per_hole
+                            l = feature.diameter / gs.slot_peck_drilling.pecks_per_hole
 
                             distance = ((x2 - x1)**2 + (y2 - y1)**2)**0.5
                             total_points = int((distance / l).value)
@@ -308,20 +695,8 @@ class Machining:
 
                             self.ops.append(op)
 
-                    elif isinstance(feature, Hole):
-                        tool = DrillBit(feature.diameter)
-                        actual_tool, _ = rack.request(tool, tool not in raw_tools)
-                        raw_tools.add(tool)
-
-                        if actual_tool.type == RouterBit:
-                            self.ops.append(RouteHole(feature.coord, actual_tool, tool.diameter))
-                        else:
-                            self.ops.append(DrillHole(feature.coord, actual_tool))
-
                     elif isinstance(feature, Route):
-                        tool =  RouterBit(feature.diameter)
-                        actual_tool, _ = rack.request(tool, tool not in raw_tools)
-                        raw_tools.add(tool)
+                        actual_tool, _ = tools.request(RouterBit, feature.diameter)
                     else:
                         raise RuntimeError
                 except ValueError:
@@ -349,50 +724,80 @@ class Machining:
 
         # Reset the ops
         self.tools_to_ops = OrderedDict()
+        tools = ToolTable(rack)
 
         # Sort the operations by 'drill' first, smallest first, router
         for op in sorted(self.ops):
             # Grab tool
-            _, tool_id = rack.request(op.tool, False)
+            _, tool_id = tools.request(op.tool.type, op.tool.diameter, False)
             self.tools_to_ops.setdefault(tool_id, []).append(op)
 
-    def optimize(self):
+    def optimize(self, time_budget: float=None, workers: int=None, use_cache: bool=True,
+                 previous_plan: Dict[str, np.ndarray]=None):
         """
         Optimize the travel from one machining to the next.
-        The idea is to minimize the G0 travels.
+        The idea is to minimize the G0 travels. Depending on the settings, the travels
+        are measured as a distance, or as the time taken by the machine to move.
         This is actually a well known - and suprisingly - complex subject known
         as the Traveling Salesman Problem.
         A brute force approach defeats any computer very quickly as the number of
         combination of this case is (n-1)!/2 - that's 5e155 combinations for 100 holes.
         So heuristic algorithms are used instead. The simplest one, consist in moving to
         the closest hole next, turns out to be > 90% efficient.
-        Here, we rely on numpy and a TSP library to do the hard work - so we're
-        likely better than 90% - whilst keeping the compute time under control.
+        Here, tiny sets are solved exactly, and larger sets start from the closest hole
+        tour which is then improved using 2-opt and Or-opt moves - see the tour module.
         For the router parts, we use a trick where the routed path (start to end) have 0 cost
-        in the graph, allowing for one algo fits all approach.
+        in the graph, allowing for one algo fits all approach. The paths which can be cut
+        both ways (see RouteDirection) may be travelled from their end, in which case the
+        operation is reversed.
+        The tools are independent, so the large jobs are optimized in parallel, largest
+        first.
+        With an automatic tool changer, each tool starts from the tool change position.
+        With a manual rack, the machine stays where the previous tool ended, so each
+        tour is travelled from its end closest to the last hole of the previous tool.
+        The tours are saved in a cache, so processing the same holes again is instant.
+        Only the tours improved without a time budget are saved, since they are the best
+        found, so a tour cut short never stands in for a better one.
+        The plan of a previous revision of the board can be given. The tours of the tools
+        are then repaired rather than solved again, which only takes a few milliseconds
+        when a few holes changed.
+        Once done, the plan property holds the entry and exit points of the stops of
+        each tool, in the order visited.
+        The cost of each tour is compared to a lower bound (see the bound module), giving
+        the gap to the optimal tour. A large gap means a larger time budget could help.
+        For a panel, the board is optimized once, and each tool then visits the copies
+        in a serpentine order, so the time does not grow with the number of copies.
+
+        @param time_budget: Time in seconds allowed to improve the travels of the whole job.
+                            Each tool gets a share in proportion to its number of operations.
+                            If None, each tool is improved until no better solution is found.
+        @param workers: Number of processes to use. Defaults to the global settings.
+        @param use_cache: If False, optimize all tours again, without using the cache at all
+        @param previous_plan: The plan of a previous run, to reuse the order of the holes
+        @returns The report of each tool, in the rack order. Also kept in the report property.
         """
-        def get_distance_matrix(coordinates):
-            """ Create a matrix of all distance using numpy """
-            num_coords = len(coordinates)
-            distance_matrix = np.zeros((num_coords, num_coords))
-
-            for i in range(num_coords):
-                for j in range(i + 1, num_coords):
-                    if i in segments and j == i + 1:
-                        distance = 0
-                    else:
-                        distance = np.linalg.norm(np.array(coordinates[i]) - np.array(coordinates[j]))
+        if workers is None:
+            workers = gs.optimizer.workers
+
+        workers = min(workers or os.cpu_count() or 1, len(self.tools_to_ops))
 
-                    # Assign distance to both (i, j) and (j, i) positions in the matrix
-                    distance_matrix[i, j] = distance
-                    distance_matrix[j, i] = distance
+        # Where the machine is when the first tool starts
+        tool_change = np.array(Coordinate(
+            gs.tool_change_position.x, gs.tool_change_position.y)(), dtype=float)
+        position = tool_change
+        automatic_change = self.rack is not None and not self.rack.is_manual
 
-            return distance_matrix
+        # The tours are optimized for the first copy of the panel
+        first_copy = self.panel.points[0] if self.panel else np.zeros(2)
+        cost = get_cost_model()
 
-        # Apply TSP to each tool
-        for tool_ops in self.tools_to_ops.values():
-            # Create a matrix of travels with cost
-            # Router are specials in than they have a zero cost to go from A to B
+        # Create the stops of each tool
+        # Router are specials in than they have a zero cost to go from A to B
+        ops_to_permutate = {}
+        stops_of_tool = {}
+        solver_args = {}
+
+        for slot, tool_ops in self.tools_to_ops.items():
             coordinates = []
             # Indexes of segment start position. The end of the segment is the next item
             segments = set()
@@ -405,58 +810,240 @@ class Machining:
                 end_coordinate = op.get_end_coordinate()
 
                 if end_coordinate:
+                    segments.add(len(coordinates) - 1)
                     coordinates.append(end_coordinate)
-                    segments.add(len(coordinates))
                     final_ops.append(NoOperation())
 
-            # Apply TSP
-            distance_matrix = get_distance_matrix(coordinates)
-            permutation, _ = solve_tsp_dynamic_programming(distance_matrix)
+            stops, entries, exits = get_stops(coordinates, segments)
+            ops_to_permutate[slot] = final_ops
+            stops_of_tool[slot] = stops
+            # Each operation is a stop
+            reversible = np.array([op.reversible for op in tool_ops], dtype=bool)
+            # The share of the time budget is set once the jobs are scheduled
+            solver_args[slot] = (
+                entries, exits, None, position - first_copy if automatic_change else None, cost,
+                reversible)
+
+        # Look for the tours already optimized
+        cache = None
+        cache_keys = {}
+        tours = {}
+
+        if use_cache and gs.optimizer.cache_size > 0:
+            cache = TourCache(max_size=int(gs.optimizer.cache_size * 1024 * 1024))
+
+            for slot, (entries, exits, _, start, _, reversible) in solver_args.items():
+                cache_keys[slot] = TourCache.key(entries, exits, start, cost, reversible)
+                tour = cache.get(cache_keys[slot])
+
+                if tour is not None:
+                    logger.debug("T%02d: Using the cached tour", slot)
+                    tours[slot] = tour
+
+        # Schedule the largest tools first, so the smallest fill in the gaps
+        schedule = sorted(
+            (slot for slot in solver_args if slot not in tours),
+            key=lambda slot: len(stops_of_tool[slot]), reverse=True
+        )
+
+        # Starting the processes only pays off for large jobs
+        parallel = workers > 1 and len(schedule) > 1 and \
+            sum(len(stops_of_tool[slot]) for slot in schedule) >= TOUR_PARALLEL_MIN_STOPS
+        concurrency = min(workers, len(schedule)) if parallel else 1
+        scheduled_ops = sum(len(self.tools_to_ops[slot]) for slot in schedule)
+
+        # Repair the tours of the previous plan, or solve them from scratch
+        jobs = {}
+
+        for slot in schedule:
+            entries, exits, _, start, _, reversible = solver_args[slot]
+            previous = (previous_plan or {}).get(plan_key(self.tools_to_ops[slot][0].tool))
+
+            # The tools share the time budget, with as many running at once as the concurrency
+            share = None if time_budget is None else min(
+                time_budget,
+                time_budget * concurrency * len(self.tools_to_ops[slot]) / scheduled_ops)
+
+            if previous is None:
+                jobs[slot] = (solve_tour, (entries, exits, share, start, cost, reversible))
+            else:
+                jobs[slot] = (repair_tour, (entries, exits, previous, share, start, cost, reversible))
+
+        if parallel:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {slot: pool.submit(job, *args) for slot, (job, args) in jobs.items()}
+                tours.update((slot, future.result()) for slot, future in futures.items())
+        else:
+            tours.update((slot, job(*args)) for slot, (job, args) in jobs.items())
+
+        if cache and time_budget is None:
+            for slot in schedule:
+                cache.put(cache_keys[slot], tours[slot])
+
+        # Apply the tours in the rack order
+        self.plan = {}
+        self.copies = {}
+        self.report = []
+
+        for slot, tool_ops in self.tools_to_ops.items():
+            final_ops = ops_to_permutate[slot]
+            stops = stops_of_tool[slot]
+            tour = tours[slot]
+            reversible = solver_args[slot][5]
+
+            if not automatic_change:
+                # Start from the end closest to where the previous tool ended
+                order = closest_end_first(
+                    tour.order, *tour.oriented(*solver_args[slot][:2]), position - first_copy,
+                    cost, reversible)
+
+                if len(order) and order[0] != tour.order[0]:
+                    tour.reverse()
+
+            # The entry and exit of each stop, as travelled
+            entries, exits = tour.oriented(*solver_args[slot][:2])
+
+            if self.panel and len(tour.order):
+                # An automatic change starts each tool from the tool change position
+                self.copies[slot], position = self.panel.chain(
+                    entries[tour.order[0]], exits[tour.order[-1]],
+                    not np.any(entries != exits), tool_change if automatic_change else position,
+                    cost
+                )
+            elif len(tour.order):
+                position = exits[tour.order[-1]]
+
+            self.plan[plan_key(tool_ops[0].tool)] = np.hstack((entries[tour.order], exits[tour.order]))
+
+            report = TravelReport(slot, tool_ops[0].tool, len(stops), tour, cost)
+            self.report.append(report)
+            logger.info("%s", report)
 
             # Reorder, and drop the segments
             tool_ops.clear()
 
-            for i in permutation:
+            for i in expand_tour(stops, tour.order):
                 if not isinstance(final_ops[i], NoOperation):
                     tool_ops.append(final_ops[i])
 
-    def generate_machine_code(self, stream: BufferedIOBase):
+            # Machine the segments travelled backwards from their end
+            for stop in np.flatnonzero(tour.backwards & reversible):
+                entry, end = stops[stop]
+
+                if entry != end:
+                    final_ops[entry].reverse()
+
+        return self.report
+
+    def generate_machine_code(self, stream: BufferedIOBase, buffer_size: int=None,
+                              workers: int=None):
         """
         Function to be used to write to the stream
-        Allow formatting the output in a global way
+        Allow formatting the output in a global way (see GCodeWriter)
+        The stream can be a text or a binary stream.
+        @param buffer_size: Number of characters gathered before writing to the stream.
+                            Defaults to the global settings.
+        @param workers: Number of processes rendering the tools. Defaults to the global
+                        settings.
         """
-        def gen(y):
-            for chunk in y:
-                for line in chunk.split('\n'):
-                    # Remove all forward spaces
-                    line = line.strip()
+        compactor = None
 
-                    if not line:
-                        continue
+        if buffer_size is None:
+            buffer_size = int(gs.gcode.buffer_size * 1024)
 
-                    if not line.startswith('('): # Simple - but probably just fine
-                        if gs.gcode.line_numbers_increment > 0:
-                            stream.write(f"N{gen.numbering:04} ")
-                            gen.numbering += gs.gcode.line_numbers_increment
+        if workers is None:
+            workers = gs.gcode.workers
 
-                    stream.write(line)
-                    stream.write("\n")
+        if gs.gcode.compact or gs.gcode.trim_zeros:
+            compactor = ModalCompactor(gs.gcode.compact, gs.gcode.trim_zeros)
 
-        # Start the numbering using the initial increment
-        gen.numbering = gs.gcode.line_numbers_increment
+        with GCodeWriter(stream, gs.gcode.line_numbers_increment, buffer_size, compactor) as gen:
+            self._generate(gen, workers or os.cpu_count() or 1)
 
+    def _parts(self):
+        """
+        The parts of the G-code, in order
+        @returns A generator of the parts. A part is either the chunks of a profile
+                 function, or a list of (operation, offset) to render with render_series.
+        """
         # The operations are already sorted by tool type and diameter
         # We need to apply a TSP to each tool operation
-        # Note: The TSP optimization ignores the tool location during tool change
-        gen(profile.header())
+        # Note: The TSP optimization starts each tool from the tool change position or
+        # from the last hole of the previous tool - see optimize
+        yield profile.header()
+
+        # The copies of a panel can call a subprogram machining a single board, if the
+        # profile supports it. Holds the ops of each subprogram by number.
+        use_subprograms = gs.gcode.subprograms and hasattr(profile, "subprogram_call")
+        subprograms = OrderedDict()
 
         for slot, ops in self.tools_to_ops.items():
             # The tool is the same for all ops. Grab it from the first
-            gen(profile.change_tool(slot, ops[0].tool))
+            yield profile.change_tool(slot, ops[0].tool)
+
+            copies = self.copies.get(slot, [(None, False)])
+
+            if use_subprograms and len(copies) > 1:
+                for offset, backwards in copies:
+                    # One subprogram per tool and direction
+                    number = SUBPROGRAM_FIRST_NUMBER + 2 * slot + backwards
+                    subprograms[number] = list(reversed(ops)) if backwards else ops
+                    yield profile.subprogram_call(
+                        number, ctx.rounder * offset.x, ctx.rounder * offset.y)
+
+                yield profile.subprogram_calls_end()
+                continue
+
+            # Visit each copy of a panel in turn. The series of holes spans all copies.
+            yield [
+                (op, offset)
+                for offset, backwards in copies for op in (reversed(ops) if backwards else ops)
+            ]
 
-            last_index = len(ops) - 1
+        if subprograms:
+            yield profile.main_program_end()
 
-            for index, op in enumerate(ops):
-                op.to_gcode(gen, index, last_index)
+            for number, ops in subprograms.items():
+                yield profile.subprogram_start(number)
+                yield [(op, None) for op in ops]
+                yield profile.subprogram_end()
 
-        gen(profile.footer())
+        yield profile.footer()
+
+    def _generate(self, gen: GCodeWriter, workers: int=1):
+        """
+        Give all the G-code to the writer
+        @param workers: Number of processes rendering the series of operations
+        """
+        parts = list(self._parts())
+        series = [part for part in parts if isinstance(part, list)]
+
+        # Starting the processes only pays off for large jobs. The processes inherit the
+        # operations when forked, so only the lines rendered are sent back.
+        if workers < 2 or len(series) < 2 or \
+                sum(map(len, series)) < GCODE_PARALLEL_MIN_OPS or \
+                "fork" not in multiprocessing.get_all_start_methods():
+            for part in parts:
+                if isinstance(part, list):
+                    render_series(gen, part)
+                else:
+                    gen(part)
+
+            return
+
+        global _series_to_render  # pylint: disable=global-statement
+        _series_to_render = series
+
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(series)),
+                                     mp_context=multiprocessing.get_context("fork")) as pool:
+                # The lines come back in order, to be compacted and numbered in turn
+                rendered = pool.map(_render_lines, range(len(series)))
+
+                for part in parts:
+                    if isinstance(part, list):
+                        gen.write_lines(next(rendered))
+                    else:
+                        gen(part)
+        finally:
+            _series_to_render = []
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Panelization - machining copies of the same board in one go (step and repeat).
+
+The board is optimized once, then each tool visits the copies one after the other,
+ in a serpentine order (left to right, then right to left on the next row...).
+Since the copies are identical, the tour of a copy can be travelled backwards when
+ its last hole is closer to where the previous copy ended.
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+from .coordinate import Coordinate
+from .distance import point_distance
+from .units import Length
+
+
+class Panel:
+    """ The offsets of the copies of the board, in the order they are machined """
+    def __init__(self, offsets: List[Coordinate]):
+        """
+        @param offsets: The offset of each copy of the board. The order does not matter.
+        """
+        assert offsets, "A panel requires at least 1 copy"
+
+        points = np.array([offset() for offset in offsets], dtype=float).reshape(-1, 2)
+
+        # Serpentine: by rows (Y), alternating the direction of the X
+        rows = np.unique(points[:, 1])
+        row_of = np.searchsorted(rows, points[:, 1])
+        direction = np.where(row_of % 2, -points[:, 0], points[:, 0])
+        order = np.lexsort((direction, row_of))
+
+        self.offsets = [offsets[i] for i in order]
+        self.points = points[order]
+
+    @classmethod
+    def grid(cls, columns: int, rows: int, pitch_x: Length, pitch_y: Length):
+        """
+        Create a panel of columns x rows copies
+        @param pitch_x, pitch_y: The distance between 2 copies
+        """
+        return cls([
+            Coordinate(pitch_x * column, pitch_y * row)
+            for row in range(rows) for column in range(columns)
+        ])
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def chain(self, first: np.ndarray, last: np.ndarray, reversible: bool,
+              position: np.ndarray=None, cost=None) -> Tuple[List[Tuple[Coordinate, bool]], np.ndarray]:
+        """
+        Chain the copies of the tour of a tool.
+        @param first, last: Points where the tour of a single board starts and ends (in nm)
+        @param reversible: True if the tour can be travelled backwards
+        @param position: Where the machine is before the first copy. If None, the first
+                         copy is travelled forwards.
+        @param cost: The cost model. Defaults to the euclidean distance.
+        @returns A list of (offset, backwards) for each copy, in the order to machine
+                 them, and the point where the last copy ends
+        """
+        first, last = np.asarray(first, dtype=float), np.asarray(last, dtype=float)
+        copies = []
+
+        for offset, point in zip(self.offsets, self.points):
+            backwards = False
+
+            if reversible and position is not None:
+                backwards = bool(
+                    point_distance(position, last + point, cost) <
+                    point_distance(position, first + point, cost)
+                )
+
+            copies.append((offset, backwards))
+            position = (first if backwards else last) + point
+
+        return copies, position
@@ -18,16 +18,47 @@
 #
 """
 Creates an abstract inventory for the PCB.
+
+The holes are stored by columns (numpy arrays of integer nanometres), rather than as
+ one object per hole, since a board can hold thousands of vias. The columns are:
+ x, y, end_x, end_y, diameter, kind (see FeatureKind) and pth.
+For an oblong hole, (x, y) is the start and (end_x, end_y) the end. For a round hole,
+ the end is the center too.
+The Hole and Oblong objects are only created when a feature is looked at on its own.
 """
 from typing import Dict
 from collections import OrderedDict
-from math import radians, cos, sin, sqrt
+from enum import IntEnum
+from math import sqrt
+
+import numpy as np
 
-from .units import um, degree, Length
+from .units import nm, um, degree, Length
 from .coordinate import Coordinate
 from .operations import Operations
 
 
+class FeatureKind(IntEnum):
+    """ Type of a feature in the columns of the inventory """
+    HOLE = 0
+    OBLONG = 1
+
+
+# Columns of the inventory and their type
+_COLUMNS = {
+    "x": np.int64,
+    "y": np.int64,
+    "end_x": np.int64,
+    "end_y": np.int64,
+    "diameter": np.int64,
+    "kind": np.uint8,
+    "pth": np.bool_,
+}
+
+# Arguments of add_holes gathered for the holes added one at a time
+_PENDING = ("x", "y", "diameter", "size_y", "angle", "pth")
+
+
 class Feature:
     """ Abstract base class feature of the inventory """
     @classmethod
@@ -73,30 +104,131 @@ class Route(Feature):
     pass
 
 
+class FeatureView:
+    """
+    The features of the inventory sharing a diameter.
+    The columns are numpy arrays which can be worked on as a whole. Iterating over the
+    view creates the Hole and Oblong objects one at a time.
+    """
+    def __init__(self, diameter: Length, columns: Dict[str, np.ndarray]):
+        self.diameter = diameter
+        self.x = columns["x"]
+        self.y = columns["y"]
+        self.end_x = columns["end_x"]
+        self.end_y = columns["end_y"]
+        self.kind = columns["kind"]
+        self.pth = columns["pth"]
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, index) -> Hole:
+        start = Coordinate(nm(int(self.x[index])), nm(int(self.y[index])))
+
+        if self.kind[index] == FeatureKind.OBLONG:
+            end = Coordinate(nm(int(self.end_x[index])), nm(int(self.end_y[index])))
+            return Oblong(self.diameter, start, end)
+
+        return Hole(self.diameter, start)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
 class Inventory:
     """
     Create an inventory of Features which will require some machine.
     The inventory is created from the PCB data and does not factor how it will be machined
     """
     def __init__(self):
-        self.pth: Dict[Length, Feature] = OrderedDict()
-        self.npth: Dict[Length, Feature] = OrderedDict()
+        # Columns added since the last read, merged on the next read
+        self._chunks = []
+        self._columns = {name: np.empty(0, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        # Arguments of the holes added one at a time, added as a single chunk on the next read
+        self._pending = {name: [] for name in _PENDING}
 
-    def _add_hole(self, hole: Hole, pth):
-        if pth:
-            self.pth.setdefault(hole.diameter, []).append(hole)
-        else:
-            self.npth.setdefault(hole.diameter, []).append(hole)
+    def __len__(self):
+        return len(self.columns["x"])
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        """ @returns The columns of all the features """
+        self._flush()
+
+        if self._chunks:
+            self._columns = {
+                name: np.concatenate([self._columns[name]] + [chunk[name] for chunk in self._chunks])
+                for name in _COLUMNS
+            }
+            self._chunks = []
+
+        return self._columns
+
+    def _flush(self):
+        """ Add the holes added one at a time as a chunk, keeping the order of the holes """
+        if self._pending["x"]:
+            pending, self._pending = self._pending, {name: [] for name in _PENDING}
+            self.add_holes(**pending)
+
+    def add_holes(self, x, y, diameter, size_y=None, angle=None, pth=True):
+        """
+        Add many holes at once. All arguments are arrays of the same size, or scalars.
+
+        @param x, y: Position of the center of the holes in nm
+        @param diameter: Size of the holes in nm (along X for oblong holes)
+        @param size_y: Optional size along Y in nm. Oblong holes have different sizes.
+        @param angle: Optional orientation of the oblong holes in degrees
+        @param pth: If false, the holes are npth
+        """
+        self._flush()
+
+        x, y, diameter = np.broadcast_arrays(
+            np.asarray(x, dtype=float), np.asarray(y, dtype=float), np.asarray(diameter, dtype=float))
+        size_y = diameter if size_y is None else np.broadcast_to(np.asarray(size_y, dtype=float), x.shape)
+        angle = np.broadcast_to(np.asarray(0.0 if angle is None else angle, dtype=float), x.shape)
+
+        oblong = size_y != diameter
+
+        # Determine the orientation
+        # WARNING : As KiCad uses screen coordinates, angles are inverted
+        width = np.minimum(diameter, size_y)
+        radius = (np.maximum(diameter, size_y) - width) / 2
+        radians = np.radians(np.where(diameter < size_y, 90, 0) - angle)
+        dx, dy = radius * np.cos(radians), radius * np.sin(radians)
+
+        self._chunks.append({
+            "x": np.rint(np.where(oblong, x + dx, x)).astype(np.int64).ravel(),
+            "y": np.rint(np.where(oblong, y + dy, y)).astype(np.int64).ravel(),
+            "end_x": np.rint(np.where(oblong, x - dx, x)).astype(np.int64).ravel(),
+            "end_y": np.rint(np.where(oblong, y - dy, y)).astype(np.int64).ravel(),
+            "diameter": np.rint(width).astype(np.int64).ravel(),
+            "kind": np.where(oblong, FeatureKind.OBLONG, FeatureKind.HOLE).astype(np.uint8).ravel(),
+            "pth": np.broadcast_to(np.asarray(pth, dtype=bool), x.shape).ravel().copy(),
+        })
 
     def get_features(self, ops: Operations):
-        """ @returns All feature of the pcb for the given operations """
-        retval = {}
+        """
+        @returns The features of the pcb for the given operations, as a view for each
+                 diameter, smallest first
+        """
+        columns = self.columns
+        selected = np.zeros(len(columns["x"]), dtype=bool)
 
         if ops & Operations.PTH:
-            retval.update(self.pth)
+            selected |= columns["pth"]
 
         if ops & Operations.NPTH:
-            retval.update(self.npth)
+            selected |= ~columns["pth"]
+
+        indexes = np.flatnonzero(selected)
+        indexes = indexes[np.argsort(columns["diameter"][indexes], kind="stable")]
+        diameters, starts = np.unique(columns["diameter"][indexes], return_index=True)
+        retval = OrderedDict()
+
+        for diameter, group in zip(diameters.tolist(), np.split(indexes, starts[1:])):
+            retval[nm(diameter)] = FeatureView(
+                nm(diameter), {name: column[group] for name, column in columns.items()})
 
         return retval
 
@@ -104,9 +236,8 @@ class Inventory:
         """
         Add a hole to the inventory
 
-        @param pos_x, pos_y Position of the hole in KiCad coordinate values
+        @param coord Position of the hole
         @param size_x, size_y Size of the hole. Oblong hole have different sizes
-        @param orient Orientation of the hole
         @param kwargs:
             size_y: Oblong hole
             angle: Same, orientation as an Angle
@@ -114,25 +245,16 @@ class Inventory:
         """
         size_y = kwargs.get("size_y", None)
         angle = kwargs.get("angle", 0*degree)
-        pth = kwargs.get("pth", True)
-
-        if size_y is None or size_x == size_y:
-            hole = Hole(size_x, coord)
-            self._add_hole(hole, pth)
-        else:
-            # Determine the orientation
-            # WARNING : As KiCad uses screen coordinates, angles are inverted
-            hole_width = min(size_x, size_y)
-            radius = (max(size_x, size_y) - hole_width) / 2
-            angle = radians((90 if size_x < size_y else 0) - angle(degree))
-            dx = radius * cos(angle)
-            dy = radius * sin(angle)
-            start = Coordinate(coord.x + dx, coord.y + dy)
-            end = Coordinate(coord.x - dx, coord.y - dy)
-
-            # Append an oblong hole
-            self._add_hole(Oblong(hole_width, start, end), pth)
+
+        # Creating a chunk for each hole is slow, so the holes are gathered first
+        pending = self._pending
+        pending["x"].append(coord.x.base)
+        pending["y"].append(coord.y.base)
+        pending["diameter"].append(size_x.base)
+        pending["size_y"].append(size_x.base if size_y is None else size_y.base)
+        pending["angle"].append(angle(degree))
+        pending["pth"].append(kwargs.get("pth", True))
 
     def add_edge_element(self, element):
         """ """
-        pass
\ No newline at end of file
+        pass
@@ -3,6 +3,7 @@ from time import strftime
 from k2g.cutting_tools import CutDir, CuttingTool
 from k2g.units import Length, FeedRate, Rpm, mm, mm_min
 from k2g.context import ctx
+from k2g.renderer import compilable
 
 
 def header():
@@ -26,6 +27,7 @@ def footer():
     yield "(end of file)"
 
 
+@compilable
 def drill_hole(
     x: Length, y: Length,
     z_feedrate: FeedRate,
@@ -114,6 +116,45 @@ def route_hole(
     yield f"""G0 Z{z_safe(mm)}"""
 
 
+def route_path(
+    path,
+    feedrate: FeedRate,
+    z_feedrate: FeedRate,
+    z_safe: Length,
+    z_bottom: Length):
+    """
+    Called to generate the GCode for routing along a path of lines and arcs
+
+    Variables are:
+        path:       The moves as (g, x, y, i, j) tuples. The first is the start of the
+                    path, with g = 0. Then g is 1 for a line, 2 for a clockwise arc or
+                    3 for a counter-clockwise arc. x, y is the end of the move, and
+                    i, j the center of an arc from the start of the move, as lengths
+        feedrate:   Lateral displacement feedrate
+        z_feedrate: Z feedrate
+        z_safe:     Z to retract to
+        z_bottom:   Depth to go to
+
+    Yields:
+        The g-code text
+    """
+    _, x, y, _, _ = path[0]
+
+    # Go straight down at the start
+    yield f"""G90 G0 X{x(mm)} Y{y(mm)}
+    G1 Z{z_bottom(mm)} F{z_feedrate(mm_min)}
+    F{feedrate(mm_min)}
+    """
+
+    for g, x, y, i, j in path[1:]:
+        if g == 1:
+            yield f"G1 X{x(mm)} Y{y(mm)}"
+        else:
+            yield f"G{g} X{x(mm)} Y{y(mm)} I{i(mm)} J{j(mm)}"
+
+    yield f"""G0 Z{z_safe(mm)}"""
+
+
 def change_tool(slot: int, tool: CuttingTool):
     """
     GCode for tool change.
@@ -133,3 +174,41 @@ def change_tool(slot: int, tool: CuttingTool):
         T{slot} M06
         S{tool.rpm()}
     """
+
+
+#
+# Optional subprogram capability.
+# A profile which does not define these functions gets the repeated code in full.
+#
+
+def subprogram_call(number: int, x: Length, y: Length):
+    """
+    Call a subprogram, shifting all coordinates by an offset (local coordinate system).
+      Variables are:
+        number:   Number of the subprogram
+        x, y:     Offset applied to the coordinates of the subprogram as lengths
+    """
+    yield f"""
+        G52 X{x(mm)} Y{y(mm)}
+        M98 P{number}
+    """
+
+
+def subprogram_calls_end():
+    """ Called once all calls of a series are done. Cancel the offset. """
+    yield "G52 X0 Y0"
+
+
+def main_program_end():
+    """ End of the main program. The subprograms follow. """
+    yield "M30"
+
+
+def subprogram_start(number: int):
+    """ First line of a subprogram """
+    yield f"O{number}"
+
+
+def subprogram_end():
+    """ Return from a subprogram """
+    yield "M99"
@@ -25,9 +25,10 @@ Can also be used to compute the wear of the bits in the rack
 """
 import logging
 from collections import OrderedDict
-from typing import List
+from typing import Dict, List, Tuple, Type
 
 from .cutting_tools import CuttingTool, DrillBit, RouterBit
+from .units import Length
 
 
 logger = logging.getLogger(__name__)
@@ -297,6 +298,48 @@ class Rack:
         return rack_str
 
 
+class ToolTable:
+    """
+    Resolves the tools requested by a job against a rack.
+    Requesting a tool builds it from the manufacturing data, matches it against the
+    stock, then searches the rack for it. Boards use the same few sizes over and over
+    (think of the vias), so each tool type and diameter is only resolved once, and later
+    requests are a dictionary hit.
+    The rack must not be reorganised while the table is in use, since the slots are
+    remembered too.
+    """
+    def __init__(self, rack: Rack):
+        self.rack = rack
+        self.resolved: Dict[Tuple[Type[CuttingTool], Length], Tuple[CuttingTool, int]] = {}
+
+    def request(self, tool_type: Type[CuttingTool], diameter: Length, warn=True):
+        """
+        Request a cutting tool from the rack. See Rack.request.
+        The warnings are only given on the first request of a tool.
+        @param tool_type: The class of the tool (DrillBit, RouterBit)
+        @param diameter: The diameter required
+        @returns A tuple as the tool and the slot number
+        @raises ValueError if the stock has no tool for the diameter
+        """
+        key = (tool_type, diameter)
+
+        try:
+            resolved = self.resolved[key]
+        except KeyError:
+            try:
+                resolved = self.rack.request(tool_type(diameter), warn)
+            except ValueError:
+                # Remember the failures too
+                resolved = None
+
+            self.resolved[key] = resolved
+
+        if resolved is None:
+            raise ValueError("Cannot get bit size from stock")
+
+        return resolved
+
+
 class RackManager:
     """
     Object which manages the racks of the CNC.
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Compiled rendering of the profile functions.
+
+A profile function is called for every hole, and formats its lengths (like x(mm))
+ each time. For a function which only formats its lengths, the text is the same for
+ every call but for the lengths. So the function is called once with placeholders,
+ giving a template, and the lengths of all the holes are then rounded and formatted
+ as whole arrays and filled into the template.
+Such functions are marked with the compilable decorator. Their other arguments (the
+ feedrates, heights...) are given as is when compiling, so they are resolved once.
+The text is the same as calling the function for each hole.
+"""
+from typing import Callable, Dict, List
+import re
+
+import numpy as np
+
+from .units import nm, Quantity, WHOLE_MAX_VALUE
+
+
+# Marks the formatted placeholders in the text of a template
+_MARKER = "\x00{}\x00"
+_RE_MARKER = re.compile("\x00(\\d+)\x00")
+
+
+def compilable(function: Callable) -> Callable:
+    """
+    Decorator marking a profile function which can be compiled into templates.
+    The function must only format its length arguments (as in f"X{x(mm)}"), and must
+    only compare its index to 0 and to the last index, to tell the first and last
+    hole of a series.
+    """
+    function.compilable = True
+    return function
+
+
+def is_compilable(function: Callable) -> bool:
+    """ @returns True if the profile function can be compiled into templates """
+    return getattr(function, "compilable", False)
+
+
+class Placeholder:
+    """ Stands for a length argument while compiling. Records the units it is formatted in. """
+    def __init__(self, name: str, fields: List):
+        self.name = name
+        self.fields = fields
+
+    def __call__(self, target_unit=None):
+        """ @returns A marker of the length formatted in the unit, replaced once rendering """
+        field = (self.name, target_unit or nm)
+
+        if field not in self.fields:
+            self.fields.append(field)
+
+        return _MARKER.format(self.fields.index(field))
+
+
+class Template:
+    """ The text of a profile function, with fields for the lengths """
+    def __init__(self, function: Callable, lengths: List[str], **kwargs):
+        """
+        Call the function to create the template.
+        @param function: The profile function
+        @param lengths: The names of the length arguments, replaced by placeholders
+        @param kwargs: The other arguments of the function
+        @raises Exception: Whatever the function raises if it does more than formatting
+                the lengths, like computing with them
+        """
+        # The (argument name, unit) of each field, in the order of their numbers
+        self.fields = []
+        placeholders = {name: Placeholder(name, self.fields) for name in lengths}
+
+        # The writer joins the chunks of a function as lines
+        text = "\n".join(function(**placeholders, **kwargs))
+
+        # Turn into a format string
+        parts = _RE_MARKER.split(text)
+        parts[::2] = [part.replace("{", "{{").replace("}", "}}") for part in parts[::2]]
+        parts[1::2] = ["{" + number + "}" for number in parts[1::2]]
+        self.text = "".join(parts)
+
+    def render(self, lengths: Dict[str, np.ndarray]) -> List[str]:
+        """
+        @param lengths: The lengths of the holes, as whole nm arrays by argument name
+        @returns The text of each hole
+        """
+        columns = [format_lengths(lengths[name], unit) for name, unit in self.fields]
+
+        if not columns:
+            return [self.text.format()] * len(next(iter(lengths.values())))
+
+        return [self.text.format(*values) for values in zip(*columns)]
+
+
+def whole_nm(length: Quantity):
+    """
+    @returns The length as a whole number of nm if it is held as such, or None.
+             Only such lengths give the same text once compiled.
+    """
+    if length.unit.conversion_factor == 1 and type(length.value) is int:
+        return length.value
+
+    return None
+
+
+def round_lengths(values: np.ndarray, resolution: Quantity) -> np.ndarray:
+    """
+    Round whole nm lengths to a resolution, like Quantity.round does for each
+    @returns The rounded lengths, or None if the resolution is not a whole number of nm
+    """
+    if not float(resolution.base).is_integer() or \
+            (len(values) and np.abs(values).max() >= WHOLE_MAX_VALUE):
+        return None
+
+    return (values * nm).round(resolution).value
+
+
+def format_lengths(values: np.ndarray, unit) -> List[str]:
+    """
+    Format whole nm lengths in a unit, like f"{nm(value)(unit)}" does for each
+    @returns The text of each length
+    """
+    if unit.decimal_exponent is None:
+        return [f"{nm(value)(unit)}" for value in values.tolist()]
+
+    converted = (values * nm)(unit)
+
+    if converted.dtype.kind in "iu":
+        return [str(value) for value in converted.tolist()]
+
+    # Like a Quantity, the whole lengths are written without decimals
+    whole, remainder = np.divmod(values, 10**unit.decimal_exponent)
+
+    return [
+        str(quotient) if rest == 0 else str(fraction)
+        for quotient, rest, fraction in zip(whole.tolist(), remainder.tolist(), converted.tolist())
+    ]
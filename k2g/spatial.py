@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Spatial index for the travel optimization.
+
+The points are bucketed in a uniform grid sized for a few points per cell.
+ Neighbour queries only look at the cells surrounding a point, so the memory
+ and the time grow linearly with the number of points, unlike a distance matrix.
+PCB holes are well suited for a grid, since they are spread over a rectangle.
+"""
+from math import sqrt
+
+import numpy as np
+
+from .constants import GRID_POINTS_PER_CELL
+
+
+class GridIndex:
+    """
+    A uniform grid over a set of points.
+    The points of each cell are stored contiguously (sorted by cell), and the cells
+    are numbered by column, so a column of cells is a single slice.
+    The index also tracks which points are still available, to find the nearest
+    point not yet visited.
+    """
+    def __init__(self, points: np.ndarray, points_per_cell=GRID_POINTS_PER_CELL):
+        self.points = np.asarray(points, dtype=float).reshape(-1, 2)
+        num_points = len(self.points)
+
+        low = self.points.min(axis=0) if num_points else np.zeros(2)
+        extent = (self.points.max(axis=0) - low) if num_points else np.zeros(2)
+        cells_wanted = max(num_points / points_per_cell, 1)
+
+        # The longest side bounds the cell size too, so a flat set does not create
+        # an excessive number of cells
+        self.cell_size = max(
+            sqrt(extent[0] * extent[1] / cells_wanted), max(extent) / cells_wanted, 1.0)
+        self.origin = low
+        self.shape = tuple(int(cells) + 1 for cells in extent // self.cell_size)
+
+        cell_x, cell_y = self._cells_of(self.points)
+        cell_ids = cell_x * self.shape[1] + cell_y
+
+        # Points sorted by cell. The points of cell i are sorted[start[i]:start[i+1]]
+        self.sorted = np.argsort(cell_ids, kind="stable")
+        self.start = np.searchsorted(
+            cell_ids[self.sorted], np.arange(self.shape[0] * self.shape[1] + 1))
+
+        # All points are available to start with
+        self.available = np.ones(num_points, dtype=bool)
+        self.available_count = num_points
+        self.free = np.bincount(cell_ids, minlength=self.shape[0] * self.shape[1])
+        self.free = self.free.reshape(self.shape)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cells_of(self, points):
+        """ @returns The cell coordinates of the points, clipped to the grid """
+        cells = ((points - self.origin) // self.cell_size).astype(int)
+        cells = np.clip(cells, 0, np.array(self.shape) - 1)
+
+        return cells[..., 0], cells[..., 1]
+
+    def _members(self, low_x, high_x, low_y, high_y):
+        """ @returns The indexes of the points in the rectangle of cells (included) """
+        low_x, low_y = max(low_x, 0), max(low_y, 0)
+        high_x, high_y = min(high_x, self.shape[0] - 1), min(high_y, self.shape[1] - 1)
+
+        if low_x > high_x or low_y > high_y:
+            return np.empty(0, dtype=np.intp)
+
+        slices = []
+
+        for cell_x in range(low_x, high_x + 1):
+            column = cell_x * self.shape[1]
+            slices.append(self.sorted[self.start[column + low_y]:self.start[column + high_y + 1]])
+
+        return np.concatenate(slices)
+
+    def _covers_grid(self, cell_x, cell_y, radius):
+        """ @returns True if the square of cells of the given radius covers the whole grid """
+        return (cell_x - radius <= 0 and cell_x + radius >= self.shape[0] - 1 and
+                cell_y - radius <= 0 and cell_y + radius >= self.shape[1] - 1)
+
+    def knn(self, k: int):
+        """
+        Find the k nearest neighbours of each point.
+        Points of a cell are processed together, looking in a growing square of cells
+        around it until the k-th neighbour is closer than the edge of the square.
+        @returns A tuple of 2 (n, k) arrays: The indexes and distances of the neighbours,
+                 sorted nearest first
+        """
+        num_points = len(self.points)
+        k = max(min(k, num_points - 1), 0)
+        indexes = np.empty((num_points, k), dtype=np.intp)
+        distances = np.empty((num_points, k))
+
+        if k == 0:
+            return indexes, distances
+
+        for cell in np.flatnonzero(np.diff(self.start)):
+            cell_x, cell_y = divmod(int(cell), self.shape[1])
+            pending = self.sorted[self.start[cell]:self.start[cell + 1]]
+            radius = 1
+
+            while len(pending):
+                candidates = self._members(
+                    cell_x - radius, cell_x + radius, cell_y - radius, cell_y + radius)
+
+                if len(candidates) > k:
+                    delta = self.points[pending, None, :] - self.points[None, candidates, :]
+                    squared = delta[..., 0] ** 2 + delta[..., 1] ** 2
+
+                    # Never be your own neighbour
+                    squared[pending[:, None] == candidates[None, :]] = np.inf
+
+                    nearest = np.argpartition(squared, k - 1, axis=1)[:, :k]
+                    nearest_squared = np.take_along_axis(squared, nearest, axis=1)
+                    ranks = np.argsort(nearest_squared, axis=1)
+                    nearest = np.take_along_axis(nearest, ranks, axis=1)
+                    nearest_squared = np.take_along_axis(nearest_squared, ranks, axis=1)
+
+                    # Only keep the points whose k-th neighbour is within the searched square
+                    if self._covers_grid(cell_x, cell_y, radius):
+                        done = np.ones(len(pending), dtype=bool)
+                    else:
+                        done = nearest_squared[:, -1] <= (radius * self.cell_size) ** 2
+
+                    indexes[pending[done]] = candidates[nearest[done]]
+                    distances[pending[done]] = np.sqrt(nearest_squared[done])
+                    pending = pending[~done]
+
+                radius += 1
+
+        return indexes, distances
+
+    def query(self, index: int, k: int):
+        """
+        Find the k nearest neighbours of a single point, like knn does for all points.
+        Cheaper than knn when only a few points need their neighbours.
+        @param index: The index of the point
+        @returns A tuple of 2 arrays: The indexes and distances of the neighbours,
+                 sorted nearest first
+        """
+        k = max(min(k, len(self.points) - 1), 0)
+        point = self.points[index]
+        cell_x, cell_y = (int(c) for c in self._cells_of(point))
+        radius = 1
+
+        while True:
+            candidates = self._members(
+                cell_x - radius, cell_x + radius, cell_y - radius, cell_y + radius)
+            covered = self._covers_grid(cell_x, cell_y, radius)
+
+            if len(candidates) > k or covered:
+                # Never be your own neighbour
+                candidates = candidates[candidates != index]
+                delta = self.points[candidates] - point
+                squared = delta[:, 0] ** 2 + delta[:, 1] ** 2
+                nearest = np.argsort(squared, kind="stable")[:k]
+
+                if covered or len(nearest) == 0 or \
+                        squared[nearest[-1]] <= (radius * self.cell_size) ** 2:
+                    return candidates[nearest], np.sqrt(squared[nearest])
+
+            radius += 1
+
+    def remove(self, index: int):
+        """ Mark the point as no longer available to the nearest queries """
+        if self.available[index]:
+            self.available[index] = False
+            self.available_count -= 1
+            cell_x, cell_y = self._cells_of(self.points[index])
+            self.free[cell_x, cell_y] -= 1
+
+    def nearest(self, point) -> int:
+        """
+        Find the nearest available point, looking at rings of cells around the point.
+        Falls back to a search over all available points when the rings get too large.
+        @returns The index of the nearest available point, or -1 if none are left
+        """
+        if self.available_count == 0:
+            return -1
+
+        x, y = point
+        cell_x, cell_y = (int(c) for c in self._cells_of(np.asarray(point, dtype=float)))
+        best, best_distance = -1, np.inf
+        radius = 0
+
+        while True:
+            low_x, high_x = cell_x - radius, cell_x + radius
+            low_y, high_y = cell_y - radius, cell_y + radius
+
+            if (2 * radius + 1) ** 2 > 4 * self.available_count:
+                # The rings get too large for the points left. Check them all.
+                remaining = np.flatnonzero(self.available)
+                delta = self.points[remaining] - (x, y)
+                return int(remaining[np.argmin(np.hypot(delta[:, 0], delta[:, 1]))])
+
+            # The ring is made of 2 rows and 2 columns (or a single cell for radius 0)
+            if radius == 0:
+                strips = [(low_x, high_x, low_y, high_y)]
+            else:
+                strips = [
+                    (low_x, high_x, low_y, low_y), (low_x, high_x, high_y, high_y),
+                    (low_x, low_x, low_y + 1, high_y - 1), (high_x, high_x, low_y + 1, high_y - 1)
+                ]
+
+            for strip_low_x, strip_high_x, strip_low_y, strip_high_y in strips:
+                free = self.free[
+                    max(strip_low_x, 0):max(strip_high_x + 1, 0),
+                    max(strip_low_y, 0):max(strip_high_y + 1, 0)
+                ]
+
+                if not free.any():
+                    continue
+
+                members = self._members(strip_low_x, strip_high_x, strip_low_y, strip_high_y)
+                members = members[self.available[members]]
+                delta = self.points[members] - (x, y)
+                member_distances = np.hypot(delta[:, 0], delta[:, 1])
+                closest = np.argmin(member_distances)
+
+                if member_distances[closest] < best_distance:
+                    best, best_distance = int(members[closest]), member_distances[closest]
+
+            # Distance from the point to the edge of the square searched so far
+            bound = min(
+                x - (self.origin[0] + low_x * self.cell_size),
+                self.origin[0] + (high_x + 1) * self.cell_size - x,
+                y - (self.origin[1] + low_y * self.cell_size),
+                self.origin[1] + (high_y + 1) * self.cell_size - y,
+            )
+
+            if best >= 0 and (best_distance <= bound or self._covers_grid(cell_x, cell_y, radius)):
+                return best
+
+            radius += 1
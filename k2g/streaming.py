@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Streaming of the G-code to a CNC controller, over a serial port or a TCP socket.
+
+Controllers receive the lines in a small buffer, which their planner empties as it
+ executes them. The buffer must never overflow, and should never run dry either,
+ or the machine pauses between the moves. The flow control is either:
+ - count: The characters of the lines sent but not yet acknowledged are counted, and
+   a line is sent as soon as it fits the receive buffer of the controller. The buffer
+   stays full, and never overflows. This is what Grbl expects.
+ - ack: A line is sent once the previous line is acknowledged. Slower, but works with
+   any controller replying 'ok' to each line.
+The G-code is generated in a thread, a few chunks ahead of the sending, so the
+ machine starts while the rest of the G-code is generated.
+The serial ports require the optional pyserial-asyncio package.
+A simulated controller listening on a local TCP port stands in for a machine in
+ the tests.
+"""
+from collections import deque
+import asyncio
+import logging
+
+from .config import global_settings as gs
+from .constants import STREAM_CHUNK_SIZE, STREAM_QUEUE_SIZE
+
+
+logger = logging.getLogger(__name__)
+
+# Encoding of the lines sent and received. Other characters (in the comments, like
+# the name of the board) are sent as '?'
+ENCODING = "ascii"
+
+# Prefix of the addresses of TCP sockets
+TCP_PREFIX = "tcp://"
+
+# Marks the end of the lines of a LineQueue
+_END = object()
+
+
+class StreamingError(RuntimeError):
+    """ The controller rejected a line, raised an alarm or closed the connection """
+
+
+async def open_connection(port: str, baudrate: int=None):
+    """
+    Connect to a controller
+    @param port: A TCP socket as tcp://host:port, or a serial port like /dev/ttyUSB0 or COM3
+    @param baudrate: Speed of the serial port. Defaults to the global settings.
+    @returns The (reader, writer) streams of the connection
+    """
+    if port.startswith(TCP_PREFIX):
+        host, _, number = port[len(TCP_PREFIX):].rpartition(":")
+        return await asyncio.open_connection(host, int(number))
+
+    try:
+        import serial_asyncio  # pylint: disable=import-outside-toplevel
+    except ImportError as exception:
+        raise RuntimeError(
+            "Streaming to a serial port requires the pyserial-asyncio package") from exception
+
+    return await serial_asyncio.open_serial_connection(
+        url=port, baudrate=baudrate or gs.streaming.baudrate)
+
+
+class Sender:
+    """ Send lines of G-code to a controller, keeping pace with its receive buffer """
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 flow_control: str=None, rx_buffer_size: int=None):
+        """
+        @param reader, writer: The streams of the connection to the controller
+        @param flow_control: 'count' or 'ack'. Defaults to the global settings.
+        @param rx_buffer_size: Size in bytes of the receive buffer of the controller.
+                               Defaults to the global settings.
+        """
+        self.reader = reader
+        self.writer = writer
+        self.flow_control = flow_control or gs.streaming.flow_control
+        self.rx_buffer_size = rx_buffer_size or gs.streaming.rx_buffer_size
+
+        # Lines sent and not yet acknowledged, with their size in bytes
+        self.pending = deque()
+        self.pending_size = 0
+
+        # Number of lines acknowledged
+        self.acknowledged = 0
+
+    def _fits(self, size: int) -> bool:
+        """ @returns True if a line of the size can be sent now """
+        if not self.pending:
+            # A line longer than the buffer can only wait for an empty buffer
+            return True
+
+        if self.flow_control == "ack":
+            return False
+
+        return self.pending_size + size <= self.rx_buffer_size
+
+    async def send_line(self, line: str):
+        """ Send a line, once the controller has room for it """
+        data = (line + "\n").encode(ENCODING, "replace")
+
+        while not self._fits(len(data)):
+            await self.receive()
+
+        self.pending.append((line, len(data)))
+        self.pending_size += len(data)
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def receive(self):
+        """
+        Wait for a response of the controller
+        @raises StreamingError: If the controller rejected the oldest line pending,
+                                raised an alarm or closed the connection
+        """
+        response = await self.reader.readline()
+
+        if not response:
+            raise StreamingError("The controller closed the connection")
+
+        response = response.decode(ENCODING, "replace").strip()
+
+        if response == "ok" or response.startswith("error"):
+            line, size = self.pending.popleft()
+            self.pending_size -= size
+            self.acknowledged += 1
+
+            if response != "ok":
+                raise StreamingError(f"The controller rejected '{line}': {response}")
+        elif response.startswith("ALARM"):
+            raise StreamingError(f"The controller raised an alarm: {response}")
+        elif response:
+            # Welcome message, status report...
+            logger.info("Controller: %s", response)
+
+    async def send(self, lines):
+        """
+        Send all the lines, and wait for the controller to acknowledge them
+        @param lines: An iterable or an asynchronous iterable of lines
+        """
+        if hasattr(lines, "__aiter__"):
+            async for line in lines:
+                await self.send_line(line)
+        else:
+            for line in lines:
+                await self.send_line(line)
+
+        while self.pending:
+            await self.receive()
+
+
+class LineQueue:
+    """
+    A text stream, written to from a thread, whose lines are read back asynchronously.
+    The queue holds a few chunks, so writing blocks once too far ahead of the reading.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop, size: int=STREAM_QUEUE_SIZE):
+        """
+        @param loop: The event loop the lines are read from
+        @param size: Number of chunks written ahead of the reading
+        """
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+        self.aborted = False
+
+    def _put(self, item):
+        """ Add to the queue from the writing thread, waiting for room """
+        if self.aborted:
+            raise StreamingError("The streaming was aborted")
+
+        asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop).result()
+
+    def write(self, text: str) -> int:
+        """ Add the text to the queue. The text is made of whole lines. """
+        self._put(text)
+        return len(text)
+
+    def close(self, exception: Exception=None):
+        """ Mark the end of the text, or the exception which stopped the writing """
+        self._put(_END if exception is None else exception)
+
+    def abort(self):
+        """ Stop reading. The writing thread gets an exception on its next write. """
+        self.aborted = True
+
+        # Make room for a write already waiting
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    async def __aiter__(self):
+        while True:
+            item = await self.queue.get()
+
+            if item is _END:
+                return
+
+            if isinstance(item, Exception):
+                raise item
+
+            for line in item.splitlines():
+                yield line
+
+
+def _generate(machining, lines: LineQueue):
+    """ Generate the G-code into the queue (from a thread) """
+    try:
+        # Rendered in this thread, so the first lines come right away
+        machining.generate_machine_code(lines, STREAM_CHUNK_SIZE, 1)
+    except Exception as exception:  # pylint: disable=broad-except
+        if not lines.aborted:
+            lines.close(exception)
+
+        raise
+
+    lines.close()
+
+
+async def stream_machine_code(machining, port: str, flow_control: str=None,
+                              rx_buffer_size: int=None, baudrate: int=None) -> int:
+    """
+    Generate the G-code of the machining, and stream it to a controller at the same time.
+    @param machining: The Machining, optimized
+    @param port: The controller. See open_connection.
+    @param flow_control, rx_buffer_size: See Sender
+    @param baudrate: Speed of the serial port
+    @returns The number of lines acknowledged by the controller
+    @raises StreamingError: If the controller did not accept all the lines
+    """
+    reader, writer = await open_connection(port, baudrate)
+    sender = Sender(reader, writer, flow_control, rx_buffer_size)
+    lines = LineQueue(asyncio.get_running_loop())
+    generation = asyncio.ensure_future(asyncio.to_thread(_generate, machining, lines))
+
+    try:
+        await sender.send(lines)
+        await generation
+    finally:
+        if not generation.done():
+            # The sending failed. Stop the generation too.
+            lines.abort()
+            await asyncio.gather(generation, return_exceptions=True)
+
+        writer.close()
+        await writer.wait_closed()
+
+    return sender.acknowledged
+
+
+class SimulatedController:
+    """
+    A controller listening on a local TCP port, standing in for a machine.
+    Like Grbl, the bytes received go to a receive buffer. The planner takes the lines
+     from the buffer one at a time, executing each in line_time seconds, then
+     acknowledges it with 'ok' (or an error for the rejected lines).
+    The lines executed and the peak use of the receive buffer are recorded, to check
+     the flow control.
+    """
+    def __init__(self, rx_buffer_size: int=128, line_time: float=0.0, reject=()):
+        """
+        @param rx_buffer_size: Size of the receive buffer in bytes
+        @param line_time: Time in seconds the planner takes for each line
+        @param reject: Words making a line rejected, like M98
+        """
+        self.rx_buffer_size = rx_buffer_size
+        self.line_time = line_time
+        self.reject = tuple(reject)
+        self.server = None
+
+        # Lines executed, and the largest number of bytes held by the receive buffer
+        self.lines = []
+        self.peak_buffered = 0
+
+    @property
+    def overflowed(self) -> bool:
+        """ @returns True if the receive buffer received more than it holds """
+        return self.peak_buffered > self.rx_buffer_size
+
+    async def start(self) -> str:
+        """ Start listening @returns The address to connect to """
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        host, number = self.server.sockets[0].getsockname()[:2]
+
+        return f"{TCP_PREFIX}{host}:{number}"
+
+    async def close(self):
+        """ Stop listening """
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """ Handle a connection """
+        buffer = bytearray()
+        received = asyncio.Event()
+
+        async def receive():
+            while data := await reader.read(1024):
+                buffer.extend(data)
+                self.peak_buffered = max(self.peak_buffered, len(buffer))
+                received.set()
+
+            received.set()
+
+        receiving = asyncio.ensure_future(receive())
+        writer.write(b"Grbl 1.1h ['$' for help]\n")
+
+        try:
+            while True:
+                end = buffer.find(b"\n")
+
+                if end < 0:
+                    if receiving.done():
+                        break
+
+                    received.clear()
+                    await received.wait()
+                    continue
+
+                # The planner takes the line, which frees its room in the buffer
+                line = buffer[:end].decode(ENCODING).strip()
+                del buffer[:end + 1]
+                await asyncio.sleep(self.line_time)
+
+                if any(word in line for word in self.reject):
+                    writer.write(b"error:20\n")
+                else:
+                    self.lines.append(line)
+                    writer.write(b"ok\n")
+
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            receiving.cancel()
+            writer.close()
@@ -0,0 +1,830 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Tour engines used to order the machining operations of a tool.
+
+A tour visits 'stops'. Each stop has an entry and an exit point. For a hole, both
+ points are the same. For a segment (like a routed slot), the entry is the start
+ and the exit is the end. Travelling along the segment has no cost, since the
+ machining has to happen anyway.
+A segment can be reversible, when the direction of the cut does not matter. The tour
+ can then travel it backwards, from its exit to its entry.
+The tour is an open path: the CNC does not need to return to the first stop.
+A start point can be given, such as the tool change position. The travel from the
+ start point to the first stop is then part of the tour.
+
+The engine is picked from the size of the problem:
+ - Tiny sets are solved exactly using dynamic programming
+ - Larger sets are built using the nearest neighbour, then improved with 2-opt and
+   Or-opt moves, only trying the nearest neighbours of each stop.
+
+The heuristic is 'anytime': given a time budget, it stops improving when the budget
+ runs out, or keeps on perturbing and improving the tour until it does, returning
+ the best tour found so far.
+All coordinates are given as numpy arrays of shape (n, 2) in nm.
+The tour minimizes the cost of the travels, which is the distance by default, or any
+ other cost model - see the cost module.
+"""
+from collections import deque
+from itertools import product
+from time import perf_counter
+import logging
+
+import numpy as np
+
+from python_tsp.exact import solve_tsp_dynamic_programming
+
+from .bound import tour_lower_bound
+from .constants import TOUR_EXACT_MAX_SIZE, TOUR_NEIGHBOURS, TOUR_REPAIR_MAX_CHANGES
+from .cost import CostModel, EuclideanCost
+from .distance import distance_matrix, point_distance
+from .spatial import GridIndex
+
+
+logger = logging.getLogger(__name__)
+
+# Longest chain of stops moved by an Or-opt move
+_OR_OPT_MAX_CHAIN = 3
+
+# Longest section of the tour moved by a perturbation (double bridge)
+_PERTURBATION_SPAN = 50
+
+
+def path_length(entries: np.ndarray, exits: np.ndarray, order, start=None,
+                cost: CostModel=None) -> float:
+    """
+    @param entries, exits: The entry and exit point of each stop
+    @param order: The order to visit the stops in
+    @param start: Optional point where the path starts from
+    @param cost: The cost model. Defaults to the euclidean distance.
+    @returns The travelling cost of the path
+    """
+    order = np.asarray(order, dtype=np.intp)
+    length = 0.0
+
+    if start is not None and len(order):
+        length += float(point_distance(start, entries[order[0]], cost))
+
+    if len(order) > 1:
+        length += float(point_distance(exits[order[:-1]], entries[order[1:]], cost).sum())
+
+    return length
+
+
+def orient(entries: np.ndarray, exits: np.ndarray, backwards: np.ndarray):
+    """
+    @param backwards: Flags of the stops travelled from their exit to their entry
+    @returns The entry and exit point of each stop, as travelled
+    """
+    backwards = np.asarray(backwards, dtype=bool)[:, None]
+
+    return np.where(backwards, exits, entries), np.where(backwards, entries, exits)
+
+
+def closest_end_first(order, entries: np.ndarray, exits: np.ndarray, point,
+                      cost: CostModel=None, reversible: np.ndarray=None):
+    """
+    Travel the path backwards if its last stop is closer to the point than its first.
+    Paths with segments are only reversed if all the segments are reversible, since
+    the segments would be reversed too.
+    @param entries, exits: The entry and exit point of each stop, as travelled
+    @param reversible: Optional flags of the stops which can be travelled backwards
+    @returns The order, possibly reversed
+    """
+    segments = np.any(entries != exits, axis=1)
+
+    if reversible is not None:
+        segments &= ~np.asarray(reversible, dtype=bool)
+
+    if len(order) < 2 or segments.any():
+        return order
+
+    if point_distance(point, exits[order[-1]], cost) < point_distance(point, entries[order[0]], cost):
+        return order[::-1]
+
+    return order
+
+
+class Tour:
+    """ Result of a tour optimization """
+    def __init__(self, order, length: float, lower_bound: float=0.0, backwards=None):
+        # Indexes of the stops in the order to visit them
+        self.order = order
+        # For each stop, True if it is travelled from its exit to its entry
+        self.backwards = np.zeros(len(order), dtype=bool) if backwards is None else \
+            np.asarray(backwards, dtype=bool)
+        # Total travelling cost. In nm for the distance.
+        self.length = length
+        # No tour can be shorter than this. 0 if not known.
+        self.lower_bound = lower_bound
+
+    def __len__(self):
+        return len(self.order)
+
+    def oriented(self, entries: np.ndarray, exits: np.ndarray):
+        """ @returns The entry and exit point of each stop, as travelled """
+        return orient(entries, exits, self.backwards)
+
+    def reverse(self):
+        """ Travel the tour the other way round. All the stops are travelled backwards. """
+        self.order = self.order[::-1]
+        self.backwards = ~self.backwards
+
+    @property
+    def gap(self) -> float:
+        """ @returns How much longer than its lower bound the tour is in %, or None if not known """
+        if self.lower_bound > 0:
+            return 100 * max(self.length / self.lower_bound - 1, 0.0)
+
+        return 0.0 if self.length == 0 else None
+
+    def __repr__(self) -> str:
+        return f"Tour of {len(self.order)} stops, length {self.length:.0f}nm"
+
+
+class TourSolver:
+    """ Abstract base class for all tour engines """
+    def __init__(self, cost: CostModel=None):
+        """ @param cost: The cost model to minimize. Defaults to the euclidean distance. """
+        self.cost = cost or EuclideanCost()
+
+    def solve(self, entries: np.ndarray, exits: np.ndarray,
+              time_budget: float=None, start: np.ndarray=None,
+              reversible: np.ndarray=None) -> Tour:
+        """
+        Find a short path visiting all stops
+        @param entries: Array of (n, 2) of the entry point of each stop
+        @param exits: Array of (n, 2) of the exit point of each stop
+        @param time_budget: Time in seconds allowed for improving the tour. If None, stop
+                            improving once no improving move can be found.
+        @param start: Optional point to start from. If None, the path can start anywhere.
+        @param reversible: Optional flags of the stops which can be travelled backwards.
+                           By default, the segments keep their direction.
+        @returns A Tour object
+        """
+        raise NotImplementedError
+
+
+class ExactSolver(TourSolver):
+    """
+    Optimal solution using dynamic programming.
+    A dummy stop with a zero cost to return to it is added, so the closed loop
+    returned by the solver can be cut open at the dummy stop. The dummy stop is the
+    start point, if given, or has a zero cost to reach all stops.
+    The segments keep their direction.
+    """
+    def solve(self, entries, exits, time_budget=None, start=None, reversible=None):
+        num_stops = len(entries)
+
+        matrix = np.zeros((num_stops + 1, num_stops + 1))
+        matrix[1:, 1:] = distance_matrix(exits, entries, cost=self.cost)
+        np.fill_diagonal(matrix, 0)
+
+        if start is not None:
+            matrix[0, 1:] = point_distance(start, entries, self.cost)
+
+        permutation, length = solve_tsp_dynamic_programming(matrix)
+
+        # The dummy stop is always first. Drop it.
+        order = np.array(permutation[1:], dtype=np.intp) - 1
+
+        # The tour is optimal
+        return Tour(order, float(length), float(length))
+
+
+class HeuristicSolver(TourSolver):
+    """
+    Nearest neighbour construction followed by a local search using 2-opt and
+    Or-opt moves. Only the nearest neighbours of each stop are considered, and
+    stops are only revisited when their surrounding changed.
+    The neighbours come from a spatial index, so the memory grows linearly with
+    the number of stops.
+
+    Segments (where the entry and exit differ) are kept in their direction, so
+    2-opt moves which would reverse a segment are not allowed, unless the segment is
+    reversible. Reversible segments are flipped along with the section of the tour
+    they are in, or on their own when it saves a travel. The direction of each stop
+    is tracked by swapping its entry and exit.
+
+    With a time budget, the local search stops when the budget runs out. If time is
+    left, a section of the tour is shuffled (double bridge) and improved again,
+    keeping the best tour found.
+
+    A start point is added as an extra stop which is pinned first in the tour.
+    """
+    def __init__(self, neighbours=TOUR_NEIGHBOURS, seed=0, cost: CostModel=None):
+        super().__init__(cost)
+        self.neighbours = neighbours
+        self.seed = seed
+
+        # Travelling cost between 2 points. Bound once, as it is called in the inner loops.
+        self._dist = self.cost.between
+
+    def _prepare(self, entries, exits, time_budget, start, reversible=None, backwards=None):
+        """
+        Set up the search state common to solving and repairing a tour
+        @param backwards: Optional flags of the stops to start travelling backwards
+        @returns The entries and exits, with the start point added as the last stop
+        """
+        self.deadline = None if time_budget is None else perf_counter() + time_budget
+
+        # The start point is an extra stop which never moves from the first position
+        self.first = 0
+
+        if start is not None:
+            entries = np.vstack((entries, start))
+            exits = np.vstack((exits, start))
+            self.first = 1
+
+        # Work on plain lists from here. Scalar access to numpy arrays is slow.
+        self.ent_x, self.ent_y = entries[:, 0].tolist(), entries[:, 1].tolist()
+        self.ext_x, self.ext_y = exits[:, 0].tolist(), exits[:, 1].tolist()
+
+        # Segments cannot be reversed, unless told otherwise
+        segments = np.any(entries != exits, axis=1)
+        flags = np.zeros(len(entries), dtype=bool)
+
+        if reversible is not None:
+            flags[:len(reversible)] = reversible
+
+        self.locked = segments & ~flags
+        self.has_locked = bool(self.locked.any())
+        self.reversible = segments & flags
+        self.has_reversible = bool(self.reversible.any())
+        self.flipped = np.zeros(len(entries), dtype=bool)
+
+        if backwards is not None:
+            for stop in np.flatnonzero(np.asarray(backwards, dtype=bool) & self.reversible[:len(backwards)]):
+                self._flip(stop)
+
+        return entries, exits
+
+    def _flip(self, stop):
+        """ Travel a reversible segment the other way """
+        self.ent_x[stop], self.ext_x[stop] = self.ext_x[stop], self.ent_x[stop]
+        self.ent_y[stop], self.ext_y[stop] = self.ext_y[stop], self.ent_y[stop]
+        self.flipped[stop] = not self.flipped[stop]
+
+    def _length(self, entries, exits):
+        """ @returns The cost of the current tour """
+        if self.has_reversible:
+            entries, exits = orient(entries, exits, self.flipped)
+
+        return path_length(entries, exits, self.tour, cost=self.cost)
+
+    def _result(self, length, lower_bound=0.0):
+        """ @returns The current tour, without the start point """
+        num_stops = len(self.tour) - self.first
+
+        return Tour(self.tour[self.first:], length, lower_bound, self.flipped[:num_stops].copy())
+
+    def _rank(self, entries, stops, nbrs, nbrs_distance):
+        """
+        Rank the nearest neighbours of the stops by their cost, if it is not the distance
+        @returns The neighbours and their costs
+        """
+        if isinstance(self.cost, EuclideanCost):
+            return nbrs, nbrs_distance
+
+        delta = entries[nbrs] - entries[stops, None, :]
+        nbrs_distance = self.cost.travel(delta[..., 0], delta[..., 1])
+        ranks = np.argsort(nbrs_distance, axis=-1, kind="stable")
+
+        return np.take_along_axis(nbrs, ranks, axis=-1), np.take_along_axis(nbrs_distance, ranks, axis=-1)
+
+    def _set_tour(self, tour):
+        """ Start the search from the given tour """
+        self.tour = tour
+        self.pos = np.empty(len(tour), dtype=np.intp)
+        self.pos[tour] = np.arange(len(tour))
+        self.last = len(tour) - 1
+
+    def solve(self, entries, exits, time_budget=None, start=None, reversible=None):
+        entries, exits = self._prepare(entries, exits, time_budget, start, reversible)
+        num_stops = len(entries)
+
+        # The search only considers the nearest neighbours of each stop
+        index = GridIndex(entries)
+        nbrs, nbrs_distance = index.knn(self.neighbours)
+
+        # The start point is one of the stops here
+        lower_bound = tour_lower_bound(entries, exits, cost=self.cost, knn=(nbrs, nbrs_distance))
+        nbrs, nbrs_distance = self._rank(entries, np.arange(num_stops), nbrs, nbrs_distance)
+
+        self.nbrs = nbrs.tolist()
+        self.nbrs_distance = nbrs_distance.tolist()
+
+        self._set_tour(self._construct(index, exits, num_stops - 1 if self.first else 0))
+        self._local_search()
+        length = self._length(entries, exits)
+
+        if self.deadline is not None:
+            length = self._perturb(entries, exits, length)
+
+        return self._result(length, lower_bound)
+
+    def repair(self, entries, exits, order, changed, time_budget=None, start=None,
+               reversible=None, backwards=None) -> Tour:
+        """
+        Improve a tour where only a few stops changed, such as after a board revision.
+        Only the stops around the changes are looked at, and their neighbours are only
+        searched when needed, so the time depends on the number of changes.
+        @param order: The tour to improve, visiting all stops
+        @param changed: The stops next to a change of the tour
+        @param backwards: Optional flags of the stops the tour travels backwards
+        @returns The Tour. Its lower bound is not known, and is left to 0.
+        """
+        entries, exits = self._prepare(entries, exits, time_budget, start, reversible, backwards)
+        order = np.asarray(order, dtype=np.intp)
+
+        if self.first:
+            order = np.concatenate(([len(entries) - 1], order))
+
+        # The neighbours are searched on first use
+        self.nbrs_distance = {}
+        self.nbrs = _LazyNeighbours(self, GridIndex(entries), entries)
+
+        self._set_tour(order)
+        self.queue = deque()
+        self.active = [False] * len(order)
+        self._touch(*(self.pos[stop] + offset for stop in changed for offset in (-1, 0, 1)))
+        self._descend()
+
+        return self._result(self._length(entries, exits))
+
+    def _out_of_time(self):
+        """ @returns True if the time budget has run out """
+        return self.deadline is not None and perf_counter() > self.deadline
+
+    def _construct(self, index: GridIndex, exits, current):
+        """ Build a first tour by always visiting the nearest unvisited stop """
+        num_stops = len(index)
+        order = np.empty(num_stops, dtype=np.intp)
+
+        index.remove(current)
+        order[0] = current
+
+        for step in range(1, num_stops):
+            upcoming = -1
+
+            # Neighbours are sorted nearest first
+            for candidate in self.nbrs[current]:
+                if index.available[candidate]:
+                    upcoming = candidate
+                    break
+
+            if upcoming < 0:
+                # All neighbours are visited. Look further.
+                upcoming = index.nearest((self.ext_x[current], self.ext_y[current]))
+
+            # Enter a reversible segment from its closest end
+            if self.has_reversible and self.reversible[upcoming] and \
+                    self._dist(self.ext_x[current], self.ext_y[current],
+                               self.ext_x[upcoming], self.ext_y[upcoming]) < \
+                    self._cost(current, upcoming):
+                self._flip(upcoming)
+
+            index.remove(upcoming)
+            order[step] = upcoming
+            current = upcoming
+
+        return order
+
+    def _cost(self, u, v):
+        """ @returns The cost of travelling from the exit of stop u to the entry of stop v """
+        return self._dist(self.ext_x[u], self.ext_y[u], self.ent_x[v], self.ent_y[v])
+
+    def _link(self, i):
+        """ @returns The cost of travelling from the stop at position i to the next """
+        if i < 0 or i >= self.last:
+            return 0.0
+
+        return self._cost(self.tour[i], self.tour[i + 1])
+
+    def _touch(self, *positions):
+        """ Queue the stops around the given positions for another look """
+        for position in positions:
+            if 0 <= position <= self.last:
+                stop = self.tour[position]
+
+                if not self.active[stop]:
+                    self.active[stop] = True
+                    self.queue.append(stop)
+
+    def _local_search(self):
+        """ Apply improving moves until none can be found """
+        num_stops = len(self.tour)
+
+        if num_stops < 3:
+            return
+
+        self.queue = deque(self.tour.tolist())
+        self.active = [True] * num_stops
+
+        self._descend()
+
+    def _descend(self):
+        """ Improve the stops queued until the queue is empty or the time runs out """
+        while self.queue and not self._out_of_time():
+            stop = self.queue.popleft()
+            self.active[stop] = False
+
+            if not self._improve_flip(stop) and not self._improve_2opt(stop):
+                self._improve_or_opt(stop)
+
+    def _gain_2opt(self, i, j):
+        """
+        Gain of reversing the stops between position i+1 and j (included).
+        Position -1 and n-1 are the open ends of the path.
+        """
+        tour = self.tour
+        added = 0.0
+
+        if i >= 0:
+            u, v = tour[i], tour[j]
+            added += self._dist(self.ext_x[u], self.ext_y[u], self.ext_x[v], self.ext_y[v])
+
+        if j < self.last:
+            u, v = tour[i + 1], tour[j + 1]
+            added += self._dist(self.ent_x[u], self.ent_y[u], self.ent_x[v], self.ent_y[v])
+
+        return self._link(i) + self._link(j) - added
+
+    def _apply_2opt(self, i, j):
+        """ Reverse the stops between position i+1 and j (included) """
+        reversed_stops = self.tour[i + 1:j + 1][::-1].copy()
+        self.tour[i + 1:j + 1] = reversed_stops
+        self.pos[reversed_stops] = np.arange(i + 1, j + 1)
+        self._touch(i, i + 1, j, j + 1)
+
+        # The segments of the section are now travelled the other way
+        if self.has_reversible:
+            for stop in reversed_stops[self.reversible[reversed_stops]]:
+                self._flip(stop)
+
+    def _can_reverse(self, start, end):
+        """ @returns True if the stops from position start to end can be reversed """
+        return not (self.has_locked and self.locked[self.tour[start:end + 1]].any())
+
+    def _improve_2opt(self, stop):
+        """ Try 2-opt moves creating a link from the stop to one of its neighbours """
+        p = self.pos[stop]
+        limit = max(self._link(p - 1), self._link(p))
+
+        for candidate, distance in zip(self.nbrs[stop], self.nbrs_distance[stop]):
+            if distance >= limit:
+                break
+
+            q = self.pos[candidate]
+            low, high = min(p, q), max(p, q)
+
+            # Link both as first and last of the reversed section, or as their neighbours
+            for i, j in ((low, high), (low - 1, high - 1)):
+                if j - i < 2 or i < self.first - 1:
+                    continue
+
+                if self._gain_2opt(i, j) > self.cost.epsilon and self._can_reverse(i + 1, j):
+                    self._apply_2opt(i, j)
+                    return True
+
+        return False
+
+    def _improve_flip(self, stop):
+        """ Try travelling a reversible segment the other way """
+        if not (self.has_reversible and self.reversible[stop]):
+            return False
+
+        p = self.pos[stop]
+        tour = self.tour
+        gain = self._link(p - 1) + self._link(p)
+
+        if p > 0:
+            u = tour[p - 1]
+            gain -= self._dist(self.ext_x[u], self.ext_y[u], self.ext_x[stop], self.ext_y[stop])
+
+        if p < self.last:
+            v = tour[p + 1]
+            gain -= self._dist(self.ent_x[stop], self.ent_y[stop], self.ent_x[v], self.ent_y[v])
+
+        if gain > self.cost.epsilon:
+            self._flip(stop)
+            self._touch(p - 1, p, p + 1)
+            return True
+
+        return False
+
+    def _removal_gain(self, start, end):
+        """ Gain of taking out the chain of stops from position start to end (included) """
+        gain = self._link(start - 1) + self._link(end)
+
+        if start > 0 and end < self.last:
+            gain -= self._cost(self.tour[start - 1], self.tour[end + 1])
+
+        return gain
+
+    def _insertion_cost(self, first, final, after):
+        """
+        Cost of inserting a chain of stops, from first to final, after the stop
+        at position 'after'. Position -1 inserts at the front.
+        """
+        cost = -self._link(after)
+
+        if after >= 0:
+            cost += self._cost(self.tour[after], first)
+
+        if after < self.last:
+            cost += self._cost(final, self.tour[after + 1])
+
+        return cost
+
+    def _apply_or_opt(self, start, end, after):
+        """ Move the chain of stops from position start to end after position 'after' """
+        tour = self.tour
+        chain = tour[start:end + 1]
+
+        if after < start:
+            low, high = after + 1, end
+            moved = np.concatenate((chain, tour[after + 1:start]))
+        else:
+            low, high = start, after
+            moved = np.concatenate((tour[end + 1:after + 1], chain))
+
+        tour[low:high + 1] = moved
+        self.pos[moved] = np.arange(low, high + 1)
+        self._touch(low - 1, low, high, high + 1, start - 1, start)
+
+    def _improve_or_opt(self, stop):
+        """ Try moving the chain of stops starting with stop next to one of its neighbours """
+        start = self.pos[stop]
+
+        # The start point stays first
+        if start < self.first:
+            return False
+
+        for end in range(start, min(start + _OR_OPT_MAX_CHAIN, self.last + 1)):
+            removal = self._removal_gain(start, end)
+            final = self.tour[end]
+
+            for candidate, distance in zip(self.nbrs[stop], self.nbrs_distance[stop]):
+                if distance >= removal:
+                    break
+
+                q = self.pos[candidate]
+
+                # Insert the chain just after or just before the neighbour
+                for after in (q, q - 1):
+                    if start - 1 <= after <= end or after < self.first - 1:
+                        continue
+
+                    if removal - self._insertion_cost(stop, final, after) > self.cost.epsilon:
+                        self._apply_or_opt(start, end, after)
+                        return True
+
+        return False
+
+
+    def _perturb(self, entries, exits, length):
+        """
+        Iterated local search. Until the time runs out, swap 2 adjacent sections of
+        the tour and improve around the changes. Changes which do not shorten the tour
+        are undone.
+        @returns The length of the best tour found
+        """
+        num_stops = len(self.tour)
+
+        if num_stops < 8:
+            return length
+
+        rng = np.random.default_rng(self.seed)
+        best = self.tour.copy()
+        best_flipped = self.flipped.copy()
+
+        while not self._out_of_time():
+            # Pick sections [b, c[ and [c, d[ and swap them
+            b = int(rng.integers(1, num_stops - 2))
+            c = min(b + int(rng.integers(1, _PERTURBATION_SPAN)), num_stops - 1)
+            d = min(c + int(rng.integers(1, _PERTURBATION_SPAN)), num_stops)
+
+            moved = np.concatenate((self.tour[c:d], self.tour[b:c]))
+            self.tour[b:d] = moved
+            self.pos[moved] = np.arange(b, d)
+
+            self.queue.clear()
+            self.active = [False] * num_stops
+            self._touch(b - 1, b, b + d - c - 1, b + d - c, d - 1, d)
+            self._descend()
+
+            new_length = self._length(entries, exits)
+
+            if new_length < length - self.cost.epsilon:
+                length = new_length
+                best[:] = self.tour
+                best_flipped[:] = self.flipped
+            else:
+                self.tour[:] = best
+                self.pos[best] = np.arange(num_stops)
+
+                for stop in np.flatnonzero(self.flipped != best_flipped):
+                    self._flip(stop)
+
+        return length
+
+
+class _LazyNeighbours(dict):
+    """
+    The nearest neighbours of the stops, searched when first needed.
+    Also fills the costs of the neighbours in the solver. The neighbours are always
+    read before their costs.
+    """
+    def __init__(self, solver: HeuristicSolver, index: GridIndex, entries: np.ndarray):
+        super().__init__()
+        self.solver = solver
+        self.index = index
+        self.entries = entries
+
+    def __missing__(self, stop):
+        nbrs, nbrs_distance = self.index.query(stop, self.solver.neighbours)
+        nbrs, nbrs_distance = self.solver._rank(self.entries, stop, nbrs, nbrs_distance)
+        self[stop] = nbrs.tolist()
+        self.solver.nbrs_distance[stop] = nbrs_distance.tolist()
+
+        return self[stop]
+
+
+def get_solver(size: int, cost: CostModel=None, reversible: bool=False) -> TourSolver:
+    """
+    @param reversible: True if some segments can be travelled backwards, which only
+                       the heuristic supports
+    @returns The most appropriate solver for the given number of stops
+    """
+    if size <= TOUR_EXACT_MAX_SIZE and not reversible:
+        return ExactSolver(cost)
+
+    return HeuristicSolver(cost=cost)
+
+
+def solve_tour(entries: np.ndarray, exits: np.ndarray = None,
+               time_budget: float=None, start=None, cost: CostModel=None,
+               reversible: np.ndarray=None) -> Tour:
+    """
+    Find a short open path visiting all stops.
+    @param entries: Array of (n, 2) of the entry point of each stop
+    @param exits: Array of (n, 2) of the exit point of each stop. If None, the
+                  stops are single points (holes).
+    @param time_budget: Time in seconds allowed for improving the tour. If None, the
+                        improvement stops once no improving move can be found.
+    @param start: Optional (x, y) point the path starts from, such as the position of
+                  the tool change. The travel to the first stop is part of the length.
+    @param cost: The cost model to minimize. Defaults to the euclidean distance.
+    @param reversible: Optional flags of the stops which can be travelled backwards.
+                       By default, the segments keep their direction.
+    @returns The Tour
+    """
+    entries = np.asarray(entries, dtype=float).reshape(-1, 2)
+    exits = entries if exits is None else np.asarray(exits, dtype=float).reshape(-1, 2)
+    start = None if start is None else np.asarray(start, dtype=float).reshape(2)
+    num_stops = len(entries)
+    flags = np.zeros(num_stops, dtype=bool) if reversible is None else \
+        np.asarray(reversible, dtype=bool) & np.any(entries != exits, axis=1)
+
+    if num_stops < 3:
+        # Try all orders and directions
+        best = None
+
+        for order in (np.arange(num_stops), np.arange(num_stops)[::-1]):
+            for backwards in product(*([False, True] if flag else [False] for flag in flags)):
+                tour = Tour(order.copy(), 0.0, 0.0, backwards)
+                tour.length = path_length(*tour.oriented(entries, exits), order, start, cost)
+                tour.lower_bound = tour.length
+
+                if best is None or tour.length < best.length:
+                    best = tour
+
+        return best
+
+    solver = get_solver(num_stops, cost, bool(flags.any()))
+    logger.debug("Solving a tour of %d stops using %s", num_stops, type(solver).__name__)
+
+    return solver.solve(entries, exits, time_budget, start, flags)
+
+
+def _cheapest_insertion(entries, exits, order, stop, start, cost):
+    """
+    Insert a stop in the tour where it adds the least cost
+    @returns The new order and the position of the stop
+    """
+    order = np.asarray(order, dtype=np.intp)
+
+    if len(order) == 0:
+        return np.array([stop], dtype=np.intp), 0
+
+    # Cost of inserting before each stop, then after the last one
+    previous = exits[order[:-1]]
+    added = point_distance(previous, entries[stop], cost) + \
+        point_distance(exits[stop], entries[order[1:]], cost) - \
+        point_distance(previous, entries[order[1:]], cost)
+    front = point_distance(exits[stop], entries[order[0]], cost)
+
+    if start is not None:
+        front += point_distance(start, entries[stop], cost) - \
+            point_distance(start, entries[order[0]], cost)
+
+    back = point_distance(exits[order[-1]], entries[stop], cost)
+    costs = np.concatenate(([front], added, [back]))
+    position = int(np.argmin(costs))
+
+    return np.insert(order, position, stop), position
+
+
+def repair_tour(entries: np.ndarray, exits: np.ndarray, previous: np.ndarray,
+                time_budget: float=None, start=None, cost: CostModel=None,
+                reversible: np.ndarray=None) -> Tour:
+    """
+    Find a short open path visiting all stops, reusing a previous tour of a close set of
+    stops. The stops found in the previous tour are visited in the same order, the
+    stops which are gone are skipped, and the new stops are inserted where they add
+    the least cost. The tour is then improved around the changes.
+    If too many stops are new, the tour is solved from scratch.
+    @param entries: Array of (n, 2) of the entry point of each stop
+    @param exits: Array of (n, 2) of the exit point of each stop. If None, the
+                  stops are single points (holes).
+    @param previous: Array of (m, 4) of the entry and exit points of the stops of the
+                     previous tour, in the order and the direction they were visited
+    @param time_budget: Time in seconds allowed for improving the tour
+    @param start: Optional (x, y) point the path starts from
+    @param cost: The cost model to minimize. Defaults to the euclidean distance.
+    @param reversible: Optional flags of the stops which can be travelled backwards
+    @returns The Tour
+    """
+    entries = np.asarray(entries, dtype=float).reshape(-1, 2)
+    exits = entries if exits is None else np.asarray(exits, dtype=float).reshape(-1, 2)
+    start = None if start is None else np.asarray(start, dtype=float).reshape(2)
+    previous = np.asarray(previous, dtype=float).reshape(-1, 4)
+    num_stops = len(entries)
+    flags = np.zeros(num_stops, dtype=bool) if reversible is None else \
+        np.asarray(reversible, dtype=bool) & np.any(entries != exits, axis=1)
+
+    # Match the stops by their location. A location can be shared by several stops.
+    # The reversible segments are found in both directions.
+    stops_at = {}
+
+    for stop, location in enumerate(np.hstack((entries, exits)).tolist()):
+        stops_at.setdefault(tuple(location), []).append((stop, False))
+
+        if flags[stop]:
+            stops_at.setdefault(tuple(location[2:] + location[:2]), []).append((stop, True))
+
+    kept = []
+    used = np.zeros(num_stops, dtype=bool)
+    backwards = np.zeros(num_stops, dtype=bool)
+    changed = set()
+
+    for location in previous.tolist():
+        matches = stops_at.get(tuple(location), [])
+
+        while matches and used[matches[-1][0]]:
+            matches.pop()
+
+        if matches:
+            stop, backwards[stop] = matches.pop()
+            used[stop] = True
+            kept.append(stop)
+        elif kept:
+            # The stop is gone. The stop before it gets a new neighbour.
+            changed.add(kept[-1])
+
+    added = np.flatnonzero(~used).tolist()
+
+    if num_stops <= TOUR_EXACT_MAX_SIZE or len(added) > TOUR_REPAIR_MAX_CHANGES * num_stops:
+        return solve_tour(entries, exits, time_budget, start, cost, flags)
+
+    order = np.array(kept, dtype=np.intp)
+    oriented = orient(entries, exits, backwards)
+
+    for stop in added:
+        order, _ = _cheapest_insertion(*oriented, order, stop, start, cost)
+        changed.add(stop)
+
+    # The ends of the path are free to move too
+    changed.update((int(order[0]), int(order[-1])))
+
+    logger.debug("Repairing a tour of %d stops with %d new stops", num_stops, len(added))
+
+    return HeuristicSolver(cost=cost).repair(
+        entries, exits, order, changed, time_budget, start, flags, backwards)
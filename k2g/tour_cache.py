@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+On-disk cache of the optimized tours.
+
+The same board is often processed many times (rack changes, profile tweaks...).
+ The holes of each tool do not change, so the tours are saved, and found back using
+ a hash of everything the tour depends on: the stops, the start point, the cost
+ model, the segments which can be reversed and the version of the solvers.
+Each tour is a small numpy file named after its key. Reading a tour refreshes its
+ modification time, so the least recently used tours are removed first when the
+ cache grows too large.
+"""
+from hashlib import sha256
+from os.path import expanduser
+from pathlib import Path
+import logging
+import os
+
+import numpy as np
+
+from .constants import TOUR_SOLVER_VERSION, TOUR_CACHE_PATH
+from .cost import EuclideanCost
+from .tour import Tour
+
+
+logger = logging.getLogger(__name__)
+
+# Extension of the cached tours
+_SUFFIX = ".npz"
+
+
+class TourCache:
+    """ Cache of the tours, bounded in size """
+    def __init__(self, path=None, max_size: int=64 * 1024 * 1024):
+        """
+        @param path: The folder holding the tours. Created if required.
+                     Defaults to TOUR_CACHE_PATH.
+        @param max_size: Size of the cache in bytes, beyond which the tours used the
+                         least recently are removed.
+        """
+        self.path = Path(expanduser(path or TOUR_CACHE_PATH))
+        self.max_size = max_size
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(entries: np.ndarray, exits: np.ndarray, start=None, cost=None, reversible=None) -> str:
+        """
+        @param entries, exits: The entry and exit point of each stop
+        @param start: Optional start point of the tour
+        @param cost: The cost model. None for the default.
+        @param reversible: Optional flags of the stops which can be travelled backwards
+        @returns The key of the tour, as a hex string
+        """
+        cost = cost or EuclideanCost()
+        digest = sha256(f"v{TOUR_SOLVER_VERSION}:{cost!r}:{len(entries)}".encode())
+
+        for points in (entries, exits, start):
+            digest.update(b"|")
+
+            if points is not None:
+                digest.update(np.ascontiguousarray(points, dtype=np.float64).tobytes())
+
+        # Only the segments can be reversed
+        segments = np.any(np.asarray(entries) != np.asarray(exits), axis=-1)
+
+        if reversible is not None and np.any(segments & np.asarray(reversible, dtype=bool)):
+            digest.update(b"|")
+            digest.update(np.packbits(segments & np.asarray(reversible, dtype=bool)).tobytes())
+
+        return digest.hexdigest()
+
+    def _file_of(self, key):
+        return self.path / (key + _SUFFIX)
+
+    def get(self, key: str) -> Tour:
+        """ @returns The tour saved under the key, or None """
+        file_path = self._file_of(key)
+
+        try:
+            with np.load(file_path) as content:
+                tour = Tour(content["order"], float(content["length"]),
+                            float(content["lower_bound"]), content["backwards"])
+
+            # Mark as recently used
+            os.utime(file_path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError):
+            logger.warning("Removing the corrupted cached tour %s", file_path)
+            file_path.unlink(missing_ok=True)
+            return None
+
+        return tour
+
+    def put(self, key: str, tour: Tour):
+        """ Save the tour under the key, then trim the cache """
+        file_path = self._file_of(key)
+        temp_path = file_path.with_suffix(".tmp" + _SUFFIX)
+
+        # Write to a temporary file first, so a concurrent reader never sees a partial tour
+        np.savez(temp_path, order=np.asarray(tour.order, dtype=np.intp),
+                 length=tour.length, lower_bound=tour.lower_bound, backwards=tour.backwards)
+        os.replace(temp_path, file_path)
+
+        self.trim()
+
+    def trim(self):
+        """ Remove the least recently used tours until the cache fits its size """
+        files = []
+
+        for file_path in self.path.glob("*" + _SUFFIX):
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
+                continue
+
+            files.append((stat.st_mtime, stat.st_size, file_path))
+
+        total = sum(size for _, size, _ in files)
+
+        for _, size, file_path in sorted(files):
+            if total <= self.max_size:
+                break
+
+            file_path.unlink(missing_ok=True)
+            total -= size
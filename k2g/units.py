@@ -24,16 +24,25 @@ Also, the __call__ was overriden to make things easy to use and read:
  a = 4*mm can be written as a = mm(4)
 Accessing the value is simply a() - or in um say : a(um).
 Array can be created with the correct unit - so thou, inch and mm can be
-  mixed without loss of precision and working on integers
+  mixed without loss of precision and working on integers. A numpy array times a
+  unit is held as a single array (see QuantityArray), so it is converted in one go.
 Finally, the number can be created from a string (for configurations) and
 retains the orginal format (like a fraction).
 
+The geometry is held in whole nm (see the inventory). Such numbers are converted
+ and rounded on integers when the units are a power of ten apart (like nm and mm),
+ which gives the same results as the float path, without its cost.
+
 Most math operators are supported - but you can only add/substract quantities
 for now as multiplying quantities would change the unit.
 This is not required here and therefore, not done.
 """
 import re
+from math import log10
 from operator import __lt__, __le__, __eq__, __ne__, __ge__, __gt__
+
+import numpy as np
+
 from .utils import round_significant
 
 
@@ -44,6 +53,40 @@ def fround(f):
     return round_significant(f, 14)
 
 
+# Beyond this many base units, whole numbers are converted with the float path
+WHOLE_MAX_VALUE = 10**14
+
+
+def convert_whole(value: int, source_unit, target_unit):
+    """
+    Fast path to convert a whole number between units of a power of ten apart (like nm
+     to mm), done on integers. The result is the same as the float conversion followed
+     by fround, which only corrects the rounding errors the integers do not have.
+    @returns The converted value, or None if the fast path does not apply
+    """
+    assert source_unit.__type__ == target_unit.__type__
+
+    if source_unit.decimal_exponent is None or target_unit.decimal_exponent is None:
+        return None
+
+    shift = source_unit.decimal_exponent - target_unit.decimal_exponent
+
+    if shift >= 0:
+        return value * 10**shift
+
+    divisor = 10**-shift
+    quotient, remainder = divmod(value, divisor)
+
+    if remainder == 0:
+        return quotient
+
+    # Within 14 digits, fround gives back the correctly rounded division
+    if abs(value) < WHOLE_MAX_VALUE:
+        return value / divisor
+
+    return None
+
+
 RE_NUMBER = re.compile(
     r'^\s*(?P<number>'
     r'(?P<numerator>\d+(\.\d+)?)'
@@ -56,6 +99,9 @@ class Quantity:
     """
     Represents the quantity of a given unit
     """
+    # Many quantities are created (one per coordinate), so keep them small
+    __slots__ = ("_value", "_raw", "base_unit")
+
     def __init__(self, value, base_unit):
         """
         Construct the quantity from:
@@ -66,6 +112,7 @@ class Quantity:
         Try to keep the number as integer
         """
         # A string representing the value passed in. A fraction would be stored as a fraction
+        # Other values are only formatted when required (see __repr__)
         self._raw = None
 
         if isinstance(value, str):
@@ -82,10 +129,8 @@ class Quantity:
         elif isinstance(value, Quantity):
             assert(value.base_unit.__type__ == base_unit.__type__)
             self._value = value(base_unit)
-            self._raw = str(round_significant(self._value))
         else:
             self._value = value
-            self._raw = str(round_significant(value))
 
         # Bares the Unit type
         self.base_unit = base_unit
@@ -93,14 +138,20 @@ class Quantity:
     def __call__(self, target_unit=None):
         if target_unit is None:
             return self._value
-        else:
-            retval = self._value * self.base_unit.conversion_to(target_unit)
 
-            if int(retval) == retval:
-                return int(retval)
+        if type(self._value) is int:
+            retval = convert_whole(self._value, self.base_unit, target_unit)
+
+            if retval is not None:
+                return retval
+
+        retval = self._value * self.base_unit.conversion_to(target_unit)
 
-            # Loose some precision to avoid rounding errors
-            return fround(retval)
+        if int(retval) == retval:
+            return int(retval)
+
+        # Loose some precision to avoid rounding errors
+        return fround(retval)
 
     @property
     def value(self):
@@ -125,6 +176,12 @@ class Quantity:
         # Whole numbers of resolutions
         whole = round(self.base/resolution.base)
 
+        if type(self._value) is int and self.base_unit.conversion_factor == 1 \
+                and float(resolution.base).is_integer() and abs(self._value) < WHOLE_MAX_VALUE:
+            # Fast path for a whole number of base units (nm) and resolution. The float
+            # path below ends up on the same whole number, once fround is applied.
+            return Quantity(whole * int(resolution.base), self.base_unit)
+
         # Rounded value in the resolution unit
         rounded = (whole * resolution)(self.unit)
 
@@ -136,6 +193,8 @@ class Quantity:
             return Quantity(self.value * other, self.base_unit)
         elif isinstance(other, list):
             return [item * self for item in other]
+        elif isinstance(other, np.ndarray):
+            return QuantityArray(self.value * other, self.base_unit)
         else:
             raise TypeError("Unsupported multiplication type")
 
@@ -174,15 +233,30 @@ class Quantity:
         return Quantity(self.value ** exponent, self.base_unit)
 
     def __repr__(self):
+        if self._raw is None:
+            self._raw = str(round_significant(self._value))
+
         return f"{self._raw}{self.base_unit.name}"
 
+    def _rounded_base(self):
+        """
+        @returns The value in the base unit, rounded by fround. A whole number
+                 is returned as is, since fround does not change it.
+        """
+        base = self._value * self.base_unit.conversion_factor
+
+        if (type(base) is int or base.is_integer()) and -WHOLE_MAX_VALUE < base < WHOLE_MAX_VALUE:
+            return int(base)
+
+        return fround(base)
+
     def __apply_operator(self, other, operator):
         if isinstance(other, (int, float)):
             return operator(self.value, other)
         elif isinstance(other, Quantity):
             # Make sure we're comparing apples with apples
-            assert self.base_unit.type is other.base_unit.type
-            return operator(fround(self.base), fround(other.base))
+            assert self.base_unit.__type__ == other.base_unit.__type__
+            return operator(self._rounded_base(), other._rounded_base())
         else:
             raise TypeError("Unsupported operation type")
 
@@ -208,7 +282,186 @@ class Quantity:
         """
         Convert to the smallest
         """
-        return hash(fround(self.value * self.base_unit.conversion_factor))
+        return hash(self._rounded_base())
+
+
+def fround_array(values):
+    """ Round an array to 14 digits, like fround does for a single number """
+    values = np.asarray(values, dtype=float)
+    magnitude = np.floor(np.log10(np.abs(np.where(values == 0, 1, values))))
+    scale = 10.0 ** (13 - magnitude)
+
+    return np.round(values * scale) / scale
+
+
+class QuantityArray:
+    """
+    Represents many quantities of the same unit, held in a numpy array.
+    Conversions, arithmetic, comparisons and rounding apply to the whole array at once.
+    Indexing with a number gives a Quantity, and with a slice or a mask a QuantityArray.
+    """
+    # Let numpy arrays defer to the operators of this class
+    __array_ufunc__ = None
+
+    def __init__(self, values, base_unit):
+        """
+        Construct the array from:
+            - a list or array of ints and floats
+            - a list of quantities, converted to the unit
+            - a quantity array, converted to the unit
+            and a unit
+        Whole numbers are kept as integers
+        """
+        if isinstance(values, QuantityArray):
+            values = values(base_unit)
+        elif len(values) and all(isinstance(item, Quantity) for item in values):
+            values = [item(base_unit) for item in values]
+
+        self._value = np.asarray(values)
+
+        if self._value.dtype.kind not in "iuf":
+            raise TypeError("Unsupported array type")
+
+        # Bares the Unit type
+        self.base_unit = base_unit
+
+    def __call__(self, target_unit=None):
+        """ @returns The numpy array of the values in the target unit """
+        if target_unit is None:
+            return self._value
+
+        conversion = self.base_unit.conversion_to(target_unit)
+
+        if self._value.dtype.kind in "iu" and self.base_unit.decimal_exponent is not None \
+                and target_unit.decimal_exponent is not None:
+            # Whole numbers between decimal units are converted without rounding errors
+            shift = self.base_unit.decimal_exponent - target_unit.decimal_exponent
+
+            if shift >= 0:
+                return self._value * 10**shift
+
+            quotient, remainder = np.divmod(self._value, 10**-shift)
+
+            return self._value / 10**-shift if remainder.any() else quotient
+
+        if isinstance(conversion, int):
+            return self._value * conversion
+
+        # Loose some precision to avoid rounding errors
+        return fround_array(self._value * conversion)
+
+    @property
+    def value(self):
+        return self._value
+
+    @property
+    def base(self):
+        """ @returns The numpy array of the values in the base unit """
+        return self._value * self.base_unit.conversion_factor
+
+    @property
+    def unit(self):
+        return self.base_unit
+
+    def round(self, resolution):
+        """ Round all numbers to a given resolution """
+        assert self.base_unit.type is resolution.base_unit.type
+
+        # Whole numbers of resolutions
+        whole = np.round(self.base / resolution.base)
+
+        if self.base_unit.conversion_factor == 1 and float(resolution.base).is_integer():
+            return QuantityArray(whole.astype(np.int64) * int(resolution.base), self.base_unit)
+
+        return QuantityArray(
+            fround_array(whole * resolution.base / self.base_unit.conversion_factor), self.base_unit)
+
+    def _other_value(self, other):
+        """ @returns The other operand in the unit of the array """
+        if isinstance(other, (Quantity, QuantityArray)):
+            assert self.base_unit.type is other.base_unit.type
+            return other(self.base_unit)
+
+        return other
+
+    def __add__(self, other):
+        return QuantityArray(self._value + self._other_value(other), self.base_unit)
+
+    def __sub__(self, other):
+        return QuantityArray(self._value - self._other_value(other), self.base_unit)
+
+    def __mul__(self, other):
+        if isinstance(other, (Quantity, QuantityArray, Unit)):
+            raise TypeError("Unsupported multiplication type")
+
+        return QuantityArray(self._value * other, self.base_unit)
+
+    def __truediv__(self, other):
+        if isinstance(other, (Quantity, QuantityArray, Unit)):
+            raise TypeError("Unsupported division type")
+
+        return QuantityArray(self._value / other, self.base_unit)
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __neg__(self):
+        return QuantityArray(-self._value, self.base_unit)
+
+    def __abs__(self):
+        return QuantityArray(np.abs(self._value), self.base_unit)
+
+    def __apply_operator(self, other, operator):
+        if isinstance(other, (Quantity, QuantityArray)):
+            # Make sure we're comparing apples with apples
+            assert self.base_unit.type is other.base_unit.type
+            return operator(fround_array(self.base), fround_array(other.base))
+
+        if isinstance(other, (int, float, np.ndarray)):
+            return operator(self._value, other)
+
+        raise TypeError("Unsupported operation type")
+
+    def __lt__(self, other):
+        return self.__apply_operator(other, __lt__)
+
+    def __le__(self, other):
+        return self.__apply_operator(other, __le__)
+
+    def __eq__(self, other):
+        return self.__apply_operator(other, __eq__)
+
+    def __ne__(self, other):
+        return self.__apply_operator(other, __ne__)
+
+    def __ge__(self, other):
+        return self.__apply_operator(other, __ge__)
+
+    def __gt__(self, other):
+        return self.__apply_operator(other, __gt__)
+
+    # Like numpy arrays, an array of quantities cannot be hashed
+    __hash__ = None
+
+    def __len__(self):
+        return len(self._value)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return Quantity(self._value[index].item(), self.base_unit)
+
+        return QuantityArray(self._value[index], self.base_unit)
+
+    def __iter__(self):
+        for value in self._value.tolist():
+            yield Quantity(value, self.base_unit)
+
+    def __array__(self, dtype=None, copy=None):
+        """ @return The numpy array in the base unit, like a Coordinate """
+        return np.asarray(self.base, dtype=dtype)
+
+    def __repr__(self):
+        return f"{self._value.tolist()}{self.base_unit.name}"
 
 
 class Unit:
@@ -217,12 +470,23 @@ class Unit:
     """
     __types__ = {}
     __units__ = {}
+
+    # So array * unit creates a QuantityArray, rather than an array of quantities
+    __array_ufunc__ = None
+
     __type__ = None
     __default__ = None
 
     def __init__(self, name, conversion_factor):
         self.name = name
         self.conversion_factor = conversion_factor
+
+        # The factor to convert to each other unit, by name. See conversion_to.
+        self.conversions = {}
+
+        # The factor as a power of ten (like 6 for the mm), or None
+        exponent = round(log10(conversion_factor))
+        self.decimal_exponent = exponent if conversion_factor == 10**exponent else None
         __class__.__units__[name] = self
 
     def __call__(self, value=None):
@@ -257,19 +521,29 @@ class Unit:
     def conversion_to(self, other_unit):
         """
         Converts to another unit
+        The factors are worked out once per pair of units
         """
-        assert(other_unit.__type__ == self.__type__)
+        conversion = self.conversions.get(other_unit.name)
 
-        if self.conversion_factor % other_unit.conversion_factor == 0:
-            return int(self.conversion_factor / other_unit.conversion_factor)
-        else:
-            return self.conversion_factor / other_unit.conversion_factor
+        if conversion is None:
+            assert(other_unit.__type__ == self.__type__)
+
+            if self.conversion_factor % other_unit.conversion_factor == 0:
+                conversion = int(self.conversion_factor / other_unit.conversion_factor)
+            else:
+                conversion = self.conversion_factor / other_unit.conversion_factor
+
+            self.conversions[other_unit.name] = conversion
+
+        return conversion
 
     def __rmul__(self, other):
         if isinstance(other, (int, float, complex)):
             return Quantity(other, self)
         elif isinstance(other, list):
             return [Quantity(item, self) for item in other]
+        elif isinstance(other, np.ndarray):
+            return QuantityArray(other, self)
         else:
             raise TypeError("Unsupported multiplication type")
 
@@ -321,6 +595,10 @@ class Length(Unit):
 class FeedRate(Unit):
     __default__ = "mm/min"
 
+@register_unit_type("acceleration")
+class Acceleration(Unit):
+    __default__ = "mm/s2"
+
 @register_unit_type("angle")
 class Angle(Unit):
     __default__ = "degree"
@@ -347,6 +625,11 @@ in_min = FeedRate("in/min", 25.4)
 ipm = FeedRate("ipm", 25.4)
 inch_min = FeedRate("inch/min", 25.4)
 
+# Define acceleration units
+mm_s2 = Acceleration("mm/s2", 1)
+m_s2 = Acceleration("m/s2", 1000)
+in_s2 = Acceleration("in/s2", 25.4)
+
 # Define angles
 deg = Angle("deg", 1)
 degree = Angle("degree", 1)
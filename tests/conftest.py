@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+""" Shared fixtures of the unit tests """
+import pytest
+
+import k2g.tour_cache
+
+
+@pytest.fixture(autouse=True)
+def tour_cache_path(tmp_path, monkeypatch):
+    """ Keep the tours cached by the tests out of the cache of the user """
+    path = tmp_path / "tour_cache"
+    monkeypatch.setattr(k2g.tour_cache, "TOUR_CACHE_PATH", str(path))
+
+    return path
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+""" Unit test for the arc_fitting.py module """
+import numpy as np
+
+from k2g.arc_fitting import fit_arc, fit_line, fit_polyline
+
+
+def arc(center, radius, start, stop, count):
+    angles = np.linspace(start, stop, count)
+    return np.column_stack((center[0] + radius * np.cos(angles), center[1] + radius * np.sin(angles)))
+
+
+def test_line():
+    points = np.column_stack((np.arange(10.0), np.zeros(10)))
+    points[5, 1] = 0.05
+
+    assert fit_line(points, 0, 9, 0.1)
+    assert not fit_line(points, 0, 9, 0.01)
+
+    # Going back is not a line
+    assert not fit_line(np.array([[0, 0], [10, 0], [5, 0]]), 0, 2, 0.1)
+
+
+def test_arc():
+    points = arc((5, 5), 10, 0, np.pi / 2, 20)
+    center, clockwise = fit_arc(points, 0, 19, 0.01)
+
+    assert np.allclose(center, (5, 5))
+    assert not clockwise
+    assert fit_arc(points[::-1], 0, 19, 0.01)[1]
+
+    # A corner is not an arc, although a circle goes through its 3 points
+    assert fit_arc(np.array([[0, 0], [10, 0], [10, 10]]), 0, 2, 0.1) is None
+
+    # Nor are collinear points
+    assert fit_arc(np.array([[0, 0], [1, 0], [2, 0]]), 0, 2, 0.1) is None
+
+
+def test_polyline():
+    quarter = arc((0, 0), 10, 0, np.pi / 2, 50)
+    line = np.column_stack((np.zeros(20), np.linspace(10, 20, 21)[1:]))
+    half = arc((5, 20), 5, np.pi, 0, 30)[1:]
+    moves = fit_polyline(np.vstack((quarter, line, half)), 0.01)
+
+    assert [(stop, center is None, clockwise) for stop, center, clockwise in moves] == [
+        (49, False, False), (69, True, False), (98, False, True)
+    ]
+    assert np.allclose(moves[0][1], (0, 0)) and np.allclose(moves[2][1], (5, 20))
+
+    # A coarse polygon is off its circle by more than the tolerance between its points
+    coarse = arc((0, 0), 5, 0, np.radians(87), 4)
+    assert [center for _, center, _ in fit_polyline(coarse, 0.01)] == [None] * 3
+    assert fit_polyline(coarse, 0.2)[0][0] == 3
+
+    # A square stays a square
+    square = [[0, 0], [1, 0], [2, 0], [2, 1], [2, 2], [1, 2], [0, 2], [0, 1], [0, 0]]
+    assert [stop for stop, _, _ in fit_polyline(square, 0.01)] == [2, 4, 6, 8]
+
+    # A closed circle takes 2 moves or more
+    assert len(fit_polyline(arc((0, 0), 10, 0, 2 * np.pi, 100), 0.01)) >= 2
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+""" Unit test for the bound.py module """
+import numpy as np
+
+from k2g.bound import exact_spanning_tree_bound, spanning_tree_bound, tour_lower_bound
+from k2g.cost import KinematicCost
+from k2g.spatial import GridIndex
+from k2g.tour import solve_tour, ExactSolver
+
+
+def minimum_spanning_tree(points):
+    """ Reference MST using the full distance matrix """
+    distances = np.hypot(*(points[:, None, :] - points[None, :, :]).transpose(2, 0, 1))
+    in_tree = np.zeros(len(points), dtype=bool)
+    in_tree[0] = True
+    total = 0.0
+
+    for _ in range(len(points) - 1):
+        outside = np.where(in_tree[None, :], np.inf, distances[in_tree])
+        total += outside.min()
+        in_tree[np.unravel_index(np.argmin(outside), outside.shape)[1]] = True
+
+    return total
+
+
+def test_exact_spanning_tree():
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0, 1e8, (50, 2))
+
+    bound = exact_spanning_tree_bound(points, np.full(50, -1))
+
+    assert abs(bound - minimum_spanning_tree(points)) < 1
+
+
+def test_neighbours_bound():
+    """ The bound from the nearest neighbours never exceeds the MST, even for clusters """
+    rng = np.random.default_rng(1)
+    uniform = rng.uniform(0, 1e8, (300, 2))
+    clusters = rng.uniform(0, 1e8, (10, 2))[rng.integers(0, 10, 300)] + rng.normal(0, 1e6, (300, 2))
+
+    for points in (uniform, clusters):
+        reference = minimum_spanning_tree(points)
+        bound = spanning_tree_bound(*GridIndex(points).knn(10))
+
+        assert bound <= reference + 1
+
+    # Uniform points are well connected by their neighbours
+    assert spanning_tree_bound(*GridIndex(uniform).knn(10)) > 0.9 * minimum_spanning_tree(uniform)
+
+
+def test_bound_of_optimal_tours():
+    rng = np.random.default_rng(2)
+    cost = KinematicCost(1e8, 5e7, 5e8, 5e8)
+
+    for _ in range(10):
+        entries = rng.uniform(0, 1e8, (8, 2))
+        exits = entries.copy()
+        exits[:2] += rng.uniform(0, 2e7, (2, 2))
+
+        for model in (None, cost):
+            tour = ExactSolver(model).solve(entries, exits, start=(0, 0))
+
+            assert tour_lower_bound(entries, exits, (0, 0), model) <= tour.length * (1 + 1e-9)
+
+
+def test_segments_are_free():
+    # A single segment is a tour of no cost
+    assert tour_lower_bound(np.array([[0, 0]]), np.array([[1e8, 0]])) == 0
+    # A row of segments end to end
+    entries = np.column_stack((np.arange(10) * 1e7, np.zeros(10)))
+    exits = entries + (9e6, 0)
+
+    assert abs(tour_lower_bound(entries, exits) - 9e6) < 1
+
+
+def test_gap():
+    rng = np.random.default_rng(3)
+    tour = solve_tour(rng.uniform(0, 1e8, (500, 2)))
+
+    assert 0 < tour.lower_bound <= tour.length
+    assert 0 <= tour.gap < 30
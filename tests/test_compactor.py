@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+""" Unit test for the compactor.py module """
+import io
+
+from k2g.compactor import ModalCompactor, trim_number
+from k2g.gcode_writer import GCodeWriter
+
+
+def compact(lines, **kwargs):
+    compactor = ModalCompactor(**kwargs)
+    return [line for line in map(compactor, lines) if line is not None]
+
+
+def test_modal_words():
+    assert compact([
+        "G90 G0 X1 Y2",
+        "G1 Z-1 F600",
+        "G1 Y3",
+        "G2 I0 J-1.5",
+        "G0 Z20",
+        "G90 G0 X1 Y5",
+        "G1 Z-1 F600",
+    ]) == [
+        "G90 G0 X1 Y2",
+        "G1 Z-1 F600",
+        "Y3",
+        "G2 I0 J-1.5",
+        "G0 Z20",
+        "Y5",
+        "G1 Z-1",
+    ]
+
+    # Nothing left of the line
+    assert compact(["G90 G0 X1 Y2", "G90 G0 X1 Y2"]) == ["G90 G0 X1 Y2"]
+
+
+def test_relative_and_inverse_time():
+    # The position is unknown in relative mode
+    assert compact(["G91 G0 X1", "X1", "G90 G0 X1", "X1"]) == ["G91 G0 X1", "X1", "G90 X1"]
+
+    # The feedrate is required on each move in inverse time
+    assert compact(["G93 G1 X1 F10", "X2 F10"]) == ["G93 G1 X1 F10", "X2 F10"]
+
+
+def test_canned_cycles():
+    # Each line of a cycle drills a hole, even at the same place
+    assert compact([
+        "G90 G0 Z20",
+        "G98 G83 X1 Y1 Z-1.5 R1 Q0.5 F300",
+        "X2",
+        "X2",
+        "G80",
+        "G0 X2 Z20",
+    ]) == [
+        "G90 G0 Z20",
+        "G98 G83 X1 Y1 Z-1.5 R1 Q0.5 F300",
+        "X2",
+        "X2",
+        "G80",
+        "G0 Z20",
+    ]
+
+
+def test_reset():
+    # Tool changes, subprograms and unknown lines make the state unknown
+    for line in ["T2 M06", "O1000", "M98 P1000", "MSG Load bit", "G52 X1 Y1"]:
+        assert compact(["G90 G0 X1 Y2 F100", line, "G90 G0 X1 Y2 F100"]) == \
+            ["G90 G0 X1 Y2 F100", line, "G90 G0 X1 Y2 F100"]
+
+    # But comments and the spindle do not
+    assert compact(["G90 G0 X1", "(comment)", "M03 S1000", "G0 X1"]) == \
+        ["G90 G0 X1", "(comment)", "M03 S1000"]
+
+
+def test_trim_zeros():
+    assert trim_number("1.500") == "1.5"
+    assert trim_number("2.000") == "2"
+    assert trim_number("-0.000") == "0"
+    assert trim_number("100") == "100"
+
+    assert compact(["G0 X1.500 Y2.000"], compact=False, trim_zeros=True) == ["G0 X1.5 Y2"]
+    assert compact(["G90 G0 X1.500", "G0 X1.5"], trim_zeros=True) == ["G90 G0 X1.5"]
+
+
+def test_writer():
+    stream = io.StringIO()
+
+    with GCodeWriter(stream, 10, compactor=ModalCompactor()) as writer:
+        writer(["(header)", "G90 G0 X1", "G0 X1", "G0 X2", "M30"])
+
+    # The lines are numbered once compacted
+    assert stream.getvalue() == "(header)\nN0010 G90 G0 X1\nN0020 X2\nN0030 M30\n"
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+""" Unit test for the cost.py module """
+import numpy as np
+
+from k2g.cost import EuclideanCost, KinematicCost
+from k2g.tour import solve_tour, path_length
+
+
+# 100mm/s and 1000mm/s² on X, half on Y. In nm.
+KINEMATIC = KinematicCost(100e6, 50e6, 1000e6, 500e6)
+
+
+def test_axis_profiles():
+    # X reaches its rate after 10mm: 2 x sqrt(10/1000) = 0.2s
+    assert np.isclose(KINEMATIC.between(0, 0, 10e6, 0), 0.2)
+    # Short move, never reaching the rate: 2 x sqrt(2.5/1000)
+    assert np.isclose(KINEMATIC.between(0, 0, 2.5e6, 0), 0.1)
+    # Long move: 100mm at 100mm/s, plus the time lost accelerating
+    assert np.isclose(KINEMATIC.between(0, 0, -100e6, 0), 1.1)
+    # The slowest axis gives the time
+    assert np.isclose(KINEMATIC.between(0, 0, 100e6, 100e6), 2.1)
+
+
+def test_scalar_and_vector_agree():
+    rng = np.random.default_rng(0)
+    deltas = rng.uniform(-1e8, 1e8, (100, 2))
+
+    for cost in (EuclideanCost(), KINEMATIC):
+        vector = cost.travel(deltas[:, 0], deltas[:, 1])
+        scalar = [cost.between(0, 0, x, y) for x, y in deltas]
+
+        assert np.allclose(vector, scalar)
+        assert np.all(cost.lower_bound(np.hypot(deltas[:, 0], deltas[:, 1])) <= vector + 1e-9)
+
+
+def test_tour_minimizes_time():
+    rng = np.random.default_rng(1)
+    points = rng.uniform(0, 1e8, (400, 2))
+
+    by_distance = solve_tour(points)
+    by_time = solve_tour(points, cost=KINEMATIC)
+
+    assert sorted(by_time.order) == list(range(400))
+    assert by_time.lower_bound <= by_time.length
+    assert abs(by_time.length - path_length(points, points, by_time.order, cost=KINEMATIC)) < 1e-6
+    assert by_time.length < path_length(points, points, by_distance.order, cost=KINEMATIC)
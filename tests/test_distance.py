@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+""" Unit test for the distance.py module """
+import numpy as np
+
+from k2g.distance import distance_matrix, point_distance
+from k2g.cost import KinematicCost
+
+
+POINTS = np.array([[0, 0], [3, 4], [6, 8], [0, 4]], dtype=float)
+
+
+def test_matrix():
+    matrix = distance_matrix(POINTS)
+
+    assert matrix.shape == (4, 4)
+    assert matrix[0, 1] == 5
+    assert matrix[1, 0] == 5
+    assert matrix[0, 2] == 10
+    assert np.all(np.diag(matrix) == 0)
+
+
+def test_blocks():
+    reference = distance_matrix(POINTS)
+
+    assert np.array_equal(distance_matrix(POINTS, block_size=3), reference)
+    assert np.array_equal(distance_matrix(POINTS[:2], POINTS, block_size=1), reference[:2])
+
+
+def test_point_distance():
+    assert list(point_distance(POINTS[:2], POINTS[1:3])) == [5, 5]
+
+
+def test_cost_model():
+    cost = KinematicCost(100e6, 50e6, 1000e6, 500e6)
+    points = POINTS * 1e7
+    matrix = distance_matrix(points, cost=cost)
+
+    assert np.isclose(matrix[0, 1], cost.between(0, 0, 3e7, 4e7))
+    assert np.allclose(matrix, matrix.T)
+    assert np.allclose(point_distance(points[:-1], points[1:], cost), np.diag(matrix, 1))
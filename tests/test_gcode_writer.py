@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+""" Unit test for the gcode_writer.py module """
+import io
+
+from k2g.gcode_writer import GCodeWriter, split_lines
+
+
+def chunks():
+    yield "(header)"
+    yield """
+        G90
+        G0 X1 Y2
+
+    """
+    yield "O1000"
+    yield "M30"
+
+
+def test_numbering():
+    stream = io.StringIO()
+
+    with GCodeWriter(stream, 10) as writer:
+        writer(chunks())
+
+    assert stream.getvalue() == "(header)\nN0010 G90\nN0020 G0 X1 Y2\nO1000\nN0030 M30\n"
+
+    stream = io.StringIO()
+
+    with GCodeWriter(stream) as writer:
+        writer(chunks())
+
+    assert stream.getvalue() == "(header)\nG90\nG0 X1 Y2\nO1000\nM30\n"
+
+
+def test_buffering():
+    class Stream(io.StringIO):
+        writes = 0
+
+        def write(self, text):
+            self.writes += 1
+            return super().write(text)
+
+    # Nothing is written until the buffer is full, or the writer is done
+    stream = Stream()
+    writer = GCodeWriter(stream, 10, buffer_size=1000)
+
+    for _ in range(10):
+        writer(chunks())
+
+    assert stream.writes == 0
+
+    writer.flush()
+    assert stream.writes == 1
+    assert len(stream.getvalue().splitlines()) == 50
+
+    # A small buffer is written after each call
+    stream = Stream()
+
+    with GCodeWriter(stream, 10, buffer_size=10) as writer:
+        for _ in range(10):
+            writer(chunks())
+
+    assert stream.writes == 10
+
+
+def test_binary():
+    stream = io.BytesIO()
+
+    with GCodeWriter(stream, 10) as writer:
+        writer(chunks())
+
+    assert stream.getvalue() == b"(header)\nN0010 G90\nN0020 G0 X1 Y2\nO1000\nN0030 M30\n"
+
+
+def test_write_lines():
+    stream = io.StringIO()
+
+    # Lines split beforehand follow the chunks, and share their numbering
+    with GCodeWriter(stream, 10) as writer:
+        writer(["(header)", "G90"])
+        writer.write_lines(split_lines(chunks()))
+        writer(["M30"])
+
+    assert stream.getvalue() == \
+        "(header)\nN0010 G90\n(header)\nN0020 G90\nN0030 G0 X1 Y2\nO1000\nN0040 M30\nN0050 M30\n"
@@ -16,12 +16,22 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from k2g.rack import RackManager
+import io
+import time
+
+import numpy as np
+
+from k2g.rack import RackManager, Rack
 from k2g.pcb_inventory import Inventory
 from k2g.utils import Coordinate
 from k2g.units import mm
-from k2g.machining import Machining, Operations
-from k2g.cutting_tools import DrillBit
+from k2g.config import global_settings as gs
+from k2g.machining import Machining, Operations, RouteVector, LinearMove, ArcMove, RouteDirection, \
+    DrillHole, fit_moves, load_plan, save_plan
+from k2g.cutting_tools import DrillBit, RouterBit
+from k2g.gcode_writer import GCodeWriter
+from k2g.panel import Panel
+import k2g.machining
 
 
 inventory = Inventory()
@@ -62,3 +72,228 @@ def test_simple():
     assert tool_number == 1
 
     assert ops[0].tool.diameter == 0.5*mm
+
+
+def test_parallel_optimize(monkeypatch):
+    """ The parallel optimization gives the same result in the rack order """
+    monkeypatch.setattr(k2g.machining, "TOUR_PARALLEL_MIN_STOPS", 0)
+
+    def optimized(workers):
+        machining = Machining(inventory)
+        machining.process(Operations.PTH)
+        machining.optimize(workers=workers, use_cache=False)
+
+        return [
+            (slot, [op.origin() for op in ops]) for slot, ops in machining.tools_to_ops.items()
+        ]
+
+    serial = optimized(1)
+
+    assert [slot for slot, _ in serial] == [1, 2, 3]
+    assert optimized(2) == serial
+
+
+def test_serial_time_budget(monkeypatch):
+    """ Solving the tools one after the other, they share the time budget """
+    solve_tour = k2g.machining.solve_tour
+
+    def slow_solve_tour(entries, exits, time_budget, *args):
+        # Use all the time given, like a large tour would
+        time.sleep(time_budget)
+        return solve_tour(entries, exits, None, *args)
+
+    monkeypatch.setattr(k2g.machining, "solve_tour", slow_solve_tour)
+
+    machining = Machining(inventory)
+    machining.process(Operations.PTH)
+
+    start = time.perf_counter()
+    machining.optimize(0.6, workers=4, use_cache=False)
+
+    assert time.perf_counter() - start < 0.9
+
+
+def test_tools_are_stitched():
+    """ With a manual rack, each tool starts from the end closest to the previous tool """
+    machining = Machining(inventory)
+    machining.process(Operations.PTH)
+    machining.optimize(workers=1)
+
+    last = None
+
+    for ops in machining.tools_to_ops.values():
+        first_hole, last_hole = np.array(ops[0].origin()), np.array(ops[-1].origin())
+
+        if last is not None:
+            assert np.hypot(*(first_hole - last)) <= np.hypot(*(last_hole - last))
+
+        last = last_hole
+
+
+def test_automatic_change_panel():
+    """ With an automatic tool change, each tool chains the copies from the tool change """
+    machining = Machining(inventory, Panel.grid(2, 1, 200*mm, 200*mm))
+    rack = Rack(4)
+
+    for tool in machining.process(Operations.PTH).keys():
+        rack.add_bit(tool)
+
+    machining.use_rack(rack)
+    machining.optimize(workers=1, use_cache=False)
+
+    # The tours start next to the tool change position, so the first copy is never reversed
+    for copies in machining.copies.values():
+        assert [backwards for _, backwards in copies] == [False, False]
+
+
+def test_plan(tmp_path):
+    """ A revised board reuses the plan of the previous revision """
+    machining = Machining(inventory)
+    machining.process(Operations.PTH)
+    machining.optimize(workers=1, use_cache=False)
+
+    save_plan(machining.plan, tmp_path / "plan.npz")
+    plan = load_plan(tmp_path / "plan.npz")
+
+    assert sorted(plan) == sorted(machining.plan)
+
+    for key, stops in plan.items():
+        assert np.array_equal(stops, machining.plan[key])
+
+    revised = Machining(inventory)
+    revised.process(Operations.PTH)
+    revised.optimize(workers=1, use_cache=False, previous_plan=plan)
+
+    for slot, ops in revised.tools_to_ops.items():
+        assert [op.origin() for op in ops] == \
+            [op.origin() for op in machining.tools_to_ops[slot]]
+
+
+def test_cache(tour_cache_path):
+    """ Only the tours improved without a time budget are cached """
+    machining = Machining(inventory)
+    machining.process(Operations.PTH)
+
+    machining.optimize(workers=1, use_cache=False)
+    assert not tour_cache_path.exists()
+
+    machining.optimize(0, workers=1)
+    assert not list(tour_cache_path.iterdir())
+
+    machining.optimize(workers=1)
+    assert len(list(tour_cache_path.iterdir())) == len(machining.tools_to_ops)
+
+
+def test_report():
+    """ Each tool reports its travel, its lower bound and the gap """
+    machining = Machining(inventory)
+    machining.process(Operations.PTH)
+    report = machining.optimize(workers=1, use_cache=False)
+
+    assert report is machining.report
+    assert [tool.slot for tool in report] == list(machining.tools_to_ops)
+
+    for tool in report:
+        assert tool.stops == 4
+        assert 0 < tool.lower_bound <= tool.length
+        assert tool.gap >= 0
+        assert str(tool).startswith(f"T{tool.slot:02d}: Travel of 4 stops")
+
+
+def test_reverse_operations():
+    move = LinearMove(Coordinate(0*mm, 0*mm), Coordinate(1*mm, 0*mm))
+    move.append(LinearMove(Coordinate(1*mm, 0*mm), Coordinate(1*mm, 2*mm)))
+    route = RouteVector(move, None)
+    route.reverse()
+
+    assert route.origin() == Coordinate(1*mm, 2*mm)()
+    assert route.vector_start.end() == Coordinate(1*mm, 0*mm)()
+    assert route.get_end_coordinate()() == Coordinate(0*mm, 0*mm)()
+
+    # A group of holes is drilled from the other end
+    drill = DrillHole(Coordinate(0*mm, 0*mm), None)
+    drill.then(DrillHole(Coordinate(1*mm, 0*mm), None))
+    drill.then(DrillHole(Coordinate(2*mm, 0*mm), None))
+    drill.reverse()
+
+    assert drill.origin() == Coordinate(2*mm, 0*mm)()
+    assert drill.get_end_coordinate()() == Coordinate(0*mm, 0*mm)()
+
+    # A contour keeps its direction
+    assert not RouteVector(move, None, RouteDirection.CLIMB).reversible
+
+
+def test_reversible_slots(monkeypatch):
+    """ Stacked slots are routed in a zigzag """
+    monkeypatch.setattr(gs.optimizer, "cost_model", "distance")
+    slots = Inventory()
+
+    for row in range(12):
+        slots.add_hole(Coordinate(5*mm, (10*row)*mm), 10*mm, size_y=1*mm)
+
+    machining = Machining(slots)
+    machining.process(Operations.PTH)
+    report = machining.optimize(workers=1, use_cache=False)
+
+    ops = next(iter(machining.tools_to_ops.values()))
+    assert all(isinstance(op, RouteVector) for op in ops)
+    assert len({op.origin.x for op in ops[::2]}) == 1
+    assert ops[0].origin.x != ops[1].origin.x
+    assert abs(report[0].length - 110e6) < 1
+
+
+def test_route_vector_arcs():
+    """ The flattened curves of a path are routed as arcs """
+    angles = np.linspace(0, np.pi / 2, 30)
+    points = [Coordinate(10*np.cos(angle)*mm, 10*np.sin(angle)*mm) for angle in angles]
+    points.append(Coordinate(0*mm, 20*mm))
+
+    move = LinearMove(points[0], points[1])
+
+    for start, end in zip(points[1:], points[2:]):
+        move.append(LinearMove(start, end))
+
+    assert fit_moves(move, 0*mm) is move
+
+    route = RouteVector(move, RouterBit(2*mm))
+    moves = list(route.vector_start)
+
+    assert [type(move) for move in moves] == [ArcMove, LinearMove]
+    assert not moves[0].clockwise
+
+    def lines(offset=None):
+        stream = io.StringIO()
+
+        with GCodeWriter(stream) as writer:
+            route.to_gcode(writer, 0, 0, offset)
+
+        return [line for line in stream.getvalue().splitlines() if line[0] in "G"][2:-1]
+
+    assert lines() == ["G3 X0 Y10 I-10 J0", "G1 X0 Y20"]
+
+    # Backwards, the arc turns the other way
+    route.reverse()
+    assert lines(Coordinate(100*mm, 0*mm)) == ["G1 X100 Y10", "G2 X110 Y0 I0 J-10"]
+
+
+def test_parallel_generate(monkeypatch):
+    """ Rendering in several processes gives the same G-code """
+    monkeypatch.setattr(k2g.machining, "GCODE_PARALLEL_MIN_OPS", 0)
+    monkeypatch.setattr(gs.gcode, "compact", True)
+
+    board = Inventory()
+    board.add_holes(inventory.columns["x"], inventory.columns["y"], inventory.columns["diameter"])
+    board.add_hole(Coordinate(5*mm, 5*mm), 10*mm, size_y=1*mm)
+
+    for subprograms in (True, False):
+        monkeypatch.setattr(gs.gcode, "subprograms", subprograms)
+        machining = Machining(board, Panel.grid(2, 1, 200*mm, 200*mm))
+        machining.process(Operations.PTH)
+        machining.optimize(workers=1, use_cache=False)
+
+        # Without the header line, which holds the time
+        serial, parallel = io.StringIO(), io.StringIO()
+        machining.generate_machine_code(serial, workers=1)
+        machining.generate_machine_code(parallel, workers=2)
+
+        assert parallel.getvalue().split("\n", 1)[1] == serial.getvalue().split("\n", 1)[1]
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+""" Unit test for the panel.py module """
+import io
+
+import numpy as np
+
+from k2g.panel import Panel
+from k2g.pcb_inventory import Inventory
+from k2g.coordinate import Coordinate
+from k2g.units import mm
+from k2g.machining import Machining, Operations
+from k2g.config import global_settings as gs
+
+
+def test_serpentine():
+    panel = Panel.grid(3, 2, 50*mm, 40*mm)
+
+    assert len(panel) == 6
+    assert [tuple(point / 1e6) for point in panel.points] == [
+        (0, 0), (50, 0), (100, 0), (100, 40), (50, 40), (0, 40)
+    ]
+
+    # Explicit offsets are sorted the same way
+    panel = Panel([Coordinate(x*mm, y*mm) for x, y in ((0, 10), (10, 10), (10, 0), (0, 0))])
+
+    assert [tuple(point / 1e6) for point in panel.points] == [(0, 0), (10, 0), (10, 10), (0, 10)]
+
+
+def test_chain():
+    panel = Panel.grid(2, 1, 20*mm, 20*mm)
+    first, last = np.array([0, 0]), np.array([10e6, 0])
+
+    # Forwards, then the second copy starts next to where the first ended
+    copies, end = panel.chain(first, last, True, np.array([0, 0]))
+    assert [backwards for _, backwards in copies] == [False, False]
+    assert list(end) == [30e6, 0]
+
+    # Coming from the right, the first copy is travelled backwards
+    copies, end = panel.chain(first, last, True, np.array([15e6, 0]))
+    assert [backwards for _, backwards in copies] == [True, False]
+
+    # Unless the tour cannot be reversed
+    copies, end = panel.chain(first, last, False, np.array([15e6, 0]))
+    assert [backwards for _, backwards in copies] == [False, False]
+
+
+def machine_panel():
+    """ @returns The GCode of a panel of 2 x 3 copies of a board of 5 holes """
+    inventory = Inventory()
+
+    for x, y in ((1, 1), (1, 10), (10, 1), (10, 10), (5, 5)):
+        inventory.add_hole(Coordinate(x*mm, y*mm), 0.8*mm)
+
+    machining = Machining(inventory, Panel.grid(2, 3, 20*mm, 30*mm))
+    machining.process(Operations.PTH)
+    machining.optimize(workers=1, use_cache=False)
+
+    stream = io.StringIO()
+    machining.generate_machine_code(stream)
+
+    return stream.getvalue()
+
+
+def test_panel_machining(monkeypatch):
+    monkeypatch.setattr(gs.gcode, "subprograms", False)
+    code = machine_panel()
+
+    # Each copy of each hole is drilled in a single canned cycle
+    assert code.count(" X") == 5 * 6
+    assert code.count("G81") == 1
+    assert "X21 Y61" in code and "X30 Y70" in code
+    assert "M98" not in code
+
+
+def test_panel_subprograms():
+    code = machine_panel()
+    main, subprograms = code.split("M30")
+
+    # Each copy calls the board, forwards or backwards
+    assert main.count("M98") == 6
+    assert "G52 X20 Y60" in main
+    assert main.count(" X") == 6 + 1
+
+    # Each subprogram drills the 5 holes
+    assert subprograms.count("M99") == 2
+    assert subprograms.count(" X") == 2 * 5
+    assert "\nO1002\n" in subprograms and "\nO1003\n" in subprograms
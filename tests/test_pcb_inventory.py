@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+""" Unit test for the pcb_inventory.py module """
+import numpy as np
+
+from k2g.pcb_inventory import Inventory, FeatureKind, Hole, Oblong
+from k2g.coordinate import Coordinate
+from k2g.operations import Operations
+from k2g.units import mm, degree
+
+
+def test_add_holes():
+    one_by_one, bulk = Inventory(), Inventory()
+    x, y = np.arange(10) * 1e6, np.arange(10) * 2e6
+
+    for hole_x, hole_y in zip(x, y):
+        one_by_one.add_hole(Coordinate(hole_x/1e6*mm, hole_y/1e6*mm), 0.8*mm)
+
+    bulk.add_holes(x, y, 0.8e6)
+
+    for name in ("x", "y", "end_x", "end_y", "diameter", "kind", "pth"):
+        assert np.array_equal(one_by_one.columns[name], bulk.columns[name])
+
+    features = bulk.get_features(Operations.PTH)
+    assert list(features) == [0.8*mm]
+
+    view = features[0.8*mm]
+    assert len(view) == 10
+    assert all(isinstance(hole, Hole) and not isinstance(hole, Oblong) for hole in view)
+    assert view[3].coord() == [3e6, 6e6]
+
+
+def test_mixed_adds():
+    """ The holes added one at a time keep their place among the holes added in bulk """
+    inventory = Inventory()
+    inventory.add_hole(Coordinate(1*mm, 0*mm), 1*mm)
+    inventory.add_holes([2e6, 3e6], [0, 0], 1e6, angle=[0, 90], pth=[True, False])
+    inventory.add_hole(Coordinate(4*mm, 0*mm), 1*mm, pth=False)
+
+    assert len(inventory) == 4
+    assert inventory.columns["x"].tolist() == [1e6, 2e6, 3e6, 4e6]
+    assert inventory.columns["pth"].tolist() == [True, True, False, False]
+
+    inventory.add_hole(Coordinate(5*mm, 0*mm), 1*mm)
+    assert inventory.columns["x"].tolist() == [1e6, 2e6, 3e6, 4e6, 5e6]
+
+
+def test_oblong():
+    inventory = Inventory()
+
+    # 3x1mm slot, rotated by 90 degrees: along Y
+    inventory.add_hole(Coordinate(10*mm, 10*mm), 3*mm, size_y=1*mm, angle=90*degree)
+
+    view = inventory.get_features(Operations.PTH)[1*mm]
+    assert view.kind.tolist() == [FeatureKind.OBLONG]
+
+    oblong = view[0]
+    assert isinstance(oblong, Oblong)
+    assert oblong.coord() == [10e6, 9e6]
+    assert oblong.end() == [10e6, 11e6]
+    assert oblong.distance == 2*mm
+
+
+def test_pth_npth():
+    inventory = Inventory()
+    inventory.add_holes([0, 1e6], [0, 0], 1e6, pth=True)
+    inventory.add_holes([2e6], [0], 1e6, pth=False)
+    inventory.add_holes([3e6], [0], 3e6, pth=False)
+
+    assert [len(view) for view in inventory.get_features(Operations.PTH).values()] == [2]
+    assert [len(view) for view in inventory.get_features(Operations.NPTH).values()] == [1, 1]
+
+    # The pth and npth holes of the same size are kept together, smallest first
+    features = inventory.get_features(Operations.PTH | Operations.NPTH)
+    assert list(features) == [1*mm, 3*mm]
+    assert features[1*mm].x.tolist() == [0, 1e6, 2e6]
+    assert features[1*mm].pth.tolist() == [True, True, False]
+
+
+def test_memory():
+    inventory = Inventory()
+    inventory.add_holes(np.arange(10000), np.zeros(10000), 0.3e6)
+
+    size = sum(column.nbytes for column in inventory.columns.values())
+
+    assert len(inventory) == 10000
+    assert size / len(inventory) < 64
@@ -16,7 +16,9 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from k2g.rack import Rack
+import pytest
+
+from k2g.rack import Rack, ToolTable
 from k2g.cutting_tools import DrillBit, RouterBit
 from k2g.units import mm
 
@@ -114,3 +116,31 @@ def test_sort2():
     assert r.get_tool(3).diameter == 1.8*mm
     assert r.get_tool(4) == None
     assert r.get_tool(5).diameter == 1.9*mm
+
+
+def test_tool_table(monkeypatch):
+    """ Each size is resolved once, and gets the same tool and slot afterwards """
+    rack = Rack()
+    tools = ToolTable(rack)
+    calls = []
+    request = rack.request
+    monkeypatch.setattr(rack, "request", lambda *args: calls.append(args) or request(*args))
+
+    tool, slot = tools.request(DrillBit, 0.8*mm)
+
+    for _ in range(100):
+        assert tools.request(DrillBit, 0.8*mm) == (tool, slot)
+
+    assert len(calls) == 1
+    assert tool.type is DrillBit and rack.get_tool(slot) is tool
+
+    # The type is part of the key
+    assert tools.request(RouterBit, 0.8*mm)[0].type is RouterBit
+    assert len(calls) == 2
+
+    # So are the failures
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            tools.request(DrillBit, 0.01*mm, False)
+
+    assert len(calls) == 3
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+""" Unit test for the renderer.py module """
+import numpy as np
+import pytest
+
+from k2g.renderer import Template, compilable, is_compilable, format_lengths, round_lengths
+from k2g.machining import DrillHole, render_series
+from k2g.cutting_tools import DrillBit
+from k2g.coordinate import Coordinate
+from k2g.units import nm, um, mm, inch, mm_min
+
+
+@compilable
+def move(x, y, feedrate, index, last_index):
+    yield f"G1 X{x(mm)} Y{y(mm)} F{feedrate(mm_min)} {{{index == 0}}}"
+
+    if index == last_index:
+        yield f"(last at {x(inch)})"
+
+
+def offset(x, y):
+    yield f"X{(x + 1*mm)(mm)}"
+
+
+def test_format():
+    values = np.array([0, 1, -1, 10, 999999, 1000000, 1500000, -2540000, 25400000, 123456789])
+
+    for unit in (nm, um, mm, inch):
+        assert format_lengths(values, unit) == [f"{nm(value)(unit)}" for value in values.tolist()]
+
+    for resolution in (1*um, 5*um, 0.01*mm):
+        assert round_lengths(values, resolution).tolist() == \
+            [nm(value).round(resolution).base for value in values.tolist()]
+
+    assert round_lengths(values, 0.5*nm) is None
+
+
+def test_template():
+    assert is_compilable(move) and not is_compilable(offset)
+
+    template = Template(move, ["x", "y"], feedrate=100*mm_min, index=0, last_index=0)
+    lengths = {"x": np.array([1000000, 2500]), "y": np.array([0, -3000000])}
+
+    assert template.render(lengths) == [
+        "G1 X1 Y0 F100 {True}\n(last at 0.039370078740157)",
+        "G1 X0.0025 Y-3 F100 {True}\n(last at 9.8425196850394e-05)",
+    ]
+
+    # Computing with the lengths cannot be compiled
+    with pytest.raises(TypeError):
+        Template(offset, ["x", "y"])
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 10])
+def test_drill_holes(count):
+    """ The compiled holes are the same as the holes rendered one by one """
+    tool = DrillBit(0.8*mm)
+    panel_offset = Coordinate(20*mm, 15*mm)
+    holes = [DrillHole(Coordinate(nm(1234567 * i), nm(7654321 - 999 * i)), tool) for i in range(count)]
+    series = [(hole, None) for hole in holes] + [(hole, panel_offset) for hole in holes]
+
+    compiled, one_by_one = [], []
+    assert DrillHole.render_series(compiled.extend, series)
+
+    for index, (hole, hole_offset) in enumerate(series):
+        hole.to_gcode(one_by_one.extend, index, len(series) - 1, hole_offset)
+
+    assert "\n".join(compiled) == "\n".join(one_by_one)
+
+
+def test_fallback():
+    """ Holes not held as whole nm are rendered one by one """
+    tool = DrillBit(0.8*mm)
+    series = [(DrillHole(Coordinate(1.0000001*mm, 2*mm), tool), None)]
+    chunks = []
+
+    assert not DrillHole.render_series(chunks.extend, series)
+    assert chunks == []
+
+    render_series(chunks.extend, series)
+    assert "X1 Y2" in "\n".join(chunks)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+""" Unit test for the spatial.py module """
+import numpy as np
+
+from k2g.spatial import GridIndex
+from k2g.distance import distance_matrix
+
+
+def brute_force_knn(points, k):
+    matrix = distance_matrix(points)
+    np.fill_diagonal(matrix, np.inf)
+
+    return np.sort(matrix, axis=1)[:, :k]
+
+
+def test_knn():
+    rng = np.random.default_rng(0)
+
+    for points in (
+        rng.uniform(0, 1e8, (500, 2)),                      # Uniform
+        rng.normal(0, 1e6, (300, 2)),                       # Clustered
+        np.column_stack((np.arange(200) * 1e5, np.zeros(200))), # Flat
+    ):
+        _, distances = GridIndex(points).knn(8)
+        assert np.allclose(distances, brute_force_knn(points, 8))
+
+
+def test_knn_tiny():
+    indexes, _ = GridIndex(np.array([[0, 0], [1, 1]])).knn(8)
+    assert indexes.tolist() == [[1], [0]]
+
+    indexes, _ = GridIndex(np.array([[0, 0]])).knn(8)
+    assert indexes.shape == (1, 0)
+
+
+def test_nearest():
+    rng = np.random.default_rng(1)
+    points = rng.uniform(0, 1e8, (400, 2))
+    index = GridIndex(points)
+
+    for i in rng.permutation(400)[:390]:
+        index.remove(i)
+
+    remaining = np.flatnonzero(index.available)
+    assert len(remaining) == 10
+
+    for query in rng.uniform(-1e7, 1.1e8, (20, 2)):
+        expected = remaining[np.argmin(np.hypot(*(points[remaining] - query).T))]
+        assert index.nearest(query) == expected
+
+    for i in remaining:
+        index.remove(i)
+
+    assert index.nearest((0, 0)) == -1
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+""" Unit test for the streaming.py module """
+import asyncio
+import io
+
+import numpy as np
+import pytest
+
+from k2g.pcb_inventory import Inventory
+from k2g.machining import Machining, Operations
+from k2g.context import ctx
+from k2g.streaming import LineQueue, Sender, SimulatedController, StreamingError, open_connection, \
+    stream_machine_code
+
+
+LINES = [f"G1 X{x}.123 Y{x}.456 F600" for x in range(100)]
+
+
+def send(lines, flow_control, **kwargs):
+    """ Send the lines to a simulated controller @returns The controller """
+    async def run():
+        controller = SimulatedController(**kwargs)
+
+        async with controller as port:
+            reader, writer = await open_connection(port)
+            sender = Sender(reader, writer, flow_control, controller.rx_buffer_size)
+
+            try:
+                await sender.send(lines)
+            finally:
+                writer.close()
+
+        return controller
+
+    return asyncio.run(run())
+
+
+def test_character_counting():
+    controller = send(LINES, "count", line_time=0.001)
+
+    assert controller.lines == LINES
+    assert not controller.overflowed
+
+    # Several lines wait in the buffer, so the planner never waits for the next
+    assert controller.peak_buffered > 2 * len(LINES[0])
+
+
+def test_ack():
+    controller = send(LINES, "ack", line_time=0.001)
+
+    assert controller.lines == LINES
+    assert controller.peak_buffered <= max(len(line) for line in LINES) + 1
+
+
+def test_rejected():
+    with pytest.raises(StreamingError, match="M98"):
+        send(["G0 X1", "M98 P1000", "G0 X2"], "count", reject=["M98"])
+
+
+def test_line_queue():
+    def write(lines):
+        for index in range(10):
+            lines.write(f"G0 X{index}\nG0 Y{index}\n")
+
+        lines.close()
+
+    async def run(stop):
+        lines = LineQueue(asyncio.get_running_loop(), 2)
+        writing = asyncio.ensure_future(asyncio.to_thread(write, lines))
+        read = []
+
+        async for line in lines:
+            read.append(line)
+
+            if len(read) == stop:
+                # The writing is blocked on the full queue until aborted
+                lines.abort()
+                break
+
+        results = await asyncio.gather(writing, return_exceptions=True)
+
+        return read, results[0]
+
+    read, result = asyncio.run(run(None))
+    assert len(read) == 20 and result is None
+
+    read, result = asyncio.run(run(3))
+    assert len(read) == 3 and isinstance(result, StreamingError)
+
+
+def test_stream_machine_code(monkeypatch):
+    monkeypatch.setattr(ctx, "pcb_filename", "carte_électronique.kicad_pcb")
+    rng = np.random.default_rng(0)
+    inventory = Inventory()
+    inventory.add_holes(rng.integers(0, 50_000_000, 200), rng.integers(0, 50_000_000, 200), 0.8e6)
+
+    machining = Machining(inventory)
+    machining.process(Operations.PTH)
+    machining.optimize(use_cache=False)
+
+    expected = io.StringIO()
+    machining.generate_machine_code(expected)
+
+    async def run():
+        controller = SimulatedController()
+
+        async with controller as port:
+            acknowledged = await stream_machine_code(machining, port)
+
+        return controller, acknowledged
+
+    controller, acknowledged = asyncio.run(run())
+
+    # The controller executed the same lines as written to a file, but for the header
+    # line, which holds the time
+    header, *lines = controller.lines
+    assert lines == expected.getvalue().splitlines()[1:]
+    assert "carte_?lectronique" in header
+    assert acknowledged == len(controller.lines)
+    assert not controller.overflowed
+
+    # A line rejected stops the streaming
+    async def rejected():
+        async with SimulatedController(reject=["M06"]) as port:
+            await stream_machine_code(machining, port)
+
+    with pytest.raises(StreamingError, match="M06"):
+        asyncio.run(rejected())
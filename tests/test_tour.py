@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+""" Unit test for the tour.py module """
+import numpy as np
+
+from k2g.tour import solve_tour, repair_tour, path_length, closest_end_first, orient, \
+    ExactSolver, HeuristicSolver
+from k2g.machining import optimize_travel
+from k2g.coordinate import Coordinate
+from k2g.units import mm
+
+
+def test_exact_and_heuristic_agree():
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0, 1e8, (9, 2))
+
+    exact = ExactSolver().solve(points, points)
+    heuristic = HeuristicSolver().solve(points, points)
+
+    assert sorted(exact.order) == list(range(9))
+    assert sorted(heuristic.order) == list(range(9))
+    assert heuristic.length >= exact.length - 1
+    assert abs(exact.length - path_length(points, points, exact.order)) < 1
+
+
+def test_grid():
+    # A serpentine visits a 20x20 grid of 1mm pitch in 399mm
+    xs, ys = np.meshgrid(np.arange(20), np.arange(20))
+    points = np.column_stack((xs.ravel(), ys.ravel())) * 1e6
+
+    tour = solve_tour(points)
+
+    assert sorted(tour.order) == list(range(400))
+    assert tour.length < 399e6 * 1.1
+
+
+def test_segments_stay_together():
+    coordinates = [
+        Coordinate(0*mm, 0*mm),
+        Coordinate(50*mm, 0*mm), Coordinate(50*mm, 40*mm), # Segment
+        Coordinate(10*mm, 10*mm),
+    ]
+
+    permutation = optimize_travel(coordinates, {1})
+
+    assert sorted(permutation) == [0, 1, 2, 3]
+    assert permutation.index(2) == permutation.index(1) + 1
+
+
+def test_large_segments_stay_together():
+    rng = np.random.default_rng(1)
+    coordinates = [Coordinate(x*mm, y*mm) for x, y in rng.uniform(0, 100, (200, 2))]
+    segments = set(range(0, 200, 10))
+
+    permutation = optimize_travel(coordinates, segments)
+
+    assert sorted(permutation) == list(range(200))
+
+    for start in segments:
+        assert permutation.index(start + 1) == permutation.index(start) + 1
+
+
+def test_time_budget():
+    rng = np.random.default_rng(2)
+    points = rng.uniform(0, 1e8, (300, 2))
+
+    quick = solve_tour(points, time_budget=0)
+    descent = solve_tour(points)
+    anytime = solve_tour(points, time_budget=0.2)
+
+    for tour in (quick, descent, anytime):
+        assert sorted(tour.order) == list(range(300))
+        assert tour.lower_bound <= tour.length
+
+    assert anytime.length <= descent.length <= quick.length
+
+
+def test_start_point():
+    # A line of holes. Starting from the right end, the tour must go right to left.
+    points = np.column_stack((np.arange(30), np.zeros(30))) * 1e6
+    start = (40e6, 0)
+
+    for size in (3, 9, 30):
+        tour = solve_tour(points[:size], start=start)
+
+        assert list(tour.order) == list(range(size - 1, -1, -1))
+        assert abs(tour.length - path_length(points, points, tour.order, start)) < 1
+
+
+def test_start_point_random():
+    rng = np.random.default_rng(3)
+    points = rng.uniform(0, 1e8, (500, 2))
+    start = np.array([-1e7, -1e7])
+
+    tour = HeuristicSolver().solve(points, points, start=start)
+
+    assert sorted(tour.order) == list(range(500))
+    assert abs(tour.length - path_length(points, points, tour.order, start)) < 1
+
+
+def test_closest_end_first():
+    points = np.column_stack((np.arange(5), np.zeros(5))) * 1e6
+    order = np.arange(5)
+
+    assert list(closest_end_first(order, points, points, (10e6, 0))) == [4, 3, 2, 1, 0]
+    assert list(closest_end_first(order, points, points, (-1e6, 0))) == [0, 1, 2, 3, 4]
+
+    # Segments cannot be travelled backwards, unless they are reversible
+    exits = points + (0, 1e6)
+    assert list(closest_end_first(order, points, exits, (10e6, 0))) == [0, 1, 2, 3, 4]
+    assert list(closest_end_first(order, points, exits, (10e6, 0), reversible=[True] * 5)) == \
+        [4, 3, 2, 1, 0]
+
+
+def test_repair():
+    rng = np.random.default_rng(4)
+    points = rng.uniform(0, 1e8, (1000, 2))
+    tour = solve_tour(points)
+    previous = np.hstack((points[tour.order], points[tour.order]))
+
+    # Revision: 2 holes removed, 5 added
+    revised = np.vstack((np.delete(points, [10, 20], axis=0), rng.uniform(0, 1e8, (5, 2))))
+
+    for start in (None, (0, 0)):
+        repaired = repair_tour(revised, None, previous, start=start)
+
+        assert sorted(repaired.order) == list(range(len(revised)))
+        assert abs(repaired.length - path_length(revised, revised, repaired.order, start)) < 1
+        assert repaired.length < tour.length * 1.05
+
+
+def test_repair_unchanged():
+    rng = np.random.default_rng(5)
+    points = rng.uniform(0, 1e8, (200, 2))
+    tour = solve_tour(points)
+    previous = np.hstack((points[tour.order], points[tour.order]))
+
+    # Shuffled stops are matched by location
+    shuffle = rng.permutation(200)
+    repaired = repair_tour(points[shuffle], None, previous)
+
+    assert list(shuffle[repaired.order]) == list(tour.order)
+
+
+def test_reversible_segments():
+    """ Stacked segments are travelled in a zigzag when they can be reversed """
+    for size in (2, 8, 40):
+        entries = np.column_stack((np.zeros(size), np.arange(size))) * 1e7
+        exits = entries + (1e7, 0)
+
+        locked = solve_tour(entries, exits)
+        tour = solve_tour(entries, exits, reversible=np.ones(size, dtype=bool))
+
+        assert not locked.backwards.any()
+        assert sorted(tour.order) == list(range(size))
+        assert abs(tour.length - (size - 1) * 1e7) < 1
+        assert abs(tour.length - path_length(*tour.oriented(entries, exits), tour.order)) < 1
+        assert tour.length < locked.length
+
+        # Consecutive segments go opposite ways
+        assert np.all(np.diff(tour.backwards[tour.order].astype(int)) != 0)
+
+
+def test_repair_reversible_segments():
+    rng = np.random.default_rng(5)
+    entries = rng.uniform(0, 1e8, (300, 2))
+    exits = entries + rng.normal(0, 5e6, (300, 2))
+    reversible = np.ones(300, dtype=bool)
+    tour = solve_tour(entries, exits, reversible=reversible)
+
+    assert tour.backwards.any()
+
+    # The previous plan holds the stops as travelled
+    previous = np.hstack(orient(entries, exits, tour.backwards))[tour.order]
+    repaired = repair_tour(entries, exits, previous, reversible=reversible)
+
+    assert list(repaired.order) == list(tour.order)
+    assert np.array_equal(repaired.backwards, tour.backwards)
+    assert abs(repaired.length - tour.length) < 1
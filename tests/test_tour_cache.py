@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of the kicad2gcode distribution (https://github.com/adarwoo/kicad2gcode).
+# Copyright (c) 2023 Guillaume ARRECKX (software@arreckx.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+""" Unit test for the tour_cache.py module """
+import os
+
+import numpy as np
+
+from k2g.cost import KinematicCost
+from k2g.tour import solve_tour
+from k2g.tour_cache import TourCache
+
+
+POINTS = np.random.default_rng(0).uniform(0, 1e8, (50, 2))
+
+
+def test_round_trip(tmp_path):
+    cache = TourCache(tmp_path)
+    key = TourCache.key(POINTS, POINTS)
+    tour = solve_tour(POINTS)
+
+    assert cache.get(key) is None
+
+    cache.put(key, tour)
+    cached = cache.get(key)
+
+    assert list(cached.order) == list(tour.order)
+    assert cached.length == tour.length
+    assert cached.lower_bound == tour.lower_bound
+
+
+def test_keys():
+    key = TourCache.key(POINTS, POINTS)
+    moved = POINTS.copy()
+    moved[3, 0] += 1
+
+    assert key == TourCache.key(POINTS.copy(), POINTS.copy())
+    assert key != TourCache.key(moved, moved)
+    assert key != TourCache.key(POINTS, POINTS, start=(0, 0))
+    assert key != TourCache.key(POINTS, POINTS, cost=KinematicCost(1e8, 1e8, 1e9, 1e9))
+
+
+def test_least_recently_used_removed(tmp_path):
+    cache = TourCache(tmp_path)
+    tour = solve_tour(POINTS)
+
+    for index in range(3):
+        cache.put(str(index), tour)
+        os.utime(tmp_path / f"{index}.npz", (index, index))
+
+    # Reading refreshes the tour
+    cache.get("0")
+
+    cache.max_size = 2 * (tmp_path / "0.npz").stat().st_size
+    cache.trim()
+
+    assert cache.get("1") is None
+    assert cache.get("0") is not None
+    assert cache.get("2") is not None
+
+
+def test_corrupted(tmp_path):
+    cache = TourCache(tmp_path)
+    (tmp_path / "bad.npz").write_bytes(b"not a numpy file")
+
+    assert cache.get("bad") is None
+    assert not (tmp_path / "bad.npz").exists()
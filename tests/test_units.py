@@ -17,9 +17,10 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 """ Unit test for the units.py module """
+import numpy as np
 import pytest
 
-from k2g.units import Unit, Length, FeedRate, Angle, Rpm
+from k2g.units import fround, nm, Unit, Length, QuantityArray, FeedRate, Angle, Rpm
 from k2g.units import cm_min, mm_min, in_min, inch_min, m_min, ipm
 from k2g.units import deg, degree, rpm
 from k2g.units import mm, cm, um, inch, mil, thou
@@ -234,4 +235,97 @@ def test_rounding():
 
     res = l1.round(res)
 
-    assert res == 32.455 * mm
\ No newline at end of file
+    assert res == 32.455 * mm
+
+def test_whole_fast_path():
+    """ The integer conversions and rounding give the same as the float ones """
+    rng = np.random.default_rng(0)
+    values = [0, 1, -1, 999, 1000, 25400, 1000000, -1500000, 10**13 + 7] + \
+        rng.integers(-10**12, 10**12, 2000).tolist() + rng.integers(-10**7, 10**7, 2000).tolist()
+
+    for value in values:
+        for target in (nm, um, mm, cm, inch, mil):
+            float_path = value * nm.conversion_to(target)
+            expected = int(float_path) if int(float_path) == float_path else fround(float_path)
+            converted = nm(value)(target)
+
+            assert converted == expected and type(converted) is type(expected)
+
+        for resolution in (1*um, 5*um, 0.01*mm, 1*nm):
+            whole = round(value / resolution.base)
+            expected = ((whole * resolution)(nm) * nm).base
+            rounded = nm(value).round(resolution).base
+
+            assert rounded == expected and type(rounded) is type(expected)
+
+    assert str(nm(1500000)(mm)) == "1.5"
+    assert str(nm(10)(mm)) == "1e-05"
+    assert nm(25400000)(inch) == 1
+
+
+def test_quantity_array():
+    holes = np.array([800000, 300000, 1200000]) * nm
+
+    assert isinstance(holes, QuantityArray)
+    assert holes.unit is nm
+    assert len(holes) == 3
+    assert holes[0] == 0.8*mm
+    assert list(holes(mm)) == [0.8, 0.3, 1.2]
+    assert holes(um).dtype.kind == "i" and list(holes(um)) == [800, 300, 1200]
+
+    # Lists still give a list of quantities
+    assert [1, 2] * inch == [1*inch, 2*inch]
+
+    array_inch = np.array([1, 2]) * inch
+    assert isinstance(array_inch, QuantityArray)
+    assert list(array_inch(mm)) == [25.4, 50.8]
+    assert list(QuantityArray(array_inch, mil).value) == [1000, 2000]
+    assert list(QuantityArray([1*mm, 5*um], um).value) == [1000, 5]
+
+    # Arithmetic
+    assert list((holes + 0.1*mm)(nm)) == [900000, 400000, 1300000]
+    assert list((holes - holes / 2)(nm)) == [400000, 150000, 600000]
+    assert list((holes * 2)(mm)) == [1.6, 0.6, 2.4]
+    assert list((np.array([1, 2, 3]) * holes)(mm)) == [0.8, 0.6, 3.6]
+    assert list((-holes).value) == [-800000, -300000, -1200000]
+
+    with pytest.raises(TypeError):
+        holes * mm(6)
+
+    # Comparisons work on the whole array, like the Quantity does for one
+    assert list(holes < 1*mm) == [True, True, False]
+    assert list(holes == np.array([0.8, 0.3, 1.2]) * mm) == [True, True, True]
+    assert list(holes[holes >= 0.8*mm](mm)) == [0.8, 1.2]
+
+    with pytest.raises(AssertionError):
+        holes < 1*mm_min
+
+    # Rounding
+    rounded = (np.array([32456456, 1234, -2500]) * nm).round(5*um)
+    assert list(rounded(nm)) == [32455000, 0, 0]
+    assert list((np.array([32.456456, 0.0025]) * mm).round(5*um)(mm)) == [32.455, 0]
+
+    values = [32.456456, 0.0075, 1.23]
+
+    for value, rounded in zip(values, (np.array(values) * mm).round(5*um)):
+        assert rounded == (value * mm).round(5*um)
+
+
+def test_lightweight():
+    """ Quantities are created in numbers, so they are kept small and lazy """
+    quantity = mm(15.45)
+
+    assert not hasattr(quantity, "__dict__")
+    assert str(quantity) == "15.45mm"
+    assert str(Length.from_string("4/3mm")) == "4/3mm"
+
+    # The conversions are worked out once
+    assert mm.conversion_to(um) == 1000
+    assert mm.conversions["um"] == 1000
+    assert inch.conversion_to(mm) == 25.4
+
+    # Whole and rounded comparisons
+    assert nm(10**15) == nm(10**15)
+    assert nm(10**15) < nm(10**15 + 1000)
+    assert mm(0.1) + mm(0.2) == mm(0.3)
+    assert hash(mm(0.1) + mm(0.2)) == hash(mm(0.3)) == hash(um(300))